@@ -0,0 +1,424 @@
+"""Plays many all-cpu games at once, with the state of every game stored in NumPy arrays.
+
+Every game is a small state machine (see the phases below). Each step, all games
+in the same phase are handled together with array operations, finished games are masked out.
+The games follow the same rules as DurakGame and all players use the lowest value strategy,
+so with the same seeds the results are the same as from DurakGame(headless=True).play().
+Any deck and hand size of Rules can be played, the table cap has to be 6 (the defence check is sized for it).
+Games that return to an earlier position are aborted at the same round as in DurakGame.play,
+with the same position hash, so a batch never waits for games that go round in circles.
+"""
+from random import Random
+
+import numpy as np
+
+from Cards import all_cards, suits, ranks, suit_masks, rank_masks, beats_masks, deck_cards
+from DurakGame import GameResult
+from DurakGameRules import check_player_count, Rules, standard_rules, MAX_PLAYERS
+from GameState import hand_keys, defender_keys, stockpile_keys
+
+# The phases of a game
+ROUND_START = 0     # New round: flip the defender, grab cards and do the first attack
+DEFEND = 1          # The defender defends, diverts or takes the cards
+ATTACKERS = 2       # Every attacker can add cards after a defence
+ROUND_END = 3       # Checks for winners, after which the next round starts
+DONE = 4
+
+MAX_TABLE = len(all_cards)      # The table can never hold more cards than the deck
+MAX_GRABBERS = MAX_TABLE + 4    # One entry per attack card and per divert in a round
+MAX_UNDEFENDED = 6
+
+# Lookup tables as arrays, indexed by card index or by trump suit
+suit_mask_array = np.zeros(len(suits) + 1, dtype=np.int64)
+for suit, mask in suit_masks.items():
+    suit_mask_array[suit] = mask
+rank_mask_array = np.array(list(rank_masks.values()), dtype=np.int64)   # Indexed by rank position
+card_rank_masks = np.array([rank_masks[card.rank] for card in all_cards], dtype=np.int64)
+beats_array = np.zeros((len(suits) + 1, len(all_cards)), dtype=np.int64)
+for suit, beats in beats_masks.items():
+    beats_array[suit] = beats
+# Bits above the deck, given to empty attack slots so they are always defended
+phantom_bits = np.array([1 << (len(all_cards) + i) for i in range(MAX_UNDEFENDED)], dtype=np.int64)
+
+# The hand keys of GameState.position_hash per byte of the hand mask: hand_byte_keys[seat, byte, value of the byte]
+HAND_BYTES = (len(all_cards) + 7) // 8
+hand_byte_keys = np.zeros((MAX_PLAYERS, HAND_BYTES, 256), dtype=np.uint64)
+for seat in range(MAX_PLAYERS):
+    for byte in range(HAND_BYTES):
+        for value in range(1, 256):
+            card = 8 * byte + (value & -value).bit_length() - 1
+            key = hand_keys[seat][card] if card < len(all_cards) else 0
+            hand_byte_keys[seat, byte, value] = hand_byte_keys[seat, byte, value & (value - 1)] ^ np.uint64(key)
+defender_key_array = np.array(defender_keys, dtype=np.uint64)     # Index -1 for no defender, like the list
+stockpile_key_array = np.array(stockpile_keys, dtype=np.uint64)
+
+
+byte_popcounts = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.int64)
+
+
+def popcount_bytes(masks):
+    """The set bits of every mask, counted per byte in a lookup table, for NumPy before 2.0."""
+    masks = np.ascontiguousarray(masks, dtype=np.int64)
+    return byte_popcounts[masks.view(np.uint8)].reshape(masks.shape + (8,)).sum(axis=-1)
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(masks):
+        """The set bits of every mask."""
+        return np.bitwise_count(masks).astype(np.int64)
+else:
+    popcount = popcount_bytes   # np.bitwise_count came with NumPy 2.0
+
+
+def lowest_bit_index(masks):
+    """Index of the lowest bit of every (non zero) mask."""
+    return popcount((masks & -masks) - 1)
+
+
+def lowest_value_cards(masks, trumps):
+    """Index of the lowest value card in every mask (-1 for empty masks).
+
+    Lowest rank non trump card first (lowest suit on a tie), otherwise the lowest trump."""
+    non_trump = masks & ~suit_mask_array[trumps]
+    pick = np.where(non_trump != 0, non_trump, masks)
+    cards = np.full(len(masks), -1, dtype=np.int64)
+    for rank_mask in rank_mask_array:
+        rank_cards = pick & rank_mask
+        found = (cards == -1) & (rank_cards != 0)
+        cards[found] = lowest_bit_index(rank_cards[found])
+    return cards
+
+
+def hall_subsets(first, last):
+    """All non empty subsets of the attack slots first..last - 1, as lists of slots."""
+    slots = list(range(first, last))
+    return [[slot for i, slot in enumerate(slots) if subset >> i & 1] for subset in range(1, 1 << len(slots))]
+
+
+# hall_subsets_table[last][first]
+hall_subsets_table = [[hall_subsets(first, last) for first in range(last + 1)] for last in range(MAX_UNDEFENDED + 1)]
+
+
+def can_defend(candidates, available, first):
+    """Checks (Hall's condition) if the attack slots from first on can all get their own card.
+
+    candidates holds per game and slot the cards that beat the attack in that slot."""
+    possible = np.ones(len(candidates), dtype=bool)
+    for subset in hall_subsets_table[candidates.shape[1]][first]:
+        union = np.zeros(len(candidates), dtype=np.int64)
+        for slot in subset:
+            union |= candidates[:, slot]
+        possible &= popcount(union & available) >= len(subset)
+    return possible
+
+
+class BatchDurakGame:
+    """N all-cpu games of the same player count, played in lockstep.
+
+    The state of game i is in row i of the arrays:
+        hands:          the hand of every seat as a card mask
+        stockpile:      the card indices of the stockpile, grabbed from the end
+        table_attacks, table_defends: the card index per table slot, -1 if empty
+        grabbers:       the seats that have to grab cards after the round, in order"""
+
+    def __init__(self, player_count: int, seeds: list, rules: Rules = None):
+        self.rules = rules if rules else standard_rules
+        check_player_count(player_count, self.rules)
+        if self.rules.table_cap != MAX_UNDEFENDED:
+            raise ValueError(f"Batched games can only be played with a table cap of {MAX_UNDEFENDED}.")
+        self.player_count = player_count
+        self.seeds = list(seeds)
+        n = len(self.seeds)
+        self.rows = np.arange(n)
+        self.seats = np.arange(player_count)
+
+        deck = deck_cards(self.rules.deck_size)
+        self.stockpile = np.zeros((n, len(deck)), dtype=np.int64)
+        for row, seed in enumerate(self.seeds):
+            # Shuffled exactly like Deck, so the same seed gives the same game
+            stockpile = deck.copy()
+            Random(seed).shuffle(stockpile)
+            self.stockpile[row] = [card.index for card in stockpile]
+        self.stockpile_size = np.full(n, len(deck), dtype=np.int64)
+        self.trumps = self.stockpile[:, 0] // len(ranks) + 1
+
+        self.hands = np.zeros((n, player_count), dtype=np.int64)
+        self.in_game = np.ones((n, player_count), dtype=bool)      # The players list of DurakGame
+        self.attackers = np.zeros((n, player_count), dtype=bool)
+        self.defender = np.full(n, -1, dtype=np.int64)
+        self.table_attacks = np.full((n, MAX_TABLE), -1, dtype=np.int64)
+        self.table_defends = np.full((n, MAX_TABLE), -1, dtype=np.int64)
+        self.table_size = np.zeros(n, dtype=np.int64)
+        self.defended_size = np.zeros(n, dtype=np.int64)           # The defended cards are always in front
+        self.table_ranks = np.zeros(n, dtype=np.int64)             # Mask of every rank on the table
+        self.grabbers = np.zeros((n, MAX_GRABBERS), dtype=np.int64)
+        self.grabbers_size = np.zeros(n, dtype=np.int64)
+
+        self.phase = np.full(n, ROUND_START, dtype=np.int64)
+        self.max_rounds = None
+        self.playing = np.ones(n, dtype=bool)
+        self.rounds = np.zeros(n, dtype=np.int64)
+        self.durak = np.full(n, -1, dtype=np.int64)
+        self.aborted = np.zeros(n, dtype=bool)
+        self.positions = [set() for _ in range(n)]                 # The position hashes at the round starts
+        self.finish_order = np.full((n, player_count), -1, dtype=np.int64)
+        self.finish_size = np.zeros(n, dtype=np.int64)
+
+        for seat in range(player_count):
+            for _ in range(self.rules.hand_size):
+                self.hands[:, seat] |= self.pop_stockpile(self.rows)
+        self.starting_hands = self.hands.copy()
+
+    def play(self, max_rounds: int = 1000):
+        """Plays all games to the end and returns a GameResult per game.
+
+        Like DurakGame.play, games that repeat a position or reach max_rounds rounds are aborted without a Durak."""
+        self.max_rounds = max_rounds
+        while np.any(self.phase != DONE):
+            for phase, handle in ((ROUND_END, self.round_end), (ROUND_START, self.round_start),
+                                  (DEFEND, self.defend), (ATTACKERS, self.attack)):
+                games = np.flatnonzero(self.phase == phase)
+                if len(games):
+                    handle(games)
+        return self.results()
+
+    def results(self):
+        return [GameResult(self.seeds[row], self.player_count,
+                           int(self.durak[row]) if self.durak[row] >= 0 else None,
+                           [int(seat) for seat in self.finish_order[row, :self.finish_size[row]]],
+                           int(self.rounds[row]), bool(self.aborted[row]))
+                for row in self.rows]
+
+    # The phases
+
+    def round_start(self, games):
+        stopped = self.rounds[games] >= self.max_rounds
+        self.abort(games[stopped])
+        games = games[~stopped]
+
+        self.rounds[games] += 1
+        self.flip_next_defender(games, grab_cards=True)
+        repeated = np.zeros(len(games), dtype=bool)
+        for i, (row, position) in enumerate(zip(games.tolist(), self.position_hash(games).tolist())):
+            if position in self.positions[row]:
+                repeated[i] = True
+            else:
+                self.positions[row].add(position)
+        self.abort(games[repeated])
+        games = games[~repeated]
+        self.table_size[games] = 0
+        self.defended_size[games] = 0
+        self.table_ranks[games] = 0
+
+        # The first attacker puts the first card on the table
+        first_attackers = self.first_attacker_of_the_round(games)
+        max_attack = popcount(self.hands[games, self.defender[games]])
+        self.play_attacks(games, first_attackers, self.hands[games, first_attackers], max_attack)
+        self.phase[games] = np.where(self.playing[games], DEFEND, DONE)
+
+    def defend(self, games):
+        defenders = self.defender[games]
+        hands = self.hands[games, defenders]
+        undefended = self.table_size[games] - self.defended_size[games]
+        next_defenders = self.next_defender(games)
+
+        # Divert with the lowest card of the same rank, if the next defender has enough cards and it fits on the table
+        first_attack = self.defended_size[games] == 0
+        pass_on = hands & card_rank_masks[self.table_attacks[games, 0]]
+        divert = (first_attack & (pass_on != 0) & (popcount(self.hands[games, next_defenders]) >= undefended + 2)
+                  & (undefended < MAX_UNDEFENDED))
+        if np.any(divert):
+            diverting = games[divert]
+            cards = lowest_bit_index(pass_on[divert])
+            self.hands[diverting, defenders[divert]] &= ~(np.int64(1) << cards)
+            self.add_to_table(diverting, cards)
+            self.add_grabbers(diverting, defenders[divert])
+            self.flip_next_defender(diverting, grab_cards=False)
+
+        defending = games[~divert]
+        defences = self.first_defence(defending)
+        failed = defending[np.all(defences == -1, axis=1)]
+        defended = defending[np.any(defences != -1, axis=1)]
+        defences = defences[np.any(defences != -1, axis=1)]
+
+        if len(failed):
+            # Take the cards and let the next player defend, this player doesn't get to attack first
+            taken = np.zeros(len(failed), dtype=np.int64)
+            for slot in range(MAX_TABLE):
+                on_table = slot < self.table_size[failed]
+                for cards in (self.table_attacks[failed, slot], self.table_defends[failed, slot]):
+                    taken |= np.where(on_table & (cards >= 0), np.int64(1) << np.maximum(cards, 0), 0)
+                if not np.any(on_table):
+                    break
+            self.hands[failed, self.defender[failed]] |= taken
+            self.flip_next_defender(failed, grab_cards=True)
+            self.phase[failed] = ROUND_END
+
+        if len(defended):
+            for slot in range(MAX_UNDEFENDED):
+                cards = defences[:, slot]
+                placed = cards >= 0
+                rows = defended[placed]
+                self.table_defends[rows, self.defended_size[rows] + slot] = cards[placed]
+                self.hands[rows, self.defender[rows]] &= ~(np.int64(1) << cards[placed])
+                self.table_ranks[rows] |= card_rank_masks[cards[placed]]
+            self.defended_size[defended] = self.table_size[defended]
+            self.phase[defended] = ATTACKERS
+
+    def attack(self, games):
+        """Every attacker can add cards, going around the table from the defender."""
+        attacked = np.zeros(len(games), dtype=bool)
+        for offset in range(1, self.player_count):
+            seats = (self.defender[games] + offset) % self.player_count
+            hands = self.hands[games, seats] & self.table_ranks[games]
+            undefended = self.table_size[games] - self.defended_size[games]
+            max_attack = np.minimum(popcount(self.hands[games, self.defender[games]]), MAX_UNDEFENDED) - undefended
+            attacking = self.attackers[games, seats] & (hands != 0) & (max_attack > 0)
+            if np.any(attacking):
+                self.play_attacks(games[attacking], seats[attacking], hands[attacking], max_attack[attacking])
+            attacked |= attacking
+        self.phase[games] = np.where(~self.playing[games], DONE, np.where(attacked, DEFEND, ROUND_END))
+
+    def round_end(self, games):
+        self.check_winner(games)
+        self.phase[games] = np.where(self.playing[games], ROUND_START, DONE)
+
+    # The same helpers as in DurakGame, on a selection of games
+
+    def abort(self, games):
+        self.aborted[games] = True
+        self.phase[games] = DONE
+
+    def position_hash(self, games):
+        """GameState.position_hash of every game, looked up per byte of the hands."""
+        keys = defender_key_array[self.defender[games]] ^ stockpile_key_array[self.stockpile_size[games]]
+        for seat in range(self.player_count):
+            hands = self.hands[games, seat]
+            for byte in range(HAND_BYTES):
+                keys ^= hand_byte_keys[seat, byte, (hands >> (8 * byte)) & 255]
+        return keys
+
+    def play_attacks(self, games, attackers, playable, max_attack):
+        """The lowest value cpu attack is always a single card, the lowest value card that is playable."""
+        attacking = (playable != 0) & (max_attack > 0)
+        games, attackers = games[attacking], attackers[attacking]
+        cards = lowest_value_cards(playable[attacking], self.trumps[games])
+        self.hands[games, attackers] &= ~(np.int64(1) << cards)
+        self.add_grabbers(games, attackers)
+        self.add_to_table(games, cards)
+        self.check_winner(games)
+
+    def add_to_table(self, games, cards):
+        self.table_attacks[games, self.table_size[games]] = cards
+        self.table_defends[games, self.table_size[games]] = -1
+        self.table_size[games] += 1
+        self.table_ranks[games] |= card_rank_masks[cards]
+
+    def add_grabbers(self, games, seats):
+        self.grabbers[games, self.grabbers_size[games]] = seats
+        self.grabbers_size[games] += 1
+
+    def pop_stockpile(self, games):
+        """Takes the top card of the stockpile of every game, returns them as masks (0 if empty)."""
+        has_cards = self.stockpile_size[games] > 0
+        cards = self.stockpile[games, np.maximum(self.stockpile_size[games] - 1, 0)]
+        self.stockpile_size[games] -= has_cards
+        return np.where(has_cards, np.int64(1) << cards, 0)
+
+    def next_defender(self, games):
+        """The first player in the game after the seat of the defender, going around the table like SeatRing.
+
+        The defender is -1 before the first round, so that is the first player."""
+        seats = (self.defender[games][:, None] + 1 + self.seats) % self.player_count
+        in_game = self.in_game[games[:, None], seats]
+        return seats[np.arange(len(games)), np.argmax(in_game, axis=1)]
+
+    def first_attacker_of_the_round(self, games):
+        """The first player in the game before the defender."""
+        seats = (self.defender[games][:, None] - 1 - self.seats) % self.player_count
+        in_game = self.in_game[games[:, None], seats]
+        return seats[np.arange(len(games)), np.argmax(in_game, axis=1)]
+
+    def flip_next_defender(self, games, grab_cards=True):
+        defenders = self.next_defender(games)
+        self.defender[games] = defenders
+        self.attackers[games] = self.in_game[games] & (self.seats != defenders[:, None])
+
+        if grab_cards:
+            self.grab_cards(games)
+        else:
+            # Only the first time the new defender is in the grabbers is removed
+            grabbers = self.grabbers[games]
+            positions = np.arange(MAX_GRABBERS)
+            matches = (grabbers == defenders[:, None]) & (positions < self.grabbers_size[games][:, None])
+            found = np.any(matches, axis=1)
+            first = np.where(found, np.argmax(matches, axis=1), MAX_GRABBERS)
+            shifted = np.concatenate((grabbers[:, 1:], grabbers[:, -1:]), axis=1)
+            self.grabbers[games] = np.where(positions >= first[:, None], shifted, grabbers)
+            self.grabbers_size[games] -= found
+
+    def grab_cards(self, games):
+        """Every grabber (in order) fills his hand up to the hand size, while there are cards left."""
+        # Once the stockpile is empty nobody grabs cards anymore, so the grabbers can always be cleared
+        with_cards = games[self.stockpile_size[games] > 0]
+        for position in range(MAX_GRABBERS):
+            grabbing = with_cards[position < self.grabbers_size[with_cards]]
+            if not len(grabbing):
+                break
+            seats = self.grabbers[grabbing, position]
+            missing = self.rules.hand_size - popcount(self.hands[grabbing, seats])
+            for card_number in range(self.rules.hand_size):
+                taking = missing > card_number
+                self.hands[grabbing[taking], seats[taking]] |= self.pop_stockpile(grabbing[taking])
+        self.grabbers_size[games] = 0
+
+    def check_winner(self, games):
+        """Removes the players without cards from the game, in seat order."""
+        for seat in range(self.player_count):
+            removed = self.in_game[games, seat] & (self.hands[games, seat] == 0)
+            if np.any(removed):
+                rows = games[removed]
+                self.in_game[rows, seat] = False
+                self.finish_order[rows, self.finish_size[rows]] = seat
+                self.finish_size[rows] += 1
+        self.check_loser(games)
+
+    def check_loser(self, games):
+        players_left = np.sum(self.in_game[games], axis=1)
+        ended = games[players_left < 2]
+        self.playing[ended] = False
+        lost = games[players_left == 1]
+        self.durak[lost] = np.argmax(self.in_game[lost], axis=1)
+
+    def first_defence(self, games):
+        """The first defence DurakGameRules would give: per undefended attack slot the defending card (-1 if none).
+
+        Goes over the attacks in table order and gives every attack the lowest card
+        for which the remaining attacks can still be defended. All -1 if the table can't be defended."""
+        defenders = self.defender[games]
+        hands = self.hands[games, defenders]
+        trumps = self.trumps[games]
+        slots = np.max(self.table_size[games] - self.defended_size[games], initial=0)
+        candidates = np.zeros((len(games), slots), dtype=np.int64)
+        for slot in range(slots):
+            position = self.defended_size[games] + slot
+            active = position < self.table_size[games]
+            attacks = self.table_attacks[games, np.minimum(position, MAX_TABLE - 1)]
+            candidates[:, slot] = np.where(active, hands & beats_array[trumps, np.maximum(attacks, 0)],
+                                           phantom_bits[slot])
+
+        defences = np.full((len(games), MAX_UNDEFENDED), -1, dtype=np.int64)
+        used = np.zeros(len(games), dtype=np.int64)
+        possible = np.flatnonzero(can_defend(candidates, ~used, 0))
+        for slot in range(slots):
+            pending = possible
+            remaining = candidates[pending, slot] & ~used[pending]
+            while len(pending):
+                card_bits = remaining & -remaining
+                fits = can_defend(candidates[pending], ~(used[pending] | card_bits), slot + 1)
+                accepted = pending[fits]
+                used[accepted] |= card_bits[fits]
+                real = card_bits[fits] < phantom_bits[0]
+                defences[accepted[real], slot] = lowest_bit_index(card_bits[fits][real])
+                pending, remaining = pending[~fits], remaining[~fits] & ~card_bits[~fits]
+        return defences
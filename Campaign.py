@@ -0,0 +1,284 @@
+"""Long simulation campaigns split into shards, played by any number of workers on one or more machines.
+
+A campaign is a directory with the settings in campaign.json and a shard per shard_size games.
+Shard n plays the same games as chunk n of a tournament with chunk_size = shard_size (see tournament.play_chunk),
+so the merged campaign gives exactly the stats of that tournament.
+
+The queue is the directory itself, so it also works for machines that share it (over NFS for example):
+    claims/<n>      a worker claims shard n by creating this file, only one worker can create it
+    results/<n>     the GameStats of shard n, written at once when the shard is done
+
+A claim holds the id of its worker, who touches it every lease / 4 seconds while playing the shard.
+A claim older than the lease (a worker that crashed or was stopped) is taken over by the next worker,
+so a crash only loses the shards that were being played. Shards that are done are never played again.
+A worker only renews or removes a claim that still holds its own id, and stops playing a shard it lost.
+
+usage: python Campaign.py create DIR --strategies lowest_value endgame --games 100000000 --players 4
+       python Campaign.py work DIR --workers 8          run this on every machine that helps
+       python Campaign.py status DIR
+       python Campaign.py merge DIR --output stats.json
+"""
+import json
+import os
+import socket
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, path
+from time import perf_counter, time
+from uuid import uuid4
+
+from Cards import DECK_SIZE
+from DurakGameRules import check_player_count, Rules, HAND_SIZE, TABLE_CAP
+from Player import strategies
+from Statistics import GameStats
+from tournament import play_chunk
+
+LEASE = 3600    # Seconds after which the claim of a shard is taken over
+
+
+class ClaimLost(Exception):
+    """Raised while playing a shard whose claim was taken over by another worker."""
+
+
+class Campaign:
+    """The campaign in directory, see the module docstring."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        settings_path = path.join(directory, "campaign.json")
+        if not path.exists(settings_path):
+            raise ValueError(f"{directory} is not a campaign, make it with: python Campaign.py create {directory}")
+        with open(settings_path) as file:
+            self.settings = json.load(file)
+        self.rules = Rules(**self.settings["rules"])
+        games, shard_size = self.settings["games"], self.settings["shard_size"]
+        self.shard_count = (games + shard_size - 1) // shard_size
+
+    @classmethod
+    def create(cls, directory, strategy_names, games, player_count, seed=0, shard_size=10_000, weights=None,
+               rules: Rules = None):
+        """Makes the campaign directory, or opens it if it already holds the same campaign."""
+        rules = rules if rules else Rules()
+        check_player_count(player_count, rules)
+        for name in strategy_names:
+            if name not in strategies:
+                raise ValueError(f"Unknown strategy '{name}', choose from {list(strategies)}.")
+        settings = {"strategies": list(strategy_names), "games": games, "players": player_count, "seed": seed,
+                    "shard_size": shard_size, "weights": weights, "rules": rules.to_dict()}
+        os.makedirs(path.join(directory, "claims"), exist_ok=True)
+        os.makedirs(path.join(directory, "results"), exist_ok=True)
+        settings_path = path.join(directory, "campaign.json")
+        if path.exists(settings_path):
+            campaign = cls(directory)
+            if campaign.settings != settings:
+                raise ValueError(f"{directory} holds another campaign: {campaign.settings}")
+            return campaign
+        temporary = f"{settings_path}.{uuid4().hex}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(settings, file, indent=2)
+        os.replace(temporary, settings_path)
+        return cls(directory)
+
+    def claim_path(self, shard):
+        return path.join(self.directory, "claims", str(shard))
+
+    def result_path(self, shard):
+        return path.join(self.directory, "results", f"{shard}.json")
+
+    def done(self, shard):
+        return path.exists(self.result_path(shard))
+
+    def stale(self, claim, lease):
+        try:
+            return time() - path.getmtime(claim) > lease
+        except FileNotFoundError:
+            return False
+
+    def owner(self, claim):
+        """The worker in the claim file, None if there is no claim."""
+        try:
+            with open(claim) as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def claim(self, shard, worker, lease=LEASE):
+        """Claims the shard for worker, returns False if another worker has it."""
+        claim = self.claim_path(shard)
+        try:
+            descriptor = os.open(claim, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            owner = self.owner(claim)
+            if owner is None or not self.stale(claim, lease):
+                return False
+            # Only one worker can move the stale claim away, that one gets to claim the shard
+            moved = f"{claim}.{uuid4().hex}.stale"
+            try:
+                os.rename(claim, moved)
+            except FileNotFoundError:
+                return False
+            if self.owner(moved) != owner or not self.stale(moved, lease):
+                # Another worker took the stale claim over between the check and the rename, give its claim back
+                try:
+                    os.link(moved, claim)
+                except FileExistsError:
+                    pass
+                os.remove(moved)
+                return False
+            os.remove(moved)
+            return self.claim(shard, worker, lease)
+        with os.fdopen(descriptor, "w") as file:
+            file.write(worker)
+        return True
+
+    def renew(self, shard, worker):
+        """Touches the claim of worker, raises ClaimLost if the shard was taken over."""
+        claim = self.claim_path(shard)
+        if self.owner(claim) != worker:
+            raise ClaimLost(f"Shard {shard} was taken over from {worker}")
+        os.utime(claim)
+
+    def release(self, shard, worker):
+        """Removes the claim of worker, a claim of another worker is left alone."""
+        claim = self.claim_path(shard)
+        if self.owner(claim) == worker:
+            try:
+                os.remove(claim)
+            except FileNotFoundError:
+                pass
+
+    def play(self, shard, progress=None):
+        """Plays the games of the shard, returns their GameStats. progress is called after every game."""
+        settings = self.settings
+        first_game = shard * settings["shard_size"]
+        games = min(settings["shard_size"], settings["games"] - first_game)
+        return play_chunk(settings["strategies"], settings["players"], settings["seed"], shard, first_game, games,
+                          weights=settings["weights"], rules=self.rules, progress=progress)
+
+    def heartbeat(self, shard, worker, lease):
+        """A progress function for play that renews the claim every lease / 4 seconds."""
+        renewed = time()
+
+        def beat():
+            nonlocal renewed
+            if time() - renewed > lease / 4:
+                self.renew(shard, worker)
+                renewed = time()
+        return beat
+
+    def work(self, worker=None, lease=LEASE, max_shards=None, report=print):
+        """Claims and plays shards until every shard is done or claimed, returns the number of shards played.
+
+        The result of a shard is saved before its claim is removed, so a crash never loses a finished shard."""
+        worker = worker if worker else f"{socket.gethostname()}:{os.getpid()}"
+        played = 0
+        for shard in range(self.shard_count):
+            if max_shards is not None and played >= max_shards:
+                break
+            if self.done(shard) or not self.claim(shard, worker, lease):
+                continue
+            if self.done(shard):
+                # Finished by another worker between the check and the claim
+                self.release(shard, worker)
+                continue
+            start = perf_counter()
+            try:
+                stats = self.play(shard, self.heartbeat(shard, worker, lease))
+            except ClaimLost as lost:
+                if report:
+                    report(lost)
+                continue
+            seconds = perf_counter() - start
+            stats.save(self.result_path(shard), shard=shard, worker=worker, seconds=seconds)
+            self.release(shard, worker)
+            played += 1
+            if report:
+                report(f"Shard {shard} ({stats.games} games) done by {worker} in {seconds:.1f}s")
+        return played
+
+    def status(self, lease=LEASE):
+        """The number of shards that are done, being played, claimed by a stopped worker, and still to play."""
+        counts = {"done": 0, "playing": 0, "stale": 0, "waiting": 0}
+        for shard in range(self.shard_count):
+            if self.done(shard):
+                counts["done"] += 1
+            elif path.exists(self.claim_path(shard)):
+                counts["stale" if self.stale(self.claim_path(shard), lease) else "playing"] += 1
+            else:
+                counts["waiting"] += 1
+        return counts
+
+    def merge(self):
+        """The GameStats of all done shards merged in shard order, and the number of shards that are missing."""
+        stats = GameStats(self.settings["players"], self.settings["strategies"])
+        missing = 0
+        for shard in range(self.shard_count):
+            if not self.done(shard):
+                missing += 1
+                continue
+            shard_stats, _ = GameStats.load(self.result_path(shard))
+            stats.merge(shard_stats)
+        return stats, missing
+
+
+def work(directory, lease=LEASE, max_shards=None):
+    """One worker process, for run_workers."""
+    return Campaign(directory).work(lease=lease, max_shards=max_shards)
+
+
+def run_workers(directory, workers=None, lease=LEASE, max_shards=None):
+    """Runs workers processes on the campaign until no shard is left, returns the number of shards played.
+
+    With 1 worker everything runs in this process."""
+    workers = workers if workers else cpu_count()
+    if workers == 1:
+        return work(directory, lease, max_shards)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(work, [directory] * workers, [lease] * workers, [max_shards] * workers))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Run a simulation campaign in shards, over many workers and machines.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create", help="Make a new campaign directory")
+    create.add_argument("directory")
+    create.add_argument("--strategies", nargs="+", default=["lowest_value"], choices=list(strategies))
+    create.add_argument("--games", type=int, required=True)
+    create.add_argument("--players", type=int, default=4)
+    create.add_argument("--seed", type=int, default=0)
+    create.add_argument("--shard-size", type=int, default=10_000)
+    create.add_argument("--weights", help="The .npz weights of the evaluated strategy, on a path every worker can read")
+    create.add_argument("--deck-size", type=int, default=DECK_SIZE, help="36, 24 or 52 cards")
+    create.add_argument("--hand-size", type=int, default=HAND_SIZE)
+    create.add_argument("--table-cap", type=int, default=TABLE_CAP, help="The most attacks in one round")
+    work_parser = commands.add_parser("work", help="Play shards until none is left")
+    work_parser.add_argument("directory")
+    work_parser.add_argument("--workers", type=int, default=None)
+    work_parser.add_argument("--lease", type=float, default=LEASE, help="Seconds before a claim is taken over")
+    work_parser.add_argument("--max-shards", type=int, default=None, help="The most shards per worker")
+    status = commands.add_parser("status", help="Show how far the campaign is")
+    status.add_argument("directory")
+    status.add_argument("--lease", type=float, default=LEASE)
+    merge = commands.add_parser("merge", help="Merge the results of the done shards")
+    merge.add_argument("directory")
+    merge.add_argument("--output", help="Save the merged stats to this file")
+    args = parser.parse_args()
+
+    if args.command == "create":
+        rules = Rules(args.deck_size, args.hand_size, args.table_cap)
+        campaign = Campaign.create(args.directory, args.strategies, args.games, args.players, args.seed,
+                                   args.shard_size, args.weights, rules)
+        print(f"{args.directory}: {campaign.shard_count} shards of {args.shard_size} games")
+    elif args.command == "work":
+        print(f"Played {run_workers(args.directory, args.workers, args.lease, args.max_shards)} shards")
+    elif args.command == "status":
+        campaign = Campaign(args.directory)
+        counts = campaign.status(args.lease)
+        print(f"Shards: {campaign.shard_count},    " + ",    ".join(f"{name}: {count}" for name, count in counts.items()))
+    else:
+        stats, missing = Campaign(args.directory).merge()
+        if missing:
+            print(f"{missing} shards aren't done yet, these stats are without them\n")
+        print(stats)
+        if args.output:
+            stats.save(args.output, campaign=Campaign(args.directory).settings, missing=missing)
@@ -1,7 +1,93 @@
-from random import shuffle
+from random import Random
 
 suits = {1: "Clubs", 2: "Diamonds", 3: "Hearts", 4: "Spades"}
-ranks = {6: "6", 7: "7", 8: "8", 9: "9", 10: "10", 11: "Jack", 12: "Queen", 13: "King", 14: "Ace"}
+ranks = {2: "2", 3: "3", 4: "4", 5: "5", 6: "6", 7: "7", 8: "8", 9: "9", 10: "10",
+         11: "Jack", 12: "Queen", 13: "King", 14: "Ace"}
+# The deck sizes that can be played, with the lowest rank in the deck
+deck_sizes = {24: 9, 36: 6, 52: 2}
+DECK_SIZE = 36
+
+# Every card of the full 52 card deck is one bit in an int: bit (suit - 1) * 13 + the position of the rank in ranks.
+# A set of cards (a hand, the ranks on the table) is then a single int mask, smaller decks just leave bits unused.
+rank_positions = {rank: position for position, rank in enumerate(ranks)}
+
+
+def card_index(suit, rank):
+    return (suit - 1) * len(ranks) + rank_positions[rank]
+
+
+suit_masks = {suit: sum(1 << card_index(suit, rank) for rank in ranks) for suit in suits}
+rank_masks = {rank: sum(1 << card_index(suit, rank) for suit in suits) for rank in ranks}
+# All cards with a higher rank than the key
+higher_rank_masks = {rank: sum(rank_masks[r] for r in ranks if r > rank) for rank in ranks}
+# The ranks of a mask folded into len(ranks) bits (rank_bits), and spread out over the suits again
+rank_bits_mask = (1 << len(ranks)) - 1
+suit_spread = sum(1 << card_index(suit, min(ranks)) for suit in suits)
+
+
+def build_trump_tables(trump_suit):
+    """Returns three lists for the trump suit, indexed by card index:
+        the mask of all cards that beat the card,
+        the card values: the rank of the card, except for the trump cards, they are rank + 20,
+        the sort keys: on value (non trump cards first), then on suit."""
+    beats_table, values, sort_keys = [], [], []
+    for suit in suits:
+        for rank in ranks:
+            beats = suit_masks[suit] & higher_rank_masks[rank]  # Same suit, higher rank
+            value = rank
+            if suit == trump_suit:
+                value += 20
+            else:
+                beats |= suit_masks[trump_suit]  # Trump card to non trump suit
+            beats_table.append(beats)
+            values.append(value)
+            sort_keys.append(value * len(suits) + suit)
+    return beats_table, values, sort_keys
+
+
+# The lookup tables for every trump suit, built once when Cards is imported
+trump_tables = {trump_suit: build_trump_tables(trump_suit) for trump_suit in suits}
+beats_masks = {trump_suit: tables[0] for trump_suit, tables in trump_tables.items()}
+card_values = {trump_suit: tables[1] for trump_suit, tables in trump_tables.items()}
+card_sort_keys = {trump_suit: tables[2] for trump_suit, tables in trump_tables.items()}
+# Per trump suit the card indices in sort key order, and the position of every card index in that order
+sort_orders = {trump_suit: sorted(range(len(keys)), key=keys.__getitem__) for trump_suit, keys in card_sort_keys.items()}
+sort_positions = {trump_suit: [order.index(index) for index in range(len(order))]
+                  for trump_suit, order in sort_orders.items()}
+
+
+def cards_to_mask(cards):
+    if isinstance(cards, Hand):
+        return cards.mask
+    mask = 0
+    for card in cards:
+        mask |= card.bit
+    return mask
+
+
+def mask_to_cards(mask, cards: list = None):
+    """Returns the cards in the mask.
+
+    If cards is given they are taken in the order of that list, otherwise in card index order."""
+    if cards is not None:
+        return [card for card in cards if card.bit & mask]
+    found = []
+    while mask:
+        bit = mask & -mask
+        found.append(all_cards[bit.bit_length() - 1])
+        mask ^= bit
+    return found
+
+
+def rank_bits(mask):
+    """The ranks of the cards in the mask, as one bit per rank position (lowest rank first)."""
+    shift = len(ranks)
+    return (mask | mask >> shift | mask >> 2 * shift | mask >> 3 * shift) & rank_bits_mask
+
+
+def ranks_in_mask(mask):
+    """Returns the mask of all cards that share a rank with a card in the given mask."""
+    return rank_bits(mask) * suit_spread
 
 
 def get_rank(card):
@@ -12,40 +98,81 @@ def get_suit(card):
     return card.suit
 
 
-def get_value(cards: list):
-    return sum(card.value for card in cards)
+def get_value(cards: list, trump_suit):
+    """Sum of the card values, the values depend on the trump suit."""
+    values = card_values[trump_suit]
+    return sum(values[card.index] for card in cards)
 
 
 class Card:
-    """The card object, they should all have a unique suit and rank combination."""
+    """The card object, there is only one card object for every suit and rank combination.
+
+    Card(suit, rank) always returns that same object and cards can't be changed,
+    so all games share the same 52 cards.
+    The value of a card depends on the trump suit, so it is looked up in card_values."""
+    __slots__ = ("suit", "rank", "index", "bit")
+    pool = {}  # card index -> the card object
+
+    def __new__(cls, suit, rank):
+        index = card_index(suit, rank)
+        card = cls.pool.get(index)
+        if card is None:
+            card = super().__new__(cls)
+            object.__setattr__(card, "suit", suit)  #1-clubs, 2-diamonds, 3-hearts, 4-spades
+            object.__setattr__(card, "rank", rank)  #2 - 10, 11-jack, 12-queen, 13-king, 14-ace
+            object.__setattr__(card, "index", index)
+            object.__setattr__(card, "bit", 1 << index)
+            cls.pool[index] = card
+        return card
 
-    def __init__(self, suit, rank):
-        self.suit = suit  #1-clubs, 2-diamonds, 3-hearts, 4-spades
-        self.rank = rank  #2 - 10, 11-jack, 12-queen, 13-king, 14-ace
-        self.value = None #Card value is given by the Deck, after the trumpcard was chosen
+    def __setattr__(self, name, value):
+        raise AttributeError("Cards can't be changed.")
+
+    def __reduce__(self):
+        # Unpickling gives the same card object again
+        return Card, (self.suit, self.rank)
 
     def __repr__(self):
         return f"{ranks[self.rank]} of {suits[self.suit]}"
 
 
+# All cards, in card index order
+all_cards = [Card(suit, rank) for suit in suits for rank in ranks]
+
+
+def deck_cards(deck_size: int = DECK_SIZE):
+    """The cards of a deck of deck_size cards, in card index order."""
+    if deck_size not in deck_sizes:
+        raise ValueError(f"Can't play with a deck of {deck_size} cards, choose from {list(deck_sizes)}.")
+    return [card for card in all_cards if card.rank >= deck_sizes[deck_size]]
+
+
 class Deck:
     """Handles everything to do with the deck.
 
     Holds the stockpile, where the cards are grabbed from.
     the lowest card in the stockpile becomes the trumpcard.
-    Assigns values to the cards."""
-    stockpile = []
+    A seeded random.Random can be given as rng, so the shuffle is reproducible.
+    size is the number of cards, see deck_sizes."""
+    stockpile: list = None
     trumpcard = None
 
-    def __init__(self):
-        """Initializes the cards - Get the trumpcard - Assign the value to the cards"""
-        for suit in suits.keys():
-            for rank in ranks.keys():
-                card = Card(suit, rank)
-                self.stockpile.append(card)
-        shuffle(self.stockpile)
+    def __init__(self, rng: Random = None, size: int = DECK_SIZE):
+        """Initializes the cards - Get the trumpcard"""
+        self.rng = rng if rng else Random()
+        self.cards = deck_cards(size)
+        self.stockpile = []
+        self.reset()
+
+    def reset(self, seed=None):
+        """Puts all cards back in the stockpile and shuffles it again, the stockpile list is reused.
+
+        If a seed is given the rng is seeded with it first."""
+        if seed is not None:
+            self.rng.seed(seed)
+        self.stockpile[:] = self.cards
+        self.rng.shuffle(self.stockpile)
         self.trumpcard = self.stockpile[0]
-        self.assign_card_values()
 
     def __repr__(self):
         represent = ""
@@ -65,11 +192,91 @@ class Deck:
             return_cards.append(self.stockpile.pop())
         return return_cards
 
-    def assign_card_values(self):
-        """card value is the rank of the card, except for the trump cards, they are rank + 20"""
-        for card in self.stockpile:
-            if card.suit == self.trumpcard.suit:
-                card.value = card.rank + 20
-            else:
-                card.value = card.rank
 
+class Hand:
+    """The cards of a player, as a card mask, so membership and the cards of a rank or suit are one lookup.
+
+    Next to the mask it keeps sorted_mask: one bit per card at its position in the sort order of the trump suit
+    (on value, the trump cards last, see card_sort_keys). Adding or removing a card sets or clears one bit
+    in both, and iterating goes over the bits of sorted_mask, so the hand is always in sorted order
+    without ever sorting it. It can be used like the list of cards it replaces (len, in, iterating, extend)."""
+
+    def __init__(self, cards=(), trump_suit=None):
+        self.mask = 0
+        self.sorted_mask = 0
+        self.trump = None
+        self.order = self.positions = None
+        self.set_trump(trump_suit)
+        self.extend(cards)
+
+    def set_trump(self, trump_suit):
+        """Changes the sort order to the one of trump_suit, card index order without a trump suit."""
+        self.trump = trump_suit
+        if trump_suit is None:
+            self.order = self.positions = range(len(all_cards))
+        else:
+            self.order = sort_orders[trump_suit]
+            self.positions = sort_positions[trump_suit]
+        self.sorted_mask = 0
+        for card in mask_to_cards(self.mask):
+            self.sorted_mask |= 1 << self.positions[card.index]
+
+    def add(self, card):
+        self.mask |= card.bit
+        self.sorted_mask |= 1 << self.positions[card.index]
+
+    def extend(self, cards):
+        mask, sorted_mask, positions = self.mask, self.sorted_mask, self.positions
+        for card in cards:
+            mask |= card.bit
+            sorted_mask |= 1 << positions[card.index]
+        self.mask, self.sorted_mask = mask, sorted_mask
+
+    def remove_cards(self, cards):
+        """Takes the cards out of the hand, the cards that aren't in it are skipped."""
+        mask, sorted_mask, positions = self.mask, self.sorted_mask, self.positions
+        for card in cards:
+            if mask & card.bit:
+                mask ^= card.bit
+                sorted_mask ^= 1 << positions[card.index]
+        self.mask, self.sorted_mask = mask, sorted_mask
+
+    def rank_cards(self, rank):
+        """The cards of the rank in the hand."""
+        return mask_to_cards(self.mask & rank_masks[rank])
+
+    def suit_cards(self, suit):
+        """The cards of the suit in the hand."""
+        return mask_to_cards(self.mask & suit_masks[suit])
+
+    def ranks(self):
+        """The mask of all cards that share a rank with a card in the hand, see ranks_in_mask."""
+        return ranks_in_mask(self.mask)
+
+    def copy(self):
+        hand = Hand.__new__(Hand)
+        hand.mask, hand.sorted_mask = self.mask, self.sorted_mask
+        hand.trump, hand.order, hand.positions = self.trump, self.order, self.positions
+        return hand
+
+    def __contains__(self, card):
+        return bool(self.mask & card.bit)
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __iter__(self):
+        """The cards in sorted order."""
+        sorted_mask, order = self.sorted_mask, self.order
+        while sorted_mask:
+            bit = sorted_mask & -sorted_mask
+            yield all_cards[order[bit.bit_length() - 1]]
+            sorted_mask ^= bit
+
+    def __eq__(self, other):
+        if isinstance(other, Hand):
+            return self.mask == other.mask
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Hand({list(self)})"
@@ -0,0 +1,247 @@
+"""A reinforcement learning environment: one agent plays a seat, one decision per step.
+
+The game is a GameState, so it can stop at every decision of the agent instead of running a whole
+round like DurakGame.handle_round. The actions are the moves of GameState.legal_moves, which come from the
+same generators as possible_attacks and possible_defends and in the same order.
+Taking the cards (or passing) is always the last action.
+
+    env = DurakEnv(player_count=2)
+    observation, mask = env.reset(seed=0)
+    while True:
+        observation, mask, reward, done = env.step(mask.nonzero()[0][0])
+        if done:
+            break
+
+The reward is 1 when the agent gets rid of its cards without being the Durak, -1 for the Durak
+and 0 for a game that is stopped after max_rounds. Until then every step gives 0.
+VectorDurakEnv steps many environments per call, optionally spread over worker processes.
+The observations and masks that are returned are new arrays, so they can be stored (in a replay buffer for example).
+"""
+from multiprocessing import Pipe, Process
+from random import Random
+
+import numpy as np
+
+from Cards import all_cards
+from DurakGameRules import check_player_count, Rules, standard_rules, MAX_PLAYERS
+from GameState import GameState, FIRST_ATTACK, DEFENCE, EXTRA_ATTACKS, GAME_OVER
+from ISMCTS import lowest_value_move
+
+MAX_ACTIONS = 256   # Moves after this are left out, except the last one (taking or passing)
+
+# The parts of an observation, in this order
+card_planes = ("hand", "undefended", "defended", "defences", "out_of_game")
+OBSERVATION_SIZE = len(card_planes) * len(all_cards) + 4 + 1 + MAX_PLAYERS * 4 + 3
+
+
+card_bit_values = 1 << np.arange(len(all_cards), dtype=np.int64)
+
+
+def card_bits(mask):
+    """The mask (or an array of masks) as booleans per card, in card index order."""
+    return (mask & card_bit_values) != 0
+
+
+def observe(state: GameState, seat: int, out: np.ndarray = None):
+    """What the player in seat can see, as a float32 vector of OBSERVATION_SIZE.
+
+    Per card: its own hand, the undefended and defended attacks, the defences and the cards out of the game.
+    Then the trump suit, the stockpile size, per seat (starting at seat) the hand size, if it is still in the game,
+    the defender and an attacker, and the phase."""
+    out = np.zeros(OBSERVATION_SIZE, dtype=np.float32) if out is None else out
+    out[:] = 0
+    undefended = defended = defences = 0
+    for attack, defence in state.table:
+        if defence == -1:
+            undefended |= 1 << attack
+        else:
+            defended |= 1 << attack
+            defences |= 1 << defence
+    in_play = state.table_mask
+    for hand in state.hands:
+        in_play |= hand
+    for card in state.stockpile[:state.stockpile_size]:
+        in_play |= 1 << card
+    masks = (state.hands[seat], undefended, defended, defences, state.rules.deck_mask & ~in_play)
+    cards = len(all_cards)
+    out[:len(card_planes) * cards] = card_bits(np.array(masks, dtype=np.int64)[:, None]).ravel()
+
+    position = len(card_planes) * cards
+    out[position + state.trump - 1] = 1
+    out[position + 4] = state.stockpile_size / cards
+    position += 5
+    for offset in range(state.player_count):
+        other = (seat + offset) % state.player_count
+        out[position:position + 4] = (state.hands[other].bit_count() / cards, state.in_game[other],
+                                      other == state.defender, other in state.attackers)
+        position += 4
+    position = OBSERVATION_SIZE - 3
+    if state.phase in (FIRST_ATTACK, DEFENCE, EXTRA_ATTACKS):
+        out[position + state.phase] = 1
+    return out
+
+
+class DurakEnv:
+    """One game with the agent in seat, the other seats play opponent(state) -> move, with the rules."""
+
+    def __init__(self, player_count: int = 2, seat: int = 0, opponent=lowest_value_move,
+                 max_actions: int = MAX_ACTIONS, rules: Rules = None):
+        self.rules = rules if rules else standard_rules
+        check_player_count(player_count, self.rules)
+        self.player_count = player_count
+        self.seat = seat
+        self.opponent = opponent
+        self.max_actions = max_actions
+        self.state = None
+        self.moves = []
+        # Written on every step, VectorDurakEnv points them at its rows of the stacked arrays
+        self.observation = np.zeros(OBSERVATION_SIZE, dtype=np.float32)
+        self.mask = np.zeros(max_actions, dtype=bool)
+
+    def reset(self, seed=None):
+        """Deals a new game and plays until the agent has to decide, returns (observation, mask)."""
+        self.deal(seed)
+        return self.observe()
+
+    def step(self, action_index: int):
+        """Plays the action of the agent and the moves of the opponents after it.
+
+        Returns (observation, mask, reward, done)."""
+        reward, done = self.act(action_index)
+        observation, mask = self.observe()
+        return observation, mask, reward, done
+
+    def deal(self, seed=None):
+        """reset, but the observation and the mask are only written to self.observation and self.mask."""
+        self.state = GameState.new(self.player_count, seed, self.rules)
+        self.play_opponents()
+        self.update()
+
+    def act(self, action_index: int):
+        """step, but the observation and the mask are only written to self.observation and self.mask.
+
+        Returns (reward, done)."""
+        if not self.mask[action_index]:
+            raise ValueError(f"Action {action_index} isn't legal, only {np.flatnonzero(self.mask)} are.")
+        self.state.apply(self.moves[action_index], undoable=False)
+        self.play_opponents()
+        self.update()
+        return self.reward(), self.done()
+
+    def play_opponents(self):
+        state = self.state
+        while not self.done() and state.to_move() != self.seat:
+            state.apply(self.opponent(state), undoable=False)
+
+    def done(self):
+        """The agent is done when it is out of the game, it can't become the Durak anymore then."""
+        return self.state.phase == GAME_OVER or not self.state.in_game[self.seat]
+
+    def reward(self):
+        if not self.done():
+            return 0.0
+        if self.state.durak == self.seat:
+            return -1.0
+        if not self.state.in_game[self.seat]:
+            return 1.0
+        return 0.0
+
+    def observe(self):
+        """Copies of the observation and the mask, they don't change with the next step."""
+        return self.observation.copy(), self.mask.copy()
+
+    def update(self):
+        """Writes the observation and the legal actions of the agent to self.observation and self.mask."""
+        moves = self.state.legal_moves() if not self.done() else []
+        if len(moves) > self.max_actions:
+            moves = moves[:self.max_actions - 1] + moves[-1:]
+        self.moves = moves
+        self.mask[:] = False
+        self.mask[:len(moves)] = True
+        observe(self.state, self.seat, self.observation)
+
+
+class VectorDurakEnv:
+    """Steps count environments at once, games that are done are reset right away (auto-reset).
+
+    The results are new stacked arrays: observations [count, OBSERVATION_SIZE], masks [count, max_actions],
+    rewards and dones [count]. When a game is done its reward and done flag belong to the finished game,
+    its observation and mask already to the new one.
+    With workers > 0 the environments are spread over that many processes.
+    Every environment gets its own seed stream from (seed, environment number)."""
+
+    def __init__(self, count: int, player_count: int = 2, seed=0, workers: int = 0, **options):
+        self.count = count
+        self.workers = []
+        if workers:
+            splits = np.array_split(np.arange(count), workers)
+            for split in splits:
+                parent, child = Pipe()
+                process = Process(target=vector_worker, args=(child, split.tolist(), player_count, seed, options),
+                                  daemon=True)
+                process.start()
+                self.workers.append((parent, process))
+            self.envs = []
+        else:
+            self.envs = [DurakEnv(player_count, **options) for _ in range(count)]
+            self.seed_streams = [Random(f"{seed}:{number}") for number in range(count)]
+            max_actions = options.get("max_actions", MAX_ACTIONS)
+            self.observations = np.zeros((count, OBSERVATION_SIZE), dtype=np.float32)
+            self.masks = np.zeros((count, max_actions), dtype=bool)
+            self.rewards = np.zeros(count, dtype=np.float32)
+            self.dones = np.zeros(count, dtype=bool)
+            for number, env in enumerate(self.envs):
+                # Every environment writes straight into its rows
+                env.observation, env.mask = self.observations[number], self.masks[number]
+
+    def reset(self):
+        """Returns (observations, masks)."""
+        if self.workers:
+            return self.gather("reset")[:2]
+        for number, env in enumerate(self.envs):
+            env.deal(self.seed_streams[number].getrandbits(64))
+        self.dones[:] = False
+        return self.observations.copy(), self.masks.copy()
+
+    def step(self, actions):
+        """Returns (observations, masks, rewards, dones)."""
+        if self.workers:
+            splits = np.array_split(np.asarray(actions), len(self.workers))
+            for (connection, _), split in zip(self.workers, splits):
+                connection.send(("step", split))
+            return self.collect()
+        for number, env in enumerate(self.envs):
+            self.rewards[number], self.dones[number] = env.act(actions[number])
+            if self.dones[number]:
+                env.deal(self.seed_streams[number].getrandbits(64))
+        return self.observations.copy(), self.masks.copy(), self.rewards.copy(), self.dones.copy()
+
+    def gather(self, command):
+        for connection, _ in self.workers:
+            connection.send((command, None))
+        return self.collect()
+
+    def collect(self):
+        results = [connection.recv() for connection, _ in self.workers]
+        return tuple(np.concatenate(parts) for parts in zip(*results))
+
+    def close(self):
+        for connection, process in self.workers:
+            connection.send(("close", None))
+            process.join()
+        self.workers = []
+
+
+def vector_worker(connection, numbers, player_count, seed, options):
+    """Runs the environments numbers of a VectorDurakEnv in a worker process."""
+    envs = VectorDurakEnv(len(numbers), player_count, **options)
+    envs.seed_streams = [Random(f"{seed}:{number}") for number in numbers]
+    while True:
+        command, actions = connection.recv()
+        if command == "reset":
+            envs.reset()
+        elif command == "step":
+            envs.step(actions)
+        else:
+            break
+        connection.send((envs.observations, envs.masks, envs.rewards, envs.dones))
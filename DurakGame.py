@@ -1,49 +1,179 @@
+from random import Random
+from time import perf_counter
+
+import Metrics
+
 from Cards import Deck
+from Human_inputs import ConsoleIO
+from GameRecord import GameRecorder, ATTACK, PASS, DEFEND, DIVERT, TAKE, GRAB, ROUND, END
+from Observation import Observation
 from Player import Player
-from DurakGameRules import check_player_count
+from SeatRing import SeatRing
+from DurakGameRules import check_player_count, Rules, standard_rules
+from GameState import position_hash
+
+
+class GameResult:
+    """The outcome of one finished game, returned by DurakGame.play()."""
+    seed = None
+    player_count: int = None
+    durak: int = None           # player_id of the loser, None if nobody lost (see DurakGame.play)
+    finish_order: list = None   # player_ids in the order they got rid of their cards
+    rounds: int = None
+    aborted: bool = False       # Stopped before the end, because it went round in circles (see DurakGame.play)
+
+    def __init__(self, seed, player_count, durak, finish_order, rounds, aborted=False):
+        self.seed = seed
+        self.player_count = player_count
+        self.durak = durak
+        self.finish_order = finish_order
+        self.rounds = rounds
+        self.aborted = aborted
+
+    def __repr__(self):
+        return (f"GameResult(seed={self.seed}, durak={self.durak}, finish_order={self.finish_order}, "
+                f"rounds={self.rounds}, aborted={self.aborted})")
 
 
 class DurakGame:
-    """Class to handle all the rounds in the card game."""
+    """Class to handle all the rounds in the card game.
+
+    With headless=True every player is a cpu, nothing is printed or asked,
+    and the game only starts when play() is called.
+    ios gives the human seats and how to talk to them: {player_id: io}, see Human_inputs.ConsoleIO.
+    By default seat 0 is a human in the terminal, unless the game is headless.
+    strategies optionally gives the (attack, defend) strategy for every seat.
+    A deck can be given to reuse it, it is reset with the seed instead of building a new one.
+    With record=True every event of the game is kept in recorder, see GameRecord.
+    rules changes the deck and hand size, the most attacks in a round and the most players (see DurakGameRules.Rules).
+    Human players always get an Observation of the game, with observe=True the cpu players get one too
+    (cpu players with a strategy that observes always get one)."""
     deck: Deck = None
-    players: list = []                  # A list of players
+    seats: list = None                  # All players by player_id, also the ones that are out of the game
+    ring: SeatRing = None               # The turn order, the player_ids that are still in the game
     defender: Player = None             # The defending player
-    attackers: list = None              # The attacking players, a list of players
-    table: list = []                    # A list of lists representing the cards on table: [attack_card, defend_card]
-    players_to_grab_cards: list = []    # Keeps track of the players that have to grab a card
+    table: list = None                  # A list of lists representing the cards on table: [attack_card, defend_card]
+    players_to_grab_cards: list = None  # Keeps track of the players that have to grab a card
     playing: bool = True                # Turns false whenever there is only 1 player left with cards
     rounds: int = 0                     # Keeps track of how many rounds have been played
+    aborted: bool = False               # If play() stopped the game before it was over
     not_cpu_player: Player = None       # If there is a human player, save him in here
-
-    def __init__(self, player_count: int):
+    human_players: list = None          # All human players, not_cpu_player is the first
+    durak: Player = None                # The loser, set when the game ends
+    finish_order: list = None           # player_ids in the order they went out
+    recorder: GameRecorder = None       # The record of the game, if recording
+    observations: list = None           # The Observations of the players that have one
+    listeners: list = None              # Everything that gets the game events: the recorder and the observations
+
+    def __init__(self, player_count: int, seed=None, headless: bool = False, strategies: list = None,
+                 deck: Deck = None, record: bool = False, ios: dict = None, observe: bool = False,
+                 rules: Rules = None):
         self.player_count = player_count
-        check_player_count(self.player_count)
-
-        self.deck = Deck()
-        self.init_players(6)
-
-        self.handle_rounds()
+        self.rules = rules if rules else standard_rules
+        check_player_count(self.player_count, self.rules)
+        self.seed = seed
+        self.headless = headless
+        if ios is None:
+            ios = {} if headless else {0: ConsoleIO()}
+        self.ios = ios
+        self.strategies = strategies
+        self.observe = observe
+
+        # Every game gets its own state, so multiple games can live in one process
+        self.seats = []
+        self.human_players = []
+        self.table = []
+        self.players_to_grab_cards = []
+        self.finish_order = []
+        self.observations = []
+        self.listeners = []
+
+        if deck:
+            if len(deck.cards) != self.rules.deck_size:
+                raise ValueError(f"The deck has {len(deck.cards)} cards, the rules need {self.rules.deck_size}.")
+            deck.reset(seed)
+            self.deck = deck
+        else:
+            self.deck = Deck(Random(seed), self.rules.deck_size)
+        if record:
+            self.recorder = GameRecorder(seed, player_count, self.deck.stockpile, self.rules)
+            self.listeners.append(self.recorder)
+        self.init_players(self.rules.hand_size)
+
+        if not self.headless:
+            self.handle_rounds()
 
     def handle_rounds(self):
         """The main loop to run the program.
 
         Only ends when playing turns false."""
         while self.playing:
-            print("\nStart new round?")
-            input("> ")
-            self.rounds += 1
-            self.flip_next_defender(grab_cards=True)
-            print(f"Round {self.rounds},    Cards left: {len(self.deck.stockpile)}")
-            self.table = []
+            for player in self.human_players:
+                player.io.write("\nStart new round?")
+                player.io.read()
+            self.start_round()
+            self.tell(f"Round {self.rounds},    Cards left: {len(self.deck.stockpile)}")
 
             self.handle_round()
+        self.game_over()
+
+    def play(self, max_rounds: int = 1000):
+        """Plays the whole game without any input or output and returns a GameResult.
+
+        Only meant for headless games.
+        The same cards can keep going back and forth between players forever.
+        When a round starts in a position the game was in before (see position_hash), the players go round
+        in circles, so the game is aborted without a Durak. With strategies that don't always play the same
+        in the same position (ISMCTS) that isn't certain, but those games are aborted too.
+        As a last resort a game is also aborted after max_rounds rounds."""
+        positions = set()
+        while self.playing:
+            if self.rounds >= max_rounds:
+                self.aborted = True
+                break
+            self.start_round()
+            position = self.position_hash()
+            if position in positions:
+                self.aborted = True
+                break
+            positions.add(position)
+            self.handle_round()
+        self.game_over()
+        return self.result()
+
+    def start_round(self):
+        self.rounds += 1
+        self.flip_next_defender(grab_cards=True)
+        self.table = []
+        if self.listeners:
+            self.event(ROUND, self.defender)
+
+    def game_over(self):
+        if Metrics.active:
+            Metrics.active.game_over(self.rounds)
+        if self.listeners:
+            self.event(END, self.durak)
+
+    def event(self, kind, player: Player = None, cards: list = ()):
+        """Passes an event (see GameRecord) on to the listeners."""
+        for listener in self.listeners:
+            listener.event(kind, player, cards)
+
+    def result(self):
+        durak = self.durak.player_id if self.durak else None
+        return GameResult(self.seed, self.player_count, durak, self.finish_order.copy(), self.rounds, self.aborted)
+
+    def position_hash(self):
+        """The Zobrist hash of the position at the start of a round, see GameState.position_hash."""
+        return position_hash([player.hand.mask for player in self.seats], self.defender.player_id,
+                             len(self.deck.stockpile))
 
     def handle_round(self):
         """Handles one single round, including attacking, defending, diverting.
 
         Ends when there is a Durak (loser),
         or no new cards are played,
-        or the maximum number of attacks are played (6).
+        or the maximum number of attacks are played (the table cap of the rules).
 
         1. The first attacker plays his attack.
         2. The defender can choose to defend, divert the attack, or take the cards.
@@ -52,97 +182,153 @@ class DurakGame:
         4. The defender can choose to defend, or take the cards.
         5. See if attackers can attack again. if so, return to 4
         """
-        self.update_player_info()
+        metrics = Metrics.active
+        if metrics:
+            round_start = start = perf_counter()
 
         # The first attacker puts the first cards on the table
         first_attacker = self.first_attacker_of_the_round()
-        for attack in first_attacker.attack(self.defender, self.table):
+        attacks = first_attacker.attack(self.defender, self.table)
+        if self.listeners:
+            self.event(ATTACK, first_attacker, attacks)
+        for attack in attacks:
             self.players_to_grab_cards.append(first_attacker)
             self.table.append([attack, None])
             self.check_winner()
+        if metrics:
+            metrics.add_time("first_attack", start)
 
         attacking = True
         while attacking and self.playing:
-            print(f"Players {[player.player_id for player in self.attackers]}")
-            print(f"Table: {self.table}\n")
-
-            self.update_player_info()
+            if self.human_players:
+                self.tell(f"Players {[player.player_id for player in self.attackers]}")
+                self.tell(f"Table: {self.table}\n")
 
+            if metrics:
+                start = perf_counter()
             defence = self.defender.defend(self.next_defender(), self.table)
+            if metrics:
+                metrics.add_time("defend", start)
             if not defence:
+                if metrics:
+                    metrics.count("takes")
+                if self.listeners:
+                    self.event(TAKE, self.defender)
                 self.fail_defence()
                 attacking = False
             else:
                 old_len = len(self.table)
+                undefended_attacks = [attack[0] for attack in self.table if not attack[1]]
                 self.table = defence
                 if len(self.table) > old_len:
                     # Attack got diverted to the next defender
+                    if metrics:
+                        metrics.count("diverts")
+                    if self.listeners:
+                        self.event(DIVERT, self.defender, [attack[0] for attack in self.table[old_len:]])
                     self.players_to_grab_cards.append(self.defender)
                     self.flip_next_defender(grab_cards=False)
                 else:
-                    self.update_player_info()
-                    print(f"Player {self.defender.player_id}")
-                    print(f"Table: {self.table}\n")
+                    if metrics:
+                        metrics.count("defences")
+                        start = perf_counter()
+                    if self.listeners:
+                        self.event(DEFEND, self.defender,
+                                   [attack for attack in self.table if attack[0] in undefended_attacks])
+                    if self.human_players:
+                        self.tell(f"Player {self.defender.player_id}")
+                        self.tell(f"Table: {self.table}\n")
                     attacking = False
                     for attacker in self.attackers:
+                        if attacker.player_id not in self.ring:
+                            # Went out with its last diverted card when an earlier attacker played
+                            continue
                         attacks = attacker.attack(self.defender, self.table)
+                        if self.listeners:
+                            self.event(ATTACK if attacks else PASS, attacker, attacks or ())
                         if attacks:
                             attacking = True
                             for attack in attacks:
                                 self.players_to_grab_cards.append(attacker)
                                 self.table.append([attack, None])
                                 self.check_winner()
+                    if metrics:
+                        metrics.add_time("extra_attacks", start)
         if self.playing:
             self.check_winner()
-            """
-            print(f"Defender {self.defender}")
-            for a in self.attackers:
-                print(a)
-            """
+        if metrics:
+            metrics.add_time("handle_round", round_start)
 
     def fail_defence(self):
         """The defender get's flipped twice now.
 
         This is because the defender that failed doesn't get to attack someone first."""
-        print("DEFENCE FAILED!")
+        self.tell("DEFENCE FAILED!")
         self.flip_next_defender(grab_cards=True)
 
     def init_players(self, cards_in_starting_hand):
-        """Creates the amount of players given by player_count and gives them 6 cards.
+        """Creates the amount of players given by player_count and gives them cards_in_starting_hand cards.
 
         Should only be run if the deck is initialized."""
         for id in range(self.player_count):
             starting_hand = self.deck.grab_cards(cards_in_starting_hand)
-            if id == 0:
-                player = Player(starting_hand, self.deck.trumpcard.suit, id, cpu=False)
-                self.not_cpu_player = player
+            if id in self.ios:
+                player = Player(starting_hand, self.deck.trumpcard.suit, id, cpu=False, io=self.ios[id])
+                self.human_players.append(player)
+                if not self.not_cpu_player:
+                    self.not_cpu_player = player
             else:
-                player = Player(starting_hand, self.deck.trumpcard.suit, id)
-            self.players.append(player)
+                strategy = self.strategies[id] if self.strategies else None
+                player = Player(starting_hand, self.deck.trumpcard.suit, id, strategy=strategy)
+            player.game = self
+            self.seats.append(player)
+        self.ring = SeatRing(self.player_count)
+
+        for player in self.seats:
+            if not player.cpu or self.observe or player.observes:
+                player.observation = Observation(player, self.player_count, self.deck.trumpcard,
+                                                 len(self.deck.stockpile), self.rules.deck_mask)
+                self.observations.append(player.observation)
+        self.listeners.extend(self.observations)
 
     def grab_cards(self):
         """Uses players_to_grab_cards to determine who needs to grab cards"""
+        metrics = Metrics.active
+        if metrics:
+            start = perf_counter()
         if len(self.deck.stockpile) > 0:
             for player in self.players_to_grab_cards:
-                player.hand.extend(self.deck.grab_cards(6 - len(player.hand)))
+                grabbed = self.deck.grab_cards(self.rules.hand_size - len(player.hand))
+                player.hand.extend(grabbed)
+                if self.listeners and grabbed:
+                    self.event(GRAB, player, grabbed)
             self.players_to_grab_cards = []
+        if metrics:
+            metrics.add_time("grab_cards", start)
+
+    @property
+    def players(self):
+        """The players that are still in the game, in seat order."""
+        return [self.seats[seat] for seat in self.ring]
+
+    @property
+    def attackers(self):
+        """The players in the game besides the defender, going around the table from the defender."""
+        return [self.seats[seat] for seat in self.ring.others(self.defender.player_id)]
 
     def first_attacker_of_the_round(self):
         """Determines the first attacker, the player before the defender."""
-        for player_number, player in enumerate(self.players):
-            if player == self.defender and player_number != 0:
-                return self.players[player_number - 1]
-
-        # Only triggers when the first attacker should be the the last player in players
-        return self.players[-1]
+        return self.seats[self.ring.previous_seat(self.defender.player_id)]
 
     def flip_next_defender(self, grab_cards=True):
         """Flips the defender to the next player.
 
         grab_cards is true when the round was ended,
                       false when the attack was passed on."""
+        metrics = Metrics.active
+        if metrics:
+            start = perf_counter()
         self.defender = self.next_defender()
-        self.attackers = [player for player in self.players if player != self.defender]
 
         if grab_cards:
             self.grab_cards()
@@ -150,48 +336,55 @@ class DurakGame:
         elif not grab_cards:
             if self.defender in self.players_to_grab_cards:
                 self.players_to_grab_cards.remove(self.defender)
+        if self.observations:
+            attackers = self.attackers
+            for observation in self.observations:
+                observation.turn(self.defender, attackers)
+        if metrics:
+            metrics.add_time("flip_next_defender", start)
 
     def next_defender(self):
-        """Finds the next defender and returns him."""
-        for player_number, player in enumerate(self.players):
-            if player == self.defender and player_number != len(self.players) - 1:
-                return self.players[player_number + 1]
-        # Only triggers if the last player in players is the current defender or it's the first round
-        return self.players[0]
+        """Finds the next defender and returns him, the first player in the first round.
+
+        The defender can be out of the game already, it is the player after his seat then."""
+        if self.defender is None:
+            return self.seats[self.ring.head]
+        return self.seats[self.ring.next_seat(self.defender.player_id)]
 
     def check_winner(self):
         """Checks if a player has 0 card, thus won and is out of the game.
 
         Print something cool if the player was a human."""
-        for player in self.players:
+        metrics = Metrics.active
+        if metrics:
+            start = perf_counter()
+        for seat in list(self.ring):
+            player = self.seats[seat]
             if len(player.hand) == 0:
                 if not player.cpu:
-                    print("\t\tGOOD JOB!\n\t\tYou are not the Durak")
-                self.players.remove(player)
+                    player.io.write("\t\tGOOD JOB!\n\t\tYou are not the Durak")
+                self.finish_order.append(seat)
+                self.ring.remove(seat)
         self.check_loser()
+        if metrics:
+            metrics.add_time("check_winner", start)
 
     def check_loser(self):
         """Checks if only 1 player is left with cards, thus lost the game.
 
         Print something humiliating if the player was a human."""
-        if len(self.players) < 2:
+        if len(self.ring) < 2:
             self.playing = False
-            if not self.players[0].cpu:
-                print("You suck and are the Durak!")
-            else:
-                print(f"Player {self.players[0].player_id} lost the game!")
-
-    def update_player_info(self):
-        # TODO: update only when the player could need it.
-        """Updates the info of the human player if there is one.
-
-        Always upates before the human player can do an action."""
-        if self.not_cpu_player:
-            self.not_cpu_player.update_pgi(self.deck, self.defender, self.attackers, self.table)
-
-
-
-
-
-
-
+            if not self.ring:
+                # The last players went out at the same time, nobody is the Durak
+                return
+            self.durak = self.seats[self.ring.head]
+            if not self.durak.cpu:
+                self.durak.io.write("You suck and are the Durak!")
+            self.tell(f"Player {self.durak.player_id} lost the game!", exclude=self.durak)
+
+    def tell(self, text, exclude: Player = None):
+        """Shows the text to every human player, except exclude."""
+        for player in self.human_players:
+            if player is not exclude:
+                player.io.write(text)
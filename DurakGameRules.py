@@ -1,159 +1,371 @@
-from itertools import combinations
+from heapq import nsmallest
+from itertools import combinations, islice
 
+import Metrics
+import MoveCache
+from Cards import (Hand, all_cards, cards_to_mask, mask_to_cards, ranks_in_mask, rank_masks, rank_bits, suit_spread,
+                   beats_masks, card_values, deck_cards, DECK_SIZE)
 
-def check_player_count(player_count):
-    """Raises an error if there are more than 5 or less than 2 players.
+MAX_PLAYERS = 8     # The most players any table can have, GameState and Observation are sized for it
+HAND_SIZE = 6
+TABLE_CAP = 6       # The most attacks in one round
 
-    Is only run in the initialization of Durak."""
-    if player_count > 5:
-        raise ValueError("Can't play Durak with more than 5 players.")
+
+class Rules:
+    """The parts of the rules that can be changed: the size of the deck and the hands,
+    the most attacks in one round (table_cap) and the most players.
+
+    max_players defaults to as many players as the deck can deal a hand to,
+    while the trump card stays in the stockpile: 5 with 36 cards, 8 with 52."""
+
+    def __init__(self, deck_size: int = DECK_SIZE, hand_size: int = HAND_SIZE, table_cap: int = TABLE_CAP,
+                 max_players: int = None):
+        self.deck_mask = cards_to_mask(deck_cards(deck_size))     # Also checks the deck size
+        if hand_size < 1 or table_cap < 1:
+            raise ValueError("The hand size and the table cap have to be at least 1.")
+        most_players = min((deck_size - 1) // hand_size, MAX_PLAYERS)
+        if most_players < 2:
+            raise ValueError(f"A deck of {deck_size} cards can't deal hands of {hand_size} to 2 players, "
+                             f"the hand size can be at most {(deck_size - 1) // 2}.")
+        if max_players is None:
+            max_players = most_players
+        if not 2 <= max_players <= most_players:
+            raise ValueError(f"A deck of {deck_size} cards with hands of {hand_size} has room for 2 to {most_players} "
+                             f"players, not {max_players}.")
+        self.deck_size = deck_size
+        self.hand_size = hand_size
+        self.table_cap = table_cap
+        self.max_players = max_players
+
+    def to_dict(self):
+        return {"deck_size": self.deck_size, "hand_size": self.hand_size, "table_cap": self.table_cap,
+                "max_players": self.max_players}
+
+    def __eq__(self, other):
+        return isinstance(other, Rules) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return (f"Rules(deck_size={self.deck_size}, hand_size={self.hand_size}, table_cap={self.table_cap}, "
+                f"max_players={self.max_players})")
+
+
+standard_rules = Rules()
+
+
+def check_player_count(player_count, rules: Rules = None):
+    """Raises an error if there are more players than rules.max_players or less than 2 players.
+
+    Run by everything that starts games: DurakGame, GameState, BatchDurakGame, DurakEnv, the server,
+    tournament and Campaign."""
+    max_players = (rules or standard_rules).max_players
+    if player_count > max_players:
+        raise ValueError(f"Can't play Durak with more than {max_players} players.")
     if player_count < 2:
         raise ValueError("Can't play Durak with less than 2 players.")
 
 
+def card_combinations(l: list, max_length: int = None):
+    """Yields the combinations of the cards in the given list one by one, shortest first.
+
+    Stops at combinations of max_length cards if given."""
+    if max_length is None or max_length > len(l):
+        max_length = len(l)
+    for i in range(1, max_length + 1):
+        for combination in combinations(l, i):
+            yield list(combination)
+
+
 def strip_list(l:list):
     """returns the combinations of the cards in the given list
 
     for example:
         input = [King of Clubs, King of Hearts]
         output = [[King of Clubs], [King of Hearts], [King of Clubs, King of Hearts]]"""
-    combis = []
-    for i in range(1, len(l)):
-        combis.extend(list(combinations(l, i)))
-    combis = [list(e) for e in combis]
-    combis.append(l)
-    return combis
+    return list(card_combinations(l))
+
+
+def first_moves(moves, k: int = 1, key=None):
+    """Returns the first k moves of a move generator, or the k lowest by key (for example get_value).
+
+    Only k moves are kept in memory, the rest of the generator is not stored."""
+    if key is None:
+        return list(islice(moves, k))
+    return nsmallest(k, moves, key=key)
+
+
+def cached_moves(key, moves):
+    """Returns moves(), from the MoveCache under key if caching is on."""
+    cache = MoveCache.active
+    if not cache:
+        return moves()
+    cached = cache.get(key)
+    return cached if cached is not None else cache.add(key, moves())
+
+
+def attack_limits(hand_mask, defender_hand_size, table_mask, undefended_attacks, first_attack, table_cap=TABLE_CAP):
+    """Returns the mask of the cards that can be attacked with and the most cards one attack can have."""
+    if first_attack:
+        return hand_mask, min(defender_hand_size, table_cap)
+    # Only allow the attack, if there aren't more undefended attacks than the amount of cards of the defender
+    return hand_mask & ranks_in_mask(table_mask), min(defender_hand_size, table_cap) - undefended_attacks
+
+
+def rank_combinations(playable_mask, max_attack):
+    """Yields the combinations of up to max_attack cards of the same rank, rank by rank."""
+    ranks_left = rank_bits(playable_mask)
+    while ranks_left:
+        rank = ranks_left & -ranks_left
+        yield from card_combinations(mask_to_cards(playable_mask & rank * suit_spread), max_attack)
+        ranks_left ^= rank
+
+
+def generate_attack_masks(hand_mask, defender_hand_size, table_mask, undefended_attacks, first_attack,
+                          table_cap=TABLE_CAP):
+    """Yields all possible attacks, like generate_attacks, but from masks and counts.
+
+    table_mask holds all cards on the table, undefended_attacks is the amount of undefended attacks."""
+    return rank_combinations(*attack_limits(hand_mask, defender_hand_size, table_mask, undefended_attacks,
+                                            first_attack, table_cap))
+
+
+def attack_moves(hand_mask, defender_hand_size, table_mask, undefended_attacks, first_attack, table_cap=TABLE_CAP):
+    """All attacks of generate_attack_masks as a tuple of card masks, cached if MoveCache is on."""
+    playable_mask, max_attack = attack_limits(hand_mask, defender_hand_size, table_mask, undefended_attacks,
+                                              first_attack, table_cap)
+    # There are only 4 cards of a rank
+    key = ("attacks", playable_mask, max(0, min(max_attack, 4)))
+    moves = cached_moves(key, lambda: tuple(cards_to_mask(attack)
+                                            for attack in rank_combinations(playable_mask, max_attack)))
+    return Metrics.active.legal_moves("attack_moves", moves) if Metrics.active else moves
 
 
 # TODO: Make this uniform, so either possible_attacks returns the whole table,
 #                          or possible_defends only returns the now defended cards.
 # I think the first one makes more sense
-def possible_attacks(hand, defender, table):
-    """Returns all possible attacks for this player.
+def generate_attacks(hand, defender, table, table_cap=TABLE_CAP):
+    """Yields all possible attacks for this player, one at a time.
 
-    Returns a list of attacks.
-    It doesn't return the whole table like in defends!"""
-    # First attack
+    It doesn't yield the whole table like in defends! table_cap is the most attacks in a round (see Rules)."""
     if all([attacks[1] is None for attacks in table]):
-        attacks = []
-        processed_cards = []
-        for card in hand:
-            if card not in processed_cards:
-                card_combination = [c for c in hand if c.rank == card.rank]
-                processed_cards.extend(card_combination)
-                attacks.extend(strip_list(card_combination))
-        attacks = [a for a in attacks if len(a) <= len(defender.hand)]
-        return attacks
-    # Extra attacks
+        attacks = rank_combinations(cards_to_mask(hand), min(len(defender.hand), table_cap))
     else:
-        undefended_attacks_on_table = [attack for attack in table if not attack[1]]
-        ranks_on_table = [card[1].rank for card in table if card[1]]
-        ranks_on_table.extend([card[0].rank for card in table if card[0]])
+        undefended_attacks_on_table = len([attack for attack in table if not attack[1]])
+        table_mask = cards_to_mask([card for attack in table for card in attack if card])
+        attacks = rank_combinations(*attack_limits(cards_to_mask(hand), len(defender.hand), table_mask,
+                                                   undefended_attacks_on_table, False, table_cap))
+    return Metrics.active.count_moves("generate_attacks", attacks) if Metrics.active else attacks
+
+
+def lowest_value_attack(hand: Hand, defender, table, table_cap=TABLE_CAP):
+    """Returns the attack with the lowest value (see get_value), None if there is none.
 
-        attacks = []
-        processed_cards = []
+    Every card has a positive value, so that is always a single card: the first playable card of the sorted hand.
+    The same attack as the lowest of generate_attacks, without generating the others."""
+    if all([attacks[1] is None for attacks in table]):
+        playable_mask = hand.mask
+        undefended_attacks_on_table = 0
+    else:
+        playable_mask = hand.mask & ranks_in_mask(cards_to_mask([card for attack in table for card in attack if card]))
+        undefended_attacks_on_table = len([attack for attack in table if not attack[1]])
+    if playable_mask and min(len(defender.hand), table_cap) > undefended_attacks_on_table:
         for card in hand:
-            if card not in processed_cards and card.rank in ranks_on_table:
-                card_combination = [c for c in hand if c.rank == card.rank]
-                processed_cards.extend(card_combination)
-                attacks.extend(strip_list(card_combination))
-        # Only allow the attack, if there aren't more undefended attacks than the amount of cards of the defender
-        attacks = [a for a in attacks if len(a) + len(undefended_attacks_on_table) <= len(defender.hand) and
-                                         len(a) + len(undefended_attacks_on_table) <= 6]
-        return attacks
+            if card.bit & playable_mask:
+                return [card]
+    return None
+
+
+def possible_attacks(hand, defender, table, table_cap=TABLE_CAP):
+    """Returns all possible attacks for this player.
 
+    Returns a list of attacks, from the MoveCache if it is on."""
+    if MoveCache.active:
+        first_attack = all([attacks[1] is None for attacks in table])
+        undefended_attacks_on_table = len([attack for attack in table if not attack[1]])
+        table_mask = cards_to_mask([card for attack in table for card in attack if card])
+        attacks = [mask_to_cards(attack) for attack in attack_moves(cards_to_mask(hand), len(defender.hand),
+                                                                    table_mask, undefended_attacks_on_table,
+                                                                    first_attack, table_cap)]
+    else:
+        attacks = list(generate_attacks(hand, defender, table, table_cap))
+    return Metrics.active.legal_moves("possible_attacks", attacks) if Metrics.active else attacks
 
-def cartesian_product2(defences: list):
-    return [[x, y] for x in defences[0] for y in defences[1] if x != y]
 
+def defence_combinations(defence_cards: list):
+    """Yields every way to defend the attacks, as a list with a defending card per attack.
 
-def cartesian_product3(defences: list):
-    return [[x, y, z] for x in defences[0] for y in defences[1] for z in defences[2]
-            if (x != y) and (x != z) and (y != z)]
+    defence_cards holds per attack the cards it could be defended with.
+    Backtracks over the attacks, every set of cards is only explored (and given) once,
+    so defences that use the same cards in another order are skipped."""
+    seen = set()  # Masks of the cards used so far
+    defence = []
 
+    def extend(used):
+        if used in seen:
+            return
+        seen.add(used)
+        if len(defence) == len(defence_cards):
+            yield defence.copy()
+            return
+        for card in defence_cards[len(defence)]:
+            if not card.bit & used:
+                defence.append(card)
+                yield from extend(used | card.bit)
+                defence.pop()
 
-def cartesian_product4(defences: list):
-    return [[a, b, c, d] for a in defences[0] for b in defences[1] for c in defences[2] for d in defences[3]
-            if (a != b) and (a != c) and (a != d) and (b != c) and (b != d) and (c != d)]
+    return extend(0)
 
 
-def cartesian_product5(defences: list):
-    return [[a, b, c, d, e] for a in defences[0] for b in defences[1] for c in defences[2] for d in defences[3] for e in
-            defences[4]
-            if (a != b) and (a != c) and (a != d) and (a != e) and (b != c) and (b != d) and (b != e) and (c != d) and (
-                        c != e) and (d != e)]
+def match_defence(defence_cards: list, key=None):
+    """Finds one defence with a bipartite matching between the cards and the attacks they beat.
 
+    Cards are added one by one (sorted by key if given), a card is only kept
+    if it can get an attack of its own, possibly by moving the other cards (augmenting path).
+    returns None if not every attack can be defended."""
+    attacks_per_card = {}  # card bit -> [card, attack indices]
+    for i, cards in enumerate(defence_cards):
+        for card in cards:
+            attacks_per_card.setdefault(card.bit, [card, []])[1].append(i)
+    match = [None] * len(defence_cards)  # The defending card per attack
 
-def remove_duplicates(defences: list):
-    """Removes duplicate cards from the defences list."""
-    for defence in defences:
-        for other_defence in [d for d in defences if d != defence]:
-            if all(item in other_defence for item in defence):
-                defences.remove(other_defence)
-    return defences
+    def augment(card, visited):
+        for i in attacks_per_card[card.bit][1]:
+            if i not in visited:
+                visited.add(i)
+                if match[i] is None or augment(match[i], visited):
+                    match[i] = card
+                    return True
+        return False
 
+    cards = [card for card, _ in attacks_per_card.values()]
+    if key:
+        cards.sort(key=key)
+    matched = 0
+    for card in cards:
+        if matched == len(match):
+            break
+        if augment(card, set()):
+            matched += 1
+    return match if matched == len(match) else None
 
-def possible_defends_per_card(hand, attack):
-    """returns a list of cards from the hand that the attack could be defended with."""
-    defends = []
-    for card in hand:
-        if card.suit == attack.suit and card.rank > attack.rank:  # Same suit, higher rank
-            defends.append(card)
-        elif card.value > 14 and attack.value < 15:  # Trump card to non trump suit
-            defends.append(card)
-    return defends
 
+def lowest_value_defence(defence_cards: list, trump_suit):
+    """Returns the defence with the lowest total value, or None if there is none.
 
-def possible_defends(hand, table, first_attack, next_defender):
-    """Finds all the possibilities to defend the current table.
+    Trying the cheapest cards first gives the optimum,
+    because the cards that can be matched to the attacks form a (transversal) matroid."""
+    values = card_values[trump_suit]
+    return match_defence(defence_cards, key=lambda card: values[card.index])
 
-    returns a list of the tables with possible defences.
-    returns None if the attack could not be defended."""
-    undefended_attacks = [attack for attack in table if not attack[1]]
-    defended_attacks = [attack for attack in table if attack[1]]
-    # Check if the attack can be diverted
-    possible_attacks_and_defences = []
-    if first_attack:
-        pass_on_cards = [card for card in hand if card.rank == undefended_attacks[0][0].rank]
-        if pass_on_cards:
-            stripped_pass_on = strip_list(pass_on_cards)
-            for divert_cards in stripped_pass_on:
-                possible_attack = undefended_attacks.copy()
-                for divert_card in divert_cards:
-                    possible_attack.append([divert_card, None])
-                if len(possible_attack) < len(next_defender.hand):
-                    possible_attacks_and_defences.append(possible_attack)
 
+def possible_defends_per_card(hand, attack, trump_suit, hand_mask=None):
+    """returns a list of cards from the hand that the attack could be defended with.
+
+    The mask of the hand can be given if it is already known."""
+    if hand_mask is None:
+        hand_mask = cards_to_mask(hand)
+    return mask_to_cards(hand_mask & beats_masks[trump_suit][attack.index])
+
+
+def max_divert(undefended_attacks: list, next_defender_hand_size, table_cap=TABLE_CAP):
+    """The most cards an attack can be diverted with."""
+    # The diverted attack has to be smaller than the hand of the next defender, and fit under the table cap
+    return min(next_defender_hand_size - 1, table_cap) - len(undefended_attacks)
+
+
+def generate_diverts(hand_mask, undefended_attacks: list, next_defender_hand_size, table_cap=TABLE_CAP):
+    """Yields the lists of cards the attack can be diverted with.
+
+    Only call this for the first attack, undefended_attacks are the attacking cards."""
+    pass_on_cards = mask_to_cards(hand_mask & rank_masks[undefended_attacks[0].rank])
+    yield from card_combinations(pass_on_cards, max_divert(undefended_attacks, next_defender_hand_size, table_cap))
+
+
+def divert_moves(hand_mask, undefended_attacks: list, next_defender_hand_size, table_cap=TABLE_CAP):
+    """All diverts of generate_diverts as a tuple of card masks, cached if MoveCache is on."""
+    pass_on_mask = hand_mask & rank_masks[undefended_attacks[0].rank]
+    most = max_divert(undefended_attacks, next_defender_hand_size, table_cap)
+    key = ("diverts", pass_on_mask, max(0, min(most, 4)))
+    moves = cached_moves(key, lambda: tuple(cards_to_mask(divert) for divert in
+                                            generate_diverts(hand_mask, undefended_attacks, next_defender_hand_size,
+                                                             table_cap)))
+    return Metrics.active.legal_moves("divert_moves", moves) if Metrics.active else moves
+
+
+def generate_defences(hand_mask, undefended_attacks: list, trump_suit):
+    """Yields the ways to defend the undefended attacks (cards), a list with a defending card per attack."""
     # Per card see with which cards it can be defended
     defence_cards = []
     for attack in undefended_attacks:
-        defence = possible_defends_per_card(hand, attack[0])
+        defence = mask_to_cards(hand_mask & beats_masks[trump_suit][attack.index])
         defence_cards.append(defence)
+    yield from defence_combinations(defence_cards)
 
-    Nattacks = len(undefended_attacks)
-    defences = []
-
-    # Return a list with the combinations of cards to defend with, without duplicates
-    if Nattacks == 1:
-        defences.extend([[d] for d in defence_cards[0]])
-    elif Nattacks == 2:
-        defences.extend(cartesian_product2(defence_cards))
-    elif Nattacks == 3:
-        defences.extend(cartesian_product3(defence_cards))
-    elif Nattacks == 4:
-        defences.extend(cartesian_product4(defence_cards))
-    elif Nattacks == 5:
-        defences.extend(cartesian_product5(defence_cards))
-
-    if not any(defences) and not possible_attacks_and_defences:
-        return None
-    defe = remove_duplicates(defences)
+
+def defence_moves(hand_mask, undefended_attacks: list, trump_suit):
+    """All defences of generate_defences as a tuple with per defence the card indices, cached if MoveCache is on.
+
+    The key is only the cards that beat each attack, so it doesn't depend on the trump suit."""
+    beats = beats_masks[trump_suit]
+    defence_masks = tuple(hand_mask & beats[attack.index] for attack in undefended_attacks)
+    moves = cached_moves(("defences",) + defence_masks,
+                         lambda: tuple(tuple(card.index for card in defence) for defence in
+                                       defence_combinations([mask_to_cards(mask) for mask in defence_masks])))
+    return Metrics.active.legal_moves("defence_moves", moves) if Metrics.active else moves
+
+
+def generate_defends(hand, table, first_attack, next_defender, trump_suit, table_cap=TABLE_CAP):
+    """Yields the possibilities to defend the current table one by one, the diverts first.
+
+    Every possibility is the whole new table."""
+    defends = table_defends(hand, table, first_attack, next_defender, trump_suit, table_cap=table_cap)
+    return Metrics.active.count_moves("generate_defends", defends) if Metrics.active else defends
+
+
+def table_defends(hand, table, first_attack, next_defender, trump_suit, cached=False, table_cap=TABLE_CAP):
+    """The generator behind generate_defends, takes the moves from the MoveCache if cached is set."""
+    undefended_attacks = [attack for attack in table if not attack[1]]
+    defended_attacks = [attack for attack in table if attack[1]]
+    attack_cards = [attack[0] for attack in undefended_attacks]
+    hand_mask = cards_to_mask(hand)
+    if cached:
+        diverts = (mask_to_cards(divert) for divert in divert_moves(hand_mask, attack_cards, len(next_defender.hand),
+                                                                    table_cap)) if first_attack else ()
+        defences = ([all_cards[card] for card in defence]
+                    for defence in defence_moves(hand_mask, attack_cards, trump_suit))
+    else:
+        diverts = (generate_diverts(hand_mask, attack_cards, len(next_defender.hand), table_cap)
+                   if first_attack else ())
+        defences = generate_defences(hand_mask, attack_cards, trump_suit)
+
+    # Check if the attack can be diverted
+    for divert_cards in diverts:
+        possible_attack = undefended_attacks.copy()
+        for divert_card in divert_cards:
+            possible_attack.append([divert_card, None])
+        yield possible_attack
 
     # Creates the full table again, including the already defended attacks
-    for possible_defence in defe:
+    for possible_defence in defences:
         possible_attack_and_defence = defended_attacks.copy()
         for i, attack in enumerate(undefended_attacks):
             possible_attack_and_defence.append([attack[0], possible_defence[i]])
-        possible_attacks_and_defences.append(possible_attack_and_defence)
+        yield possible_attack_and_defence
 
+
+def possible_defends(hand, table, first_attack, next_defender, trump_suit, table_cap=TABLE_CAP):
+    """Finds all the possibilities to defend the current table.
+
+    returns a list of the tables with possible defences.
+    returns None if the attack could not be defended.
+    Uses the MoveCache if it is on, the lazy generate_defends never does (it often stops after one defence)."""
+    if MoveCache.active:
+        possible_attacks_and_defences = list(table_defends(hand, table, first_attack, next_defender, trump_suit,
+                                                           cached=True, table_cap=table_cap))
+    else:
+        possible_attacks_and_defences = list(generate_defends(hand, table, first_attack, next_defender,
+                                                              trump_suit, table_cap))
+    if Metrics.active:
+        Metrics.active.legal_moves("possible_defends", possible_attacks_and_defences)
+    if not possible_attacks_and_defences:
+        return None
     return possible_attacks_and_defences
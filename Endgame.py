@@ -0,0 +1,236 @@
+"""An exact solver for the endgame: two players left and no stockpile, so every card is known.
+
+The solver is a minimax search with alpha-beta pruning over GameState, with every move of the rules
+(diverting and taking the cards too). Positions are stored in a transposition table under their Zobrist hash,
+and the moves are ordered: the best move of an earlier search of the position first,
+then the moves that get rid of the most cards, the cheapest first (by card value, like get_value).
+A value is 1 for a win, -1 for becoming the Durak and 0 for a draw. A position that comes back on the path
+of the search (the same cards going back and forth) counts as a draw.
+Such a draw depends on the path that led to the position, so a value that was found with one is never stored
+in the transposition table: the stored values only depend on the position, also for the next solve.
+
+Use it as a strategy, strategies["endgame"] plays the lowest value strategy until the endgame,
+or to analyse games: python Endgame.py --games 100 --players 2
+"""
+from argparse import ArgumentParser
+from time import perf_counter
+
+from Cards import mask_to_cards, card_values
+from GameState import GameState, ATTACK, DIVERT, DEFEND, FIRST_ATTACK, DEFENCE, EXTRA_ATTACKS, GAME_OVER
+from ISMCTS import attack_with, defend_with, lowest_value_move
+from MoveCache import MoveCache
+
+WIN = 1
+DRAW = 0
+LOSS = -1
+
+# The kinds of values in the transposition table
+EXACT = 0
+LOWER = 1   # The value is at least this
+UPPER = 2   # The value is at most this
+
+
+class BudgetExceeded(Exception):
+    """Raised inside the search when the node or time budget is used up."""
+
+
+def is_endgame(state: GameState):
+    return state.phase != GAME_OVER and state.stockpile_size == 0 and len(state.players()) == 2
+
+
+class EndgameSolver:
+    """Solves endgames within a budget of node_budget positions and time_budget seconds per solve.
+
+    Either budget can be None. The transposition table is kept between solves, so solving the next position
+    of the same endgame is mostly a lookup. That is safe because it only holds values without repetition draws.
+    The table and the ordered moves hold at most table_size positions each, the least recently used go first."""
+
+    def __init__(self, node_budget: int = 200_000, time_budget: float = None, table_size: int = 100_000):
+        self.node_budget = node_budget
+        self.time_budget = time_budget
+        self.table = MoveCache(table_size)   # hash: (value for the first player, kind of value, best move)
+        self.moves = MoveCache(table_size)   # hash: the ordered moves
+        self.first = None   # The values are for the player with the lowest seat
+        self.nodes = 0      # The positions searched by the last solve
+        self.path = set()
+        self.deadline = None
+
+    def solve(self, state: GameState):
+        """Returns (value, best move) for the player to move, or None if the budget ran out."""
+        if not is_endgame(state):
+            raise ValueError("Only endgames with two players and an empty stockpile can be solved.")
+        state = state.clone()
+        # The search stops repetitions itself, a round limit would make the values depend on the round
+        state.max_rounds = float("inf")
+        self.first = min(state.players())
+        self.nodes = 0
+        self.path = set()
+        self.deadline = perf_counter() + self.time_budget if self.time_budget is not None else None
+        to_move = state.to_move()
+        try:
+            value, move, _ = self.search(state, LOSS, WIN)
+        except BudgetExceeded:
+            return None
+        return (value if to_move == self.first else -value), move
+
+    def search(self, state: GameState, alpha, beta):
+        """Returns the value for the first player, the best move and if the value came from a repetition draw,
+        searching with the window (alpha, beta)."""
+        if state.phase == GAME_OVER:
+            if state.durak is None:
+                return DRAW, None, False
+            return (LOSS if state.durak == self.first else WIN), None, False
+        key = state.hash
+        if key in self.path:
+            return DRAW, None, True
+
+        self.nodes += 1
+        if self.node_budget is not None and self.nodes > self.node_budget:
+            raise BudgetExceeded
+        if self.deadline is not None and self.nodes % 256 == 0 and perf_counter() > self.deadline:
+            raise BudgetExceeded
+
+        best_move = None
+        entry = self.table.get(key)
+        if entry:
+            value, kind, best_move = entry
+            if kind == EXACT or (kind == LOWER and value >= beta) or (kind == UPPER and value <= alpha):
+                return value, best_move, False
+
+        maximizing = state.to_move() == self.first
+        window = alpha, beta
+        best_value = None
+        repeated = False    # If a repetition draw was seen below, then the value depends on the path
+        self.path.add(key)
+        for move in self.ordered_moves(state, best_move):
+            state.apply(move)
+            value, _, move_repeated = self.search(state, alpha, beta)
+            state.undo()
+            repeated |= move_repeated
+            if best_value is None or (value > best_value if maximizing else value < best_value):
+                best_value, best_move = value, move
+            if maximizing:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                break
+        self.path.remove(key)
+        if repeated:
+            # Not stored, but its best move is still searched first the next time
+            self.ordered_moves(state, best_move)
+            return best_value, best_move, True
+
+        if best_value <= window[0]:
+            kind = UPPER
+        elif best_value >= window[1]:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.table.add(key, (best_value, kind, best_move))
+        return best_value, best_move, False
+
+    def ordered_moves(self, state: GameState, best_move=None):
+        """The legal moves in the order they are searched, kept per position.
+
+        The best move of an earlier search first, then defences before diverts, the most cards first
+        (an empty hand wins) and the cheapest cards first. Taking the cards and passing stay last."""
+        key = state.hash
+        moves = self.moves.get(key)
+        if moves is None:
+            values = card_values[state.trump]
+            moves = state.legal_moves()
+            last = moves[-1:] if moves and moves[-1][0] not in (ATTACK, DIVERT, DEFEND) else []
+            playing = [(move, move[1] if move[0] == DEFEND else [card.index for card in mask_to_cards(move[1])])
+                       for move in moves[:len(moves) - len(last)]]
+            playing.sort(key=lambda move: (move[0][0] == DIVERT, -len(move[1]), sum(values[card] for card in move[1])))
+            moves = self.moves.add(key, [move for move, _ in playing] + last)
+        if best_move is not None and moves[0] != best_move:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        return moves
+
+
+def solver(player):
+    """The endgame solver of the player, made on its first endgame move.
+
+    A node budget instead of a time budget keeps seeded games the same on every machine,
+    set player.endgame before the game starts to use other settings."""
+    if getattr(player, "endgame", None) is None:
+        player.endgame = EndgameSolver(node_budget=20_000)
+    return player.endgame
+
+
+def in_endgame(game):
+    return not game.deck.stockpile and len(game.ring) == 2
+
+
+def endgame_attack(player, defender, table):
+    """The attack strategy, called like Player.cpu_lowest_value_attack.
+
+    Plays the lowest value strategy until the endgame, or when the solver runs out of budget."""
+    if in_endgame(player.game):
+        state = GameState.from_game(player.game, EXTRA_ATTACKS if table else FIRST_ATTACK, player.player_id)
+        solved = solver(player).solve(state)
+        if solved:
+            return attack_with(player, solved[1])
+    return player.cpu_lowest_value_attack(defender, table)
+
+
+def endgame_defend(player, next_defender, table):
+    """The defend strategy, called like Player.cpu_lowest_value_defend."""
+    if in_endgame(player.game):
+        solved = solver(player).solve(GameState.from_game(player.game, DEFENCE))
+        if solved:
+            return defend_with(player, table, solved[1])
+    return player.cpu_lowest_value_defend(next_defender, table)
+
+
+def analyse(seed, player_count=2, node_budget=1_000_000):
+    """Plays a game with the lowest value strategy until the endgame, solves it and plays on greedily.
+
+    Returns the player to move, the solved value for it (None if the budget ran out),
+    the value it got by playing on greedily, the nodes and the seconds, or None if the game had no endgame."""
+    state = GameState.new(player_count, seed)
+    while state.phase != GAME_OVER and not (is_endgame(state) and state.phase == FIRST_ATTACK):
+        state.apply(lowest_value_move(state), undoable=False)
+    if state.phase == GAME_OVER:
+        return None
+    seat = state.to_move()
+    endgame_solver = EndgameSolver(node_budget)
+    start = perf_counter()
+    solved = endgame_solver.solve(state)
+    seconds = perf_counter() - start
+    while state.phase != GAME_OVER:
+        state.apply(lowest_value_move(state), undoable=False)
+    greedy = DRAW if state.durak is None else (LOSS if state.durak == seat else WIN)
+    return seat, solved[0] if solved else None, greedy, endgame_solver.nodes, seconds
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Solve the endgames of greedy games and compare them with greedy play.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--node-budget", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    endgames = unsolved = thrown = 0
+    seconds = []
+    for seed in range(args.seed, args.seed + args.games):
+        analysis = analyse(seed, args.players, args.node_budget)
+        if analysis is None:
+            continue
+        seat, value, greedy, nodes, time = analysis
+        endgames += 1
+        if value is None:
+            unsolved += 1
+            print(f"Seed {seed}: not solved within {args.node_budget} nodes")
+            continue
+        seconds.append(time)
+        if greedy < value:
+            thrown += 1
+        print(f"Seed {seed}: player {seat} to move, solved {value:+d}, greedy play {greedy:+d}, "
+              f"{nodes} nodes in {time:.3f}s")
+    print(f"\nEndgames: {endgames},    Unsolved: {unsolved},    Worse than perfect play for the first attacker: "
+          f"{thrown},    Mean solve time: {sum(seconds) / max(len(seconds), 1):.3f}s")
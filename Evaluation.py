@@ -0,0 +1,229 @@
+"""A cpu strategy that scores all its candidate moves at once with a model, in one NumPy call.
+
+The candidate attacks and defences come from the same move generators as possible_attacks and possible_defends,
+as card masks. encode() turns them into a feature matrix in one pass, a row per move:
+
+    cards           the number of cards played
+    trumps          the number of trump cards played
+    value           the card values played (like get_value)
+    hand_left       the number of cards left in the hand
+    hand_strength   the mean card value of the cards left in the hand
+    empty_hand      1 if the move plays the last card of the hand
+    opened_ranks    the ranks the move brings on the table, the other attackers can add cards of these
+    opponent_cards  the hand size of the player that defends after the move
+    stockpile       the number of cards in the stockpile
+    divert          1 for a divert
+    pass            1 for holding on to the cards instead of adding an attack
+
+The features are scaled to be around 0 to 1. A Model is a linear model or a small MLP (ReLU hidden layers)
+that gives every row a score, the move with the highest score is played.
+Weights are stored as a .npz file with the arrays w0, b0, w1, b1, ... and the feature names.
+
+Use it as a strategy, strategies["evaluated"] uses default_model() (hand-set linear weights),
+set player.evaluator before the game starts or call use(path) to play with weights from a file:
+
+    python tournament.py --strategies evaluated lowest_value --weights weights.npz
+    python Evaluation.py --save weights.npz     writes the default weights, as a start for training
+
+NumPy is only imported when the strategy is used, the rest of the game doesn't need it.
+"""
+from argparse import ArgumentParser
+
+from Cards import all_cards, cards_to_mask, card_values, suit_masks, rank_masks
+from DurakGameRules import attack_moves, divert_moves, defence_moves, Rules, standard_rules
+from GameState import ATTACK, PASS, DIVERT, DEFEND, TAKE
+from ISMCTS import attack_with, defend_with
+
+features = ("cards", "trumps", "value", "hand_left", "hand_strength", "empty_hand", "opened_ranks",
+            "opponent_cards", "stockpile", "divert", "pass")
+FEATURE_COUNT = len(features)
+
+# The weights of default_model(): spend the cheapest cards like the lowest value strategy,
+# but keep the trump cards, get rid of the hand when possible and open few ranks to the other attackers.
+# Set for the standard rules, where the card counts are divided by 6 (the table cap and the hand size)
+default_weights = {"cards": 0.5, "trumps": -3.6, "value": -3.0, "hand_strength": 0.5, "empty_hand": 2.0,
+                   "opened_ranks": -0.2, "pass": -0.8}
+
+tables = {}     # The lookup tables as arrays, made on the first use
+
+
+def lookup_tables():
+    if not tables:
+        import numpy as np
+
+        tables["bits"] = 1 << np.arange(len(all_cards), dtype=np.int64)
+        tables["values"] = {trump: np.array(card_values[trump], dtype=np.float32) for trump in card_values}
+        tables["suits"] = {suit: (mask & tables["bits"]) != 0 for suit, mask in suit_masks.items()}
+        tables["ranks"] = np.array(list(rank_masks.values()), dtype=np.int64)
+    return tables
+
+
+class Model:
+    """A linear model (one layer) or an MLP, layers is a list of (weights, bias) arrays.
+
+    Every hidden layer gets a ReLU, the last layer has one output: the score."""
+
+    def __init__(self, layers):
+        self.layers = layers
+        if layers[0][0].shape[0] != FEATURE_COUNT or layers[-1][0].shape[1] != 1:
+            raise ValueError(f"The model needs {FEATURE_COUNT} inputs and 1 output, "
+                             f"not {layers[0][0].shape[0]} and {layers[-1][0].shape[1]}.")
+
+    def scores(self, encoded):
+        """The score of every row of the feature matrix."""
+        import numpy as np
+
+        hidden = encoded
+        for weights, bias in self.layers[:-1]:
+            hidden = np.maximum(hidden @ weights + bias, 0)
+        weights, bias = self.layers[-1]
+        return (hidden @ weights + bias)[:, 0]
+
+    def save(self, path):
+        import numpy as np
+
+        arrays = {}
+        for number, (weights, bias) in enumerate(self.layers):
+            arrays[f"w{number}"] = weights
+            arrays[f"b{number}"] = bias
+        np.savez(path, features=np.array(features), **arrays)
+
+    def __repr__(self):
+        return f"Model({' -> '.join(str(weights.shape[0]) for weights, _ in self.layers)} -> 1)"
+
+
+def load(path):
+    """The Model of a .npz file written by Model.save."""
+    import numpy as np
+
+    with np.load(path) as arrays:
+        if tuple(arrays["features"]) != features:
+            raise ValueError(f"{path} has the features {list(arrays['features'])}, not {list(features)}.")
+        layers = []
+        while f"w{len(layers)}" in arrays:
+            layers.append((arrays[f"w{len(layers)}"].astype(np.float32), arrays[f"b{len(layers)}"].astype(np.float32)))
+    return Model(layers)
+
+
+def linear_model(weights: dict):
+    """A linear Model from a dict of feature name: weight, the missing features get 0."""
+    import numpy as np
+
+    vector = np.array([[weights.get(name, 0.0)] for name in features], dtype=np.float32)
+    return Model([(vector, np.zeros(1, dtype=np.float32))])
+
+
+active: Model = None    # The model of the players without their own, default_model() until use() is called
+
+
+def default_model():
+    global active
+    if active is None:
+        active = linear_model(default_weights)
+    return active
+
+
+def use(path):
+    """Plays with the weights of the file from now on, for every player without its own evaluator."""
+    global active
+    active = load(path)
+    return active
+
+
+def encode(moves, hand, table_mask, trump, opponent_cards, stockpile_size, divert_count=0, passing=False,
+           rules: Rules = standard_rules):
+    """The feature matrix of the moves, card masks of a hand, as float32 with a row per move.
+
+    opponent_cards is a number or a number per move. The first divert_count moves are diverts,
+    with passing a last row is added for holding on to the cards.
+    The card counts are scaled by the table cap (played) and the hand size (held) of the rules."""
+    import numpy as np
+
+    lookup = lookup_tables()
+    played = np.array(list(moves) + [0] * passing, dtype=np.int64)
+    played_bits = (played[:, None] & lookup["bits"]) != 0
+    left_bits = ((hand & ~played)[:, None] & lookup["bits"]) != 0
+    values = lookup["values"][trump]
+    encoded = np.zeros((len(played), FEATURE_COUNT), dtype=np.float32)
+
+    cards = played_bits.sum(axis=1)
+    hand_left = left_bits.sum(axis=1)
+    encoded[:, 0] = cards / rules.table_cap
+    encoded[:, 1] = (played_bits & lookup["suits"][trump]).sum(axis=1) / rules.table_cap
+    encoded[:, 2] = played_bits @ values / 100
+    encoded[:, 3] = hand_left / rules.hand_size
+    encoded[:, 4] = (left_bits @ values) / np.maximum(hand_left, 1) / 34
+    encoded[:, 5] = hand_left == 0
+    on_table = (table_mask & lookup["ranks"]) != 0
+    encoded[:, 6] = (((played[:, None] & lookup["ranks"]) != 0) & ~on_table).sum(axis=1)
+    encoded[:, 7] = np.asarray(opponent_cards) / rules.hand_size
+    encoded[:, 8] = stockpile_size / rules.deck_size
+    encoded[:divert_count, 9] = 1
+    if passing:
+        encoded[-1, 5] = 0
+        encoded[-1, 10] = 1
+    return encoded
+
+
+def evaluator(player):
+    """The model of the player, its own evaluator if it has one."""
+    return getattr(player, "evaluator", None) or default_model()
+
+
+def best(player, moves, encoded):
+    """The move with the highest score, encoded has a row per move."""
+    return moves[int(evaluator(player).scores(encoded).argmax())]
+
+
+def evaluated_attack(player, defender, table):
+    """The attack strategy, called like Player.cpu_lowest_value_attack."""
+    hand = player.hand.mask
+    table_mask = cards_to_mask([card for attack in table for card in attack if card])
+    first_attack = all(attack[1] is None for attack in table)
+    undefended = sum(1 for attack in table if not attack[1])
+    attacks = attack_moves(hand, len(defender.hand), table_mask, undefended, first_attack, player.rules.table_cap)
+    if not attacks:
+        return None
+    moves = [(ATTACK, attack) for attack in attacks]
+    if not first_attack:
+        moves.append((PASS, 0))
+    if len(moves) == 1:
+        return attack_with(player, moves[0])
+    encoded = encode(attacks, hand, table_mask, player.trump, len(defender.hand), len(player.game.deck.stockpile),
+                     passing=not first_attack, rules=player.rules)
+    return attack_with(player, best(player, moves, encoded))
+
+
+def evaluated_defend(player, next_defender, table):
+    """The defend strategy, called like Player.cpu_lowest_value_defend.
+
+    Takes the cards only when there is no other move, like the lowest value strategy."""
+    hand = player.hand.mask
+    table_mask = cards_to_mask([card for attack in table for card in attack if card])
+    undefended = [attack[0] for attack in table if not attack[1]]
+    moves = []
+    if all(attack[1] is None for attack in table):
+        moves += [(DIVERT, divert) for divert in divert_moves(hand, undefended, len(next_defender.hand),
+                                                              player.rules.table_cap)]
+    diverts = len(moves)
+    defences = defence_moves(hand, undefended, player.trump)
+    moves += [(DEFEND, defence) for defence in defences]
+    if not moves:
+        return defend_with(player, table, (TAKE, 0))
+    if len(moves) == 1:
+        return defend_with(player, table, moves[0])
+    # After a divert the next defender defends, after a defence this player with what is left of its hand
+    masks = [divert for _, divert in moves[:diverts]] + [sum(1 << card for card in defence) for defence in defences]
+    defender_cards = [len(next_defender.hand)] * diverts + [len(player.hand) - len(undefended)] * len(defences)
+    encoded = encode(masks, hand, table_mask, player.trump, defender_cards, len(player.game.deck.stockpile), diverts,
+                     rules=player.rules)
+    return defend_with(player, table, best(player, moves, encoded))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Write the default weights of the evaluated strategy to a file.")
+    parser.add_argument("--save", required=True, help="The .npz file to write")
+    args = parser.parse_args()
+    model = linear_model(default_weights)
+    model.save(args.save)
+    print(f"{model} written to {args.save}")
@@ -0,0 +1,187 @@
+"""A compact binary format to record games, so they can be replayed, debugged and used as data.
+
+A record file starts with the header b"DURAKREC" and a version byte, followed by the records of the games.
+Every record is length-prefixed, a little endian u32 with the size of the rest of the record:
+
+    u64 seed        only meaningful if the flags say so
+    u8  flags       1 if the seed is stored
+    u8  player_count
+    u8  deck_size   the Rules of the game
+    u8  hand_size
+    u8  table_cap
+    deck_size bytes the deal: the card indices of the shuffled stockpile, the trump card first
+    events          until the end of the record
+
+Every event is u8 kind, u8 player_id, u8 card count and then the cards, one byte (the card index) each.
+DEFEND events hold (attack, defence) pairs, so twice as many bytes as the count.
+ROUND holds the new defender, END the Durak (or NO_PLAYER).
+
+Files are only ever appended to, RecordReader memory-maps them and parses one record at a time.
+Replay.py rebuilds the DurakGame of a record at any ply.
+"""
+from mmap import mmap, ACCESS_READ
+from struct import Struct
+
+from Cards import all_cards
+from DurakGameRules import Rules, standard_rules
+
+HEADER = b"DURAKREC"
+VERSION = 2
+
+# The event kinds, the decisions first
+ATTACK = 0
+PASS = 1        # An attacker that didn't add cards
+DEFEND = 2
+DIVERT = 3
+TAKE = 4
+GRAB = 5        # Cards grabbed from the stockpile
+ROUND = 6
+END = 7
+DECISIONS = (ATTACK, PASS, DEFEND, DIVERT, TAKE)
+NO_PLAYER = 255
+
+length_struct = Struct("<I")
+start_struct = Struct("<QBBBBB")
+
+
+class GameRecorder:
+    """Collects the events of one game, DurakGame feeds it when recording."""
+
+    def __init__(self, seed, player_count, stockpile, rules: Rules = None):
+        rules = rules if rules else standard_rules
+        self.events = bytearray()
+        self.has_seed = isinstance(seed, int) and 0 <= seed < 1 << 64
+        self.start = (start_struct.pack(seed if self.has_seed else 0, int(self.has_seed), player_count,
+                                        rules.deck_size, rules.hand_size, rules.table_cap)
+                      + bytes(card.index for card in stockpile))
+
+    def event(self, kind, player=None, cards=()):
+        """Adds an event of the player, cards are Card objects.
+
+        For DEFEND the cards are the [attack, defence] pairs that got defended."""
+        self.events += bytes((kind, NO_PLAYER if player is None else player.player_id, len(cards)))
+        if kind == DEFEND:
+            self.events += bytes(card.index for pair in cards for card in pair)
+        else:
+            self.events += bytes(card.index for card in cards)
+
+    def to_bytes(self):
+        """The whole length-prefixed record."""
+        return length_struct.pack(len(self.start) + len(self.events)) + self.start + self.events
+
+
+class GameRecord:
+    """One parsed record, see the module docstring for the fields."""
+
+    def __init__(self, data: bytes):
+        seed, flags, self.player_count, deck_size, hand_size, table_cap = start_struct.unpack_from(data)
+        self.rules = Rules(deck_size, hand_size, table_cap)
+        offset = start_struct.size
+        self.seed = seed if flags & 1 else None
+        self.deal = [all_cards[card] for card in data[offset:offset + self.rules.deck_size]]
+        self.data = data
+        self.events_offset = offset + self.rules.deck_size
+
+    def events(self):
+        """Yields (kind, player_id, cards) per event, cards is a list of Cards (of pairs for DEFEND)."""
+        data = self.data
+        cards_of = all_cards
+        offset = self.events_offset
+        while offset < len(data):
+            kind, player, count = data[offset], data[offset + 1], data[offset + 2]
+            offset += 3
+            if kind == DEFEND:
+                cards = [[cards_of[data[offset + i]], cards_of[data[offset + i + 1]]] for i in range(0, 2 * count, 2)]
+                offset += 2 * count
+            else:
+                cards = [cards_of[card] for card in data[offset:offset + count]]
+                offset += count
+            yield kind, player, cards
+
+    def decisions(self):
+        """The events that are decisions of a player, the plies of the game."""
+        return [event for event in self.events() if event[0] in DECISIONS]
+
+    @property
+    def durak(self):
+        """The player_id of the Durak, None if nobody lost or the game didn't end."""
+        for kind, player, _ in self.events():
+            if kind == END:
+                return None if player == NO_PLAYER else player
+        return None
+
+    @property
+    def rounds(self):
+        return sum(1 for event in self.events() if event[0] == ROUND)
+
+    def __repr__(self):
+        return f"GameRecord(seed={self.seed}, players={self.player_count}, events={len(self.data) - self.events_offset} bytes)"
+
+
+class RecordWriter:
+    """Appends records to a file, the header is written if the file is new."""
+
+    def __init__(self, path):
+        self.file = open(path, "ab+")
+        if self.file.tell() == 0:
+            self.file.write(HEADER + bytes((VERSION,)))
+        else:
+            self.file.seek(len(HEADER))
+            version = self.file.read(1)[0]
+            if version != VERSION:
+                self.file.close()
+                raise ValueError(f"{path} has record version {version}, records of version {VERSION} can't be added.")
+
+    def write(self, recorder: GameRecorder):
+        self.file.write(recorder.to_bytes())
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+class RecordReader:
+    """Memory-maps a record file and iterates over its records, only one record is parsed at a time."""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap(self.file.fileno(), 0, access=ACCESS_READ)
+        if self.map[:len(HEADER)] != HEADER:
+            raise ValueError(f"{path} is not a game record file.")
+        version = self.map[len(HEADER)]
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"{path} has record version {version}, only version {VERSION} can be read.")
+
+    def __iter__(self):
+        offset = len(HEADER) + 1
+        while offset + length_struct.size <= len(self.map):
+            length, = length_struct.unpack_from(self.map, offset)
+            offset += length_struct.size
+            if offset + length > len(self.map):
+                # A record that is still being written
+                return
+            yield GameRecord(self.map[offset:offset + length])
+            offset += length
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def read_records(paths):
+    """Yields the records of all the files one by one."""
+    for path in paths:
+        with RecordReader(path) as reader:
+            yield from reader
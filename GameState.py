@@ -0,0 +1,433 @@
+"""A compact copy of the state of a DurakGame, for search algorithms.
+
+The game is driven one decision at a time: legal_moves() gives the moves of the player to move,
+apply(move) plays one and undo() takes it back again. Hands and the table are card masks and indices,
+so copying or undoing a state never copies Player or Card objects.
+The rules and the turn order are the same as in DurakGame, with the same Rules (deck size, hand size, table cap).
+
+A move is a tuple (kind, cards):
+    (ATTACK, mask)      put the cards on the table
+    (PASS, 0)           don't add cards to the table (only for the extra attacks)
+    (DIVERT, mask)      pass the attack on to the next player with cards of the same rank
+    (DEFEND, indices)   the card index that defends each undefended attack, in table order
+    (TAKE, 0)           fail the defence and take all cards on the table
+"""
+from random import Random
+
+from Cards import all_cards, cards_to_mask, mask_to_cards, ranks_in_mask
+from DurakGameRules import (check_player_count, attack_moves, divert_moves, defence_moves, deck_cards, Rules,
+                            standard_rules, MAX_PLAYERS)
+from SeatRing import SeatRing
+
+# The move kinds
+ATTACK = 0
+PASS = 1
+DIVERT = 2
+DEFEND = 3
+TAKE = 4
+
+# The phases of the game, who is to move
+FIRST_ATTACK = 0    # The first attacker of the round
+DEFENCE = 1         # The defender
+EXTRA_ATTACKS = 2   # The attackers one by one, after the defender defended
+GAME_OVER = 3
+
+# Zobrist keys: the hash of a state is the xor of the keys of everything in it
+zobrist_rng = Random(20240601)
+hand_keys = [[zobrist_rng.getrandbits(64) for _ in all_cards] for _ in range(MAX_PLAYERS)]
+attack_keys = [zobrist_rng.getrandbits(64) for _ in all_cards]      # Undefended attacks on the table
+defended_keys = [zobrist_rng.getrandbits(64) for _ in all_cards]    # Defended attacks on the table
+defence_keys = [zobrist_rng.getrandbits(64) for _ in all_cards]     # Cards that defended an attack
+defender_keys = [zobrist_rng.getrandbits(64) for _ in range(MAX_PLAYERS + 1)]   # Index -1 for no defender
+attacker_keys = [zobrist_rng.getrandbits(64) for _ in range(MAX_PLAYERS)]
+in_game_keys = [zobrist_rng.getrandbits(64) for _ in range(MAX_PLAYERS)]
+grabber_keys = [[zobrist_rng.getrandbits(64) for _ in range(MAX_PLAYERS)] for _ in range(len(all_cards) + 4)]
+stockpile_keys = [zobrist_rng.getrandbits(64) for _ in range(len(all_cards) + 1)]
+turn_keys = [[zobrist_rng.getrandbits(64) for _ in range(MAX_PLAYERS)] for _ in range(GAME_OVER + 1)]
+attacked_key = zobrist_rng.getrandbits(64)
+
+
+def mask_keys(keys, mask):
+    """xor of the keys of every card in the mask."""
+    key = 0
+    while mask:
+        bit = mask & -mask
+        key ^= keys[bit.bit_length() - 1]
+        mask ^= bit
+    return key
+
+
+def position_hash(hands, defender, stockpile_size):
+    """The hash of a position at the start of a round: the hands, the defender and the size of the stockpile.
+
+    The rest of the state follows from these then (or doesn't matter anymore, like the grabbers
+    once the stockpile is empty), so the same hash means the same position."""
+    key = defender_keys[defender] ^ stockpile_keys[stockpile_size]
+    for seat, hand in enumerate(hands):
+        key ^= mask_keys(hand_keys[seat], hand)
+    return key
+
+
+class GameState:
+    """The full state of one game, see the module docstring for how to use it.
+
+    The table is a list of [attack index, defence index] pairs, the defence index is -1 if undefended.
+    stockpile is a tuple of card indices that is shared between copies, only stockpile_size changes."""
+    max_rounds: int = 1000
+
+    def __init__(self, player_count, trump, stockpile, stockpile_size, hands, in_game=None, rules: Rules = None):
+        self.player_count = player_count
+        self.rules = rules if rules else standard_rules
+        self.trump = trump
+        self.stockpile = tuple(stockpile)
+        self.stockpile_size = stockpile_size
+        self.hands = list(hands)
+        self.ring = SeatRing(player_count, in_game)     # Never changed, a player going out makes a new ring
+        self.defender = -1
+        self.attackers = ()
+        self.table = []
+        self.table_mask = 0
+        self.grabbers = []
+        self.phase = FIRST_ATTACK
+        self.attacker_position = 0   # The attacker to move in EXTRA_ATTACKS
+        self.attacked = False        # If any attacker added cards in this EXTRA_ATTACKS loop
+        self.rounds = 0
+        self.playing = True
+        self.finish_order = []
+        self.durak = None
+        self.history = []            # Snapshots for undo
+        self.hash = self.compute_hash()
+
+    @classmethod
+    def new(cls, player_count: int, seed=None, rules: Rules = None):
+        """Deals a new game, the same way DurakGame does for the same seed and rules."""
+        rules = rules if rules else standard_rules
+        check_player_count(player_count, rules)
+        stockpile = deck_cards(rules.deck_size)
+        Random(seed).shuffle(stockpile)
+        stockpile = [card.index for card in stockpile]
+        hands = []
+        for _ in range(player_count):
+            hands.append(sum(1 << card for card in stockpile[len(stockpile) - rules.hand_size:]))
+            del stockpile[len(stockpile) - rules.hand_size:]
+        state = cls(player_count, all_cards[stockpile[0]].suit, stockpile, len(stockpile), hands, rules=rules)
+        state.start_round()
+        state.history = []
+        return state
+
+    @classmethod
+    def from_game(cls, game, phase, seat=None):
+        """The state of a running DurakGame, at the moment the player in seat has to make a decision.
+
+        phase is FIRST_ATTACK or EXTRA_ATTACKS when the player is asked to attack, DEFENCE when asked to defend."""
+        seats = game.seats
+        stockpile = [card.index for card in game.deck.stockpile]
+        state = cls(len(seats), game.deck.trumpcard.suit, stockpile, len(stockpile),
+                    [player.hand.mask for player in seats],
+                    game.ring.in_game, game.rules)
+        state.defender = game.defender.player_id
+        state.attackers = tuple(player.player_id for player in game.attackers)
+        state.table = [[attack.index, defence.index if defence else -1] for attack, defence in game.table]
+        state.table_mask = cards_to_mask([card for attack in game.table for card in attack if card])
+        if stockpile:
+            # Without a stockpile nobody grabs cards, DurakGame doesn't clear the list anymore then
+            state.grabbers = [player.player_id for player in game.players_to_grab_cards]
+        state.phase = phase
+        if phase == EXTRA_ATTACKS:
+            state.attacker_position = state.attackers.index(seat)
+            state.attacked = state.undefended_count() > 0
+        elif phase == DEFENCE:
+            state.attacked = state.undefended_count() < len(state.table)
+        state.rounds = game.rounds
+        state.finish_order = game.finish_order.copy()
+        state.hash = state.compute_hash()
+        return state
+
+    def clone(self):
+        """A copy of the state, without the undo history."""
+        state = GameState.__new__(GameState)
+        state.__dict__.update(self.__dict__)
+        state.hands = self.hands.copy()
+        state.table = [attack.copy() for attack in self.table]
+        state.grabbers = self.grabbers.copy()
+        state.finish_order = self.finish_order.copy()
+        state.history = []
+        return state
+
+    def snapshot(self):
+        """An immutable tuple of everything that can change, restore() puts it back."""
+        return (tuple(self.hands), self.ring, self.defender, self.attackers,
+                tuple(tuple(attack) for attack in self.table), self.table_mask, tuple(self.grabbers),
+                self.stockpile_size, self.phase, self.attacker_position, self.attacked, self.rounds,
+                self.playing, tuple(self.finish_order), self.durak, self.hash)
+
+    def restore(self, snapshot):
+        (hands, self.ring, self.defender, self.attackers, table, self.table_mask, grabbers,
+         self.stockpile_size, self.phase, self.attacker_position, self.attacked, self.rounds,
+         self.playing, finish_order, self.durak, self.hash) = snapshot
+        self.hands = list(hands)
+        self.table = [list(attack) for attack in table]
+        self.grabbers = list(grabbers)
+        self.finish_order = list(finish_order)
+
+    # Making and unmaking moves
+
+    def to_move(self):
+        """The seat that has to make the next move, None if the game is over."""
+        if self.phase == FIRST_ATTACK:
+            return self.first_attacker_of_the_round()
+        elif self.phase == DEFENCE:
+            return self.defender
+        elif self.phase == EXTRA_ATTACKS:
+            return self.attackers[self.attacker_position]
+        return None
+
+    def legal_moves(self):
+        """All moves of the player to move, in the same order as DurakGameRules gives them."""
+        seat = self.to_move()
+        if seat is None:
+            return []
+        hand = self.hands[seat]
+        defender_hand_size = self.hands[self.defender].bit_count()
+        table_cap = self.rules.table_cap
+
+        if self.phase == FIRST_ATTACK:
+            return [(ATTACK, attack) for attack in attack_moves(hand, defender_hand_size, 0, 0, True, table_cap)]
+        elif self.phase == EXTRA_ATTACKS:
+            moves = [(ATTACK, attack) for attack in attack_moves(hand, defender_hand_size, self.table_mask,
+                                                                 self.undefended_count(), False, table_cap)]
+            moves.append((PASS, 0))
+            return moves
+
+        undefended = [all_cards[attack] for attack, defence in self.table if defence == -1]
+        moves = []
+        if all(defence == -1 for _, defence in self.table):
+            next_defender = self.next_defender()
+            moves.extend((DIVERT, divert)
+                         for divert in divert_moves(hand, undefended, self.hands[next_defender].bit_count(), table_cap))
+        moves.extend((DEFEND, defence) for defence in defence_moves(hand, undefended, self.trump))
+        moves.append((TAKE, 0))
+        return moves
+
+    def apply(self, move, undoable=True):
+        """Plays the move for the player to move, undo() takes it back.
+
+        Playouts that never undo can skip saving the snapshot with undoable=False."""
+        if undoable:
+            self.history.append(self.snapshot())
+        kind, cards = move
+        self.hash ^= self.turn_key()
+
+        if self.phase == FIRST_ATTACK:
+            self.play_attack(self.first_attacker_of_the_round(), cards)
+            self.phase = DEFENCE if self.playing else GAME_OVER
+
+        elif self.phase == DEFENCE:
+            if kind == TAKE:
+                # The defender gets flipped twice, the failed defender doesn't get to attack first
+                self.set_hand(self.defender, self.hands[self.defender] | self.table_mask)
+                self.flip_next_defender(grab_cards=True)
+                self.end_round()
+            elif kind == DIVERT:
+                self.set_hand(self.defender, self.hands[self.defender] & ~cards)
+                for card in mask_to_cards(cards):
+                    self.add_attack(card.index)
+                self.add_grabber(self.defender)
+                self.flip_next_defender(grab_cards=False)
+            else:
+                self.set_hand(self.defender, self.hands[self.defender] & ~sum(1 << card for card in cards))
+                defences = iter(cards)
+                for attack in self.table:
+                    if attack[1] == -1:
+                        attack[1] = next(defences)
+                        self.hash ^= attack_keys[attack[0]] ^ defended_keys[attack[0]] ^ defence_keys[attack[1]]
+                        self.table_mask |= 1 << attack[1]
+                self.phase = EXTRA_ATTACKS
+                self.attacker_position = 0
+                self.set_attacked(False)
+                self.next_attacker()
+
+        elif self.phase == EXTRA_ATTACKS:
+            if kind == ATTACK:
+                self.play_attack(self.attackers[self.attacker_position], cards)
+                self.set_attacked(True)
+            self.attacker_position += 1
+            self.next_attacker()
+
+        self.hash ^= self.turn_key()
+
+    def undo(self):
+        """Takes the last applied move back."""
+        self.restore(self.history.pop())
+
+    # The game flow, the same as in DurakGame
+
+    def play_attack(self, attacker, cards):
+        self.set_hand(attacker, self.hands[attacker] & ~cards)
+        for card in mask_to_cards(cards):
+            self.add_grabber(attacker)
+            self.add_attack(card.index)
+            self.check_winner()
+
+    def next_attacker(self):
+        """Skips the attackers that can't attack, ends the loop over the attackers when everybody had a turn."""
+        defender_hand_size = self.hands[self.defender].bit_count()
+        max_attack = min(defender_hand_size, self.rules.table_cap) - self.undefended_count()
+        ranks_on_table = ranks_in_mask(self.table_mask)
+        while self.attacker_position < len(self.attackers):
+            if max_attack > 0 and self.hands[self.attackers[self.attacker_position]] & ranks_on_table:
+                return
+            self.attacker_position += 1
+
+        if not self.playing:
+            self.phase = GAME_OVER
+        elif self.attacked:
+            self.phase = DEFENCE
+        else:
+            self.end_round()
+
+    def end_round(self):
+        if self.playing:
+            self.check_winner()
+        if self.playing:
+            self.start_round()
+        else:
+            self.phase = GAME_OVER
+
+    def start_round(self):
+        if self.rounds >= self.max_rounds:
+            # Stopped without a Durak, like DurakGame.play
+            self.playing = False
+            self.phase = GAME_OVER
+            return
+        self.rounds += 1
+        self.flip_next_defender(grab_cards=True)
+        for attack, defence in self.table:
+            if defence == -1:
+                self.hash ^= attack_keys[attack]
+            else:
+                self.hash ^= defended_keys[attack] ^ defence_keys[defence]
+        self.table = []
+        self.table_mask = 0
+        self.phase = FIRST_ATTACK
+        self.set_attacked(False)
+
+    def undefended_count(self):
+        return sum(1 for _, defence in self.table if defence == -1)
+
+    @property
+    def in_game(self):
+        """Per seat if the player is still in the game."""
+        return self.ring.in_game
+
+    def players(self):
+        """The seats that are still in the game, the players of DurakGame."""
+        return list(self.ring)
+
+    def first_attacker_of_the_round(self):
+        """Determines the first attacker, the player before the defender."""
+        return self.ring.previous_seat(self.defender)
+
+    def next_defender(self):
+        """The next player after the defender (also if he is out of the game), the first player in the first round."""
+        if self.defender == -1:
+            return self.ring.head
+        return self.ring.next_seat(self.defender)
+
+    def flip_next_defender(self, grab_cards=True):
+        self.hash ^= defender_keys[self.defender]
+        for seat in self.attackers:
+            self.hash ^= attacker_keys[seat]
+        self.defender = self.next_defender()
+        self.attackers = tuple(self.ring.others(self.defender))
+        self.hash ^= defender_keys[self.defender]
+        for seat in self.attackers:
+            self.hash ^= attacker_keys[seat]
+
+        if grab_cards:
+            self.grab_cards()
+        elif self.defender in self.grabbers:
+            # If the attacks are looped around to the original attacker, make sure he doesn't have to grab cards
+            grabbers = self.grabbers.copy()
+            grabbers.remove(self.defender)
+            self.set_grabbers(grabbers)
+
+    def grab_cards(self):
+        if self.stockpile_size > 0:
+            for seat in self.grabbers:
+                missing = self.rules.hand_size - self.hands[seat].bit_count()
+                if missing > 0:
+                    grabbed = min(missing, self.stockpile_size)
+                    new_size = self.stockpile_size - grabbed
+                    cards = sum(1 << card for card in self.stockpile[new_size:self.stockpile_size])
+                    self.hash ^= stockpile_keys[self.stockpile_size] ^ stockpile_keys[new_size]
+                    self.stockpile_size = new_size
+                    self.set_hand(seat, self.hands[seat] | cards)
+        # Once the stockpile is empty nobody grabs cards anymore, so the grabbers can always be cleared
+        self.set_grabbers([])
+
+    def check_winner(self):
+        """Removes the players without cards, in seat order like DurakGame does."""
+        out = [seat for seat in self.ring if self.hands[seat] == 0]
+        if out:
+            self.ring = self.ring.copy()
+            for seat in out:
+                self.ring.remove(seat)
+                self.hash ^= in_game_keys[seat]
+                self.finish_order.append(seat)
+        if len(self.ring) < 2:
+            self.playing = False
+            if self.ring:
+                self.durak = self.ring.head
+
+    # Changing the state, while keeping the hash up to date
+
+    def compute_hash(self):
+        """The hash of the whole state computed from scratch, the moves keep self.hash up to date."""
+        key = stockpile_keys[self.stockpile_size] ^ defender_keys[self.defender] ^ self.turn_key()
+        for seat in range(self.player_count):
+            key ^= mask_keys(hand_keys[seat], self.hands[seat])
+            if self.in_game[seat]:
+                key ^= in_game_keys[seat]
+        for seat in self.attackers:
+            key ^= attacker_keys[seat]
+        for attack, defence in self.table:
+            if defence == -1:
+                key ^= attack_keys[attack]
+            else:
+                key ^= defended_keys[attack] ^ defence_keys[defence]
+        for position, seat in enumerate(self.grabbers):
+            key ^= grabber_keys[position][seat]
+        if self.attacked:
+            key ^= attacked_key
+        return key
+
+    def turn_key(self):
+        if self.phase == EXTRA_ATTACKS and self.attacker_position < len(self.attackers):
+            return turn_keys[self.phase][self.attackers[self.attacker_position]]
+        return turn_keys[self.phase][0]
+
+    def set_hand(self, seat, hand):
+        self.hash ^= mask_keys(hand_keys[seat], self.hands[seat] ^ hand)
+        self.hands[seat] = hand
+
+    def set_attacked(self, attacked):
+        if attacked != self.attacked:
+            self.hash ^= attacked_key
+        self.attacked = attacked
+
+    def add_attack(self, card):
+        self.table.append([card, -1])
+        self.table_mask |= 1 << card
+        self.hash ^= attack_keys[card]
+
+    def add_grabber(self, seat):
+        self.hash ^= grabber_keys[len(self.grabbers)][seat]
+        self.grabbers.append(seat)
+
+    def set_grabbers(self, grabbers):
+        for position, seat in enumerate(self.grabbers):
+            self.hash ^= grabber_keys[position][seat]
+        self.grabbers = grabbers
+        for position, seat in enumerate(self.grabbers):
+            self.hash ^= grabber_keys[position][seat]
@@ -1,61 +1,63 @@
 from sys import exit
-from Cards import Deck
 
 
-class PlayerGameInfo:
-    player = None
-    deck: Deck = None
-    defender = None
-    attackers = None
-    table = None
+class ConsoleIO:
+    """Talks to the human in the terminal, other ios (like the server's) have the same three methods."""
 
-    def __init__(self, player, deck, defender, attackers, table):
-        self.player = player
-        self.deck = deck
-        self.defender = defender
-        self.attackers = attackers
-        self.table = table
+    def write(self, *values):
+        print(*values)
 
+    def read(self):
+        return input("> ")
+
+    def quit(self):
+        exit("Exitted out of the game")
 
-def human_input(maxlen, pgi: PlayerGameInfo):
-    chosen_attack_number = input("> ")
-    try:
-        chosen_attack_number = int(chosen_attack_number)
-    except ValueError:
-        # Input wasn't an integer
-        standard_actions(chosen_attack_number, pgi)
-        return human_input(maxlen, pgi)
-    if chosen_attack_number < 0:
-        print("The given number wasn't higher than 0.")
-        print(f"Try inputting a number between 0 and {maxlen}")
-        return human_input(maxlen, pgi)
-    elif chosen_attack_number > maxlen:
-        print(f"The given number wasn't lower than {maxlen + 1}.")
-        print(f"Try inputting a number between 0 and {maxlen}")
-        return human_input(maxlen, pgi)
 
-    return chosen_attack_number
+def human_input(maxlen, observation):
+    """Asks the human for a number from 0 up to and including maxlen, until a valid one is given.
 
+    Anything that isn't a number is handled as a command by standard_actions."""
+    io = observation.player.io
+    while True:
+        chosen_attack_number = io.read()
+        try:
+            chosen_attack_number = int(chosen_attack_number)
+        except ValueError:
+            # Input wasn't an integer
+            standard_actions(chosen_attack_number, observation)
+            continue
+        if chosen_attack_number < 0:
+            io.write("The given number wasn't higher than 0.")
+            io.write(f"Try inputting a number between 0 and {maxlen}")
+        elif chosen_attack_number > maxlen:
+            io.write(f"The given number wasn't lower than {maxlen + 1}.")
+            io.write(f"Try inputting a number between 0 and {maxlen}")
+        else:
+            return chosen_attack_number
 
-def standard_actions(inp, pgi: PlayerGameInfo):
-    inp = inp.lower()
+
+def standard_actions(inp, observation):
+    """Answers the commands of the player from its Observation of the game."""
+    io = observation.player.io
+    inp = inp.strip().lower()
     if inp in ["exit", "quit", "q"]:
-        exit("Exitted out of the game")
+        io.quit()
     elif inp in ["hand", "h"]:
-        print(pgi.player)
+        io.write(observation.player)
     elif inp in ["stockpile", "stock", "s"]:
-        print(f"Stockpile length: {len(pgi.deck.stockpile)}")
+        io.write(f"Stockpile length: {observation.stockpile_size}")
     elif inp in ["opponents", "o", "p"]:
-        print(f"Defender:   Player {pgi.defender.player_id}, with {len(pgi.defender.hand)} cards")
-        for attacker in pgi.attackers:
-            print(f"attacker:   Player {attacker.player_id}, with {len(attacker.hand)} cards")
+        io.write(f"Defender:   Player {observation.defender}, with {observation.hand_sizes[observation.defender]} cards")
+        for attacker in observation.attackers:
+            io.write(f"attacker:   Player {attacker}, with {observation.hand_sizes[attacker]} cards")
     elif inp in ["table", "t"]:
-        print("Table: ", pgi.table)
+        io.write("Table: ", observation.table_cards())
     elif inp in ["trump", "trump card", "trumpcard", "tc"]:
-        print("Trump card: ", pgi.deck.trumpcard)
+        io.write("Trump card: ", observation.trumpcard)
 
     elif inp == "help":
-        print("""
+        io.write("""
             exit (q):       exit's out of the program.
             hand (h):       Shows your hand.
             stockpile (s):  info about the stockpile.
@@ -64,8 +66,4 @@ def standard_actions(inp, pgi: PlayerGameInfo):
             trumpcard (tc): the trump card.
         """)
     else:
-        print("Try inputting a number, or type 'help' to show commands.")
-
-
-
-
+        io.write("Try inputting a number, or type 'help' to show commands.")
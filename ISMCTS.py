@@ -0,0 +1,255 @@
+"""A cpu strategy that searches with information set Monte Carlo tree search (ISMCTS).
+
+The cpu can't see the hands of the other players or the stockpile. Every iteration of the search deals
+the unseen cards at random over them (a determinization) consistent with what the player does know:
+its own hand, the table, the trump card at the bottom of the stockpile, the cards that are out of the game,
+the cards it saw the opponents take (from its Observation) and how many cards everybody holds.
+All determinizations share one tree, a move in the tree only competes in the iterations where it is legal.
+From the new node the game is played out with the lowest value strategy.
+
+Use it as a strategy: Player(..., strategy=strategies["ismcts"]).
+A player gets an ISMCTS with the default budget on its first move,
+set player.search before the game starts to use other settings.
+"""
+from math import log, sqrt
+from random import Random
+from time import perf_counter
+
+from Cards import all_cards, mask_to_cards, rank_masks, ranks_in_mask, beats_masks, card_sort_keys
+from DurakGameRules import defence_combinations, max_divert
+from GameState import (GameState, ATTACK, PASS, DIVERT, DEFEND, TAKE,
+                       FIRST_ATTACK, DEFENCE, EXTRA_ATTACKS, GAME_OVER)
+
+
+class Node:
+    """A node of the search tree, reached by the move of seat."""
+    __slots__ = ("seat", "children", "visits", "reward", "available")
+
+    def __init__(self, seat=None):
+        self.seat = seat
+        self.children = {}      # move: Node
+        self.visits = 0
+        self.reward = 0.0       # The summed rewards of seat
+        self.available = 1      # How often the move was legal when its parent was visited
+
+    def ucb(self, exploration):
+        return self.reward / self.visits + exploration * sqrt(log(self.available) / self.visits)
+
+
+class ISMCTS:
+    """The search of one player.
+
+    Every move is searched until time_budget seconds have passed or rollouts iterations are done,
+    whichever comes first. Either budget can be None, but not both.
+    The tree is kept for the rest of the round, so the next decision in the same round starts
+    from the statistics of the earlier searches."""
+    exploration: float = 0.7
+    rollout_rounds: int = 30    # Playouts are cut off after this many rounds
+
+    def __init__(self, seat: int, time_budget: float = 0.2, rollouts: int = None, seed=None):
+        self.seat = seat
+        self.time_budget = time_budget
+        self.rollouts = rollouts
+        self.rng = Random(seed)
+        self.round = None
+        self.nodes = {}         # The nodes of this round by what the player knows there (see info_key)
+
+    def choose(self, state: GameState, observation=None):
+        """Returns the best move for the player in the state, None if there are no moves.
+
+        With the Observation of the player the cards it knows the opponents hold stay in their hands
+        in every determinization, otherwise all the cards the player can't see are dealt at random."""
+        moves = state.legal_moves()
+        if len(moves) < 2:
+            return moves[0] if moves else None
+
+        if state.rounds != self.round:
+            self.round = state.rounds
+            self.nodes = {}
+        key = self.info_key(state)
+        root = self.nodes.get(key)
+        if root is None:
+            root = self.nodes[key] = Node()
+
+        if observation is not None:
+            unseen, known = observation.unseen, observation.known
+        else:
+            unseen, known = self.unseen_cards(state), None
+        deadline = perf_counter() + self.time_budget if self.time_budget is not None else None
+        iterations = 0
+        while self.rollouts is None or iterations < self.rollouts:
+            if deadline is not None and perf_counter() > deadline:
+                break
+            self.iterate(root, self.determinize(state, unseen, known))
+            iterations += 1
+
+        visited = [move for move in moves if move in root.children]
+        if not visited:
+            return moves[0]
+        return max(visited, key=lambda move: root.children[move].visits)
+
+    def iterate(self, root: Node, state: GameState):
+        """One iteration: select and expand a node in the determinized state, play out and update the path."""
+        node = root
+        path = [root]
+        while state.phase != GAME_OVER:
+            moves = state.legal_moves()
+            if not moves:
+                break
+            untried = [move for move in moves if move not in node.children]
+            for move in moves:
+                if move in node.children:
+                    node.children[move].available += 1
+            if untried:
+                move = self.rng.choice(untried)
+                node.children[move] = node = Node(state.to_move())
+                state.apply(move, undoable=False)
+                path.append(node)
+                if state.rounds == self.round:
+                    self.nodes.setdefault(self.info_key(state), node)
+                break
+            move = max(moves, key=lambda move: node.children[move].ucb(self.exploration))
+            node = node.children[move]
+            state.apply(move, undoable=False)
+            path.append(node)
+
+        rewards = self.rollout(state)
+        for node in path:
+            node.visits += 1
+            if node.seat is not None:
+                node.reward += rewards[node.seat]
+
+    def rollout(self, state: GameState):
+        """Plays the game out with the lowest value strategy, returns the reward of every seat."""
+        state.max_rounds = state.rounds + self.rollout_rounds
+        while state.phase != GAME_OVER:
+            state.apply(lowest_value_move(state), undoable=False)
+
+        if state.durak is not None:
+            rewards = [1.0] * state.player_count
+            rewards[state.durak] = 0.0
+            return rewards
+        # Stopped without a Durak, everybody still in the game has the same chance to lose
+        players = state.players()
+        return [1.0 - 1 / len(players) if state.in_game[seat] else 1.0 for seat in range(state.player_count)]
+
+    def unseen_cards(self, state: GameState):
+        """The mask of the cards the player can't see: the other hands and the stockpile without the trump card."""
+        in_play = state.table_mask
+        for hand in state.hands:
+            in_play |= hand
+        stockpile = state.stockpile[:state.stockpile_size]
+        for card in stockpile:
+            in_play |= 1 << card
+        # The cards that are not in play anymore went out of the game in front of everybody
+        unseen = in_play & ~state.hands[self.seat] & ~state.table_mask
+        if stockpile:
+            unseen &= ~(1 << stockpile[0])
+        return unseen
+
+    def determinize(self, state: GameState, unseen: int, known: list = None):
+        """A copy of the state with the unseen cards dealt at random, keeping the size of every hand.
+
+        known optionally gives per seat the cards that are known to be in its hand, they are not in unseen."""
+        cards = [card for card in range(len(all_cards)) if unseen >> card & 1]
+        self.rng.shuffle(cards)
+        state = state.clone()
+        for seat in range(state.player_count):
+            if seat != self.seat:
+                hand = known[seat] if known else 0
+                size = state.hands[seat].bit_count() - hand.bit_count()
+                state.set_hand(seat, hand | sum(1 << card for card in cards[:size]))
+                del cards[:size]
+        if state.stockpile_size:
+            # The trump card stays at the bottom, only the number of cards in the stockpile is in the hash
+            state.stockpile = state.stockpile[:1] + tuple(cards)
+        return state
+
+    def info_key(self, state: GameState):
+        """Everything the player knows about the state, the same in every determinization."""
+        return (state.rounds, state.phase, state.to_move(), state.attacked, state.defender, state.hands[self.seat],
+                tuple(tuple(attack) for attack in state.table), tuple(hand.bit_count() for hand in state.hands),
+                tuple(state.in_game), state.stockpile_size)
+
+
+def lowest_card(mask, trump_suit):
+    """The index of the card with the lowest value in the mask."""
+    sort_keys = card_sort_keys[trump_suit]
+    return min((card.index for card in mask_to_cards(mask)), key=lambda card: sort_keys[card])
+
+
+def lowest_value_move(state: GameState):
+    """The move of the lowest value strategy (Player.cpu_lowest_value_attack and cpu_lowest_value_defend),
+    without generating the other moves.
+
+    The cheapest card to attack with, otherwise the first move of generate_defends:
+    the first divert card in card order, or the first defence the backtracking finds."""
+    hand = state.hands[state.to_move()]
+    if state.phase == FIRST_ATTACK:
+        return ATTACK, 1 << lowest_card(hand, state.trump)
+    elif state.phase == EXTRA_ATTACKS:
+        return ATTACK, 1 << lowest_card(hand & ranks_in_mask(state.table_mask), state.trump)
+
+    undefended = [attack for attack, defence in state.table if defence == -1]
+    if len(undefended) == len(state.table):
+        divert = hand & rank_masks[all_cards[undefended[0]].rank]
+        if divert and max_divert(undefended, state.hands[state.next_defender()].bit_count(), state.rules.table_cap) > 0:
+            return DIVERT, divert & -divert
+    beats = beats_masks[state.trump]
+    defence = next(defence_combinations([mask_to_cards(hand & beats[attack]) for attack in undefended]), None)
+    if defence is None:
+        return TAKE, 0
+    return DEFEND, tuple(card.index for card in defence)
+
+
+def searcher(player):
+    """The search of the player, made on its first move."""
+    if getattr(player, "search", None) is None:
+        seed = player.game.seed
+        player.search = ISMCTS(player.player_id, seed=None if seed is None else f"{seed}:{player.player_id}")
+    return player.search
+
+
+def ismcts_attack(player, defender, table):
+    """The attack strategy, called like Player.cpu_lowest_value_attack."""
+    state = GameState.from_game(player.game, EXTRA_ATTACKS if table else FIRST_ATTACK, player.player_id)
+    return attack_with(player, searcher(player).choose(state, player.observation))
+
+
+def ismcts_defend(player, next_defender, table):
+    """The defend strategy, called like Player.cpu_lowest_value_defend."""
+    state = GameState.from_game(player.game, DEFENCE)
+    return defend_with(player, table, searcher(player).choose(state, player.observation))
+
+
+# The search deals the cards the player saw the opponents take to them, so the game keeps an Observation
+ismcts_attack.observes = True
+
+
+def attack_with(player, move):
+    """Plays the GameState move as the attack of the player, returns the attack like the cpu methods."""
+    if move is None or move[0] == PASS:
+        return None
+    attack = mask_to_cards(move[1])
+    player.hand.remove_cards(attack)
+    return attack
+
+
+def defend_with(player, table, move):
+    """Plays the GameState move as the defence of the player, returns the new table like the cpu methods."""
+    kind, cards = move
+    if kind == TAKE:
+        player.hand.extend([attack[0] for attack in table if attack[0]])
+        player.hand.extend([attack[1] for attack in table if attack[1]])
+        return None
+
+    if kind == DIVERT:
+        divert = mask_to_cards(cards)
+        player.hand.remove_cards(divert)
+        return [attack for attack in table] + [[card, None] for card in divert]
+
+    defences = [all_cards[card] for card in cards]
+    player.hand.remove_cards(defences)
+    undefended = [attack for attack in table if not attack[1]]
+    return ([attack for attack in table if attack[1]]
+            + [[attack[0], defence] for attack, defence in zip(undefended, defences)])
@@ -0,0 +1,131 @@
+"""Optional instrumentation of DurakGame and the move generators, to see where the time of a game goes.
+
+Nothing is collected until enable() is called. The instrumented code only checks if Metrics.active is set,
+so with the instrumentation off a game runs at (almost) the same speed.
+
+    metrics = Metrics.enable()
+    DurakGame(4, seed=0, headless=True).play()
+    print(metrics.snapshot())
+    Metrics.disable()
+
+profile() runs a function under cProfile as well and can dump the stats,
+for pstats, snakeviz or a flamegraph converter like flameprof.
+"""
+from cProfile import Profile
+from collections import Counter, defaultdict
+from time import perf_counter
+
+
+class Metrics:
+    """Timers, call counts, move counts and game events of everything that ran while it was active."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)           # Time spent per timer
+        self.calls = Counter()                      # Calls per timer
+        self.move_counts = defaultdict(Counter)     # Per move list or generator: {moves: times}
+        self.events = Counter()                     # Diverts, defences, takes
+        self.rounds = []                            # The rounds of every finished game
+
+    def add_time(self, name, start):
+        """Adds the time since start (a perf_counter value) to the timer name."""
+        self.seconds[name] += perf_counter() - start
+        self.calls[name] += 1
+
+    def count(self, event):
+        self.events[event] += 1
+
+    def game_over(self, rounds):
+        self.rounds.append(rounds)
+
+    def count_moves(self, name, moves):
+        """Yields the moves of the generator, while timing it and counting the moves it yielded.
+
+        The cpu often stops after the first move, so for the generators this is the number of candidates seen,
+        not the number of legal moves (those are counted where the whole list is made, see legal_moves)."""
+        seconds = 0.0
+        seen = 0
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    move = next(moves)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += perf_counter() - start
+                seen += 1
+                yield move
+        finally:
+            self.seconds[name] += seconds
+            self.calls[name] += 1
+            self.move_counts[name][seen] += 1
+
+    def legal_moves(self, name, moves):
+        """Counts the size of a list of legal moves (also when it came from the MoveCache), returns the moves."""
+        self.move_counts[name][len(moves)] += 1
+        return moves
+
+    def snapshot(self):
+        """Returns everything collected so far as a dict of plain numbers."""
+        timers = {}
+        for name, seconds in sorted(self.seconds.items(), key=lambda item: -item[1]):
+            timers[name] = {"calls": self.calls[name], "seconds": seconds,
+                            "mean_us": seconds / self.calls[name] * 1e6}
+        moves = {}
+        for name, counts in self.move_counts.items():
+            calls = sum(counts.values())
+            moves[name] = {"calls": calls, "mean": sum(size * times for size, times in counts.items()) / calls,
+                           "max": max(counts), "sizes": dict(sorted(counts.items()))}
+        decisions = self.events["diverts"] + self.events["defences"] + self.events["takes"]
+        return {
+            "timers": timers,
+            "moves": moves,
+            "events": dict(self.events),
+            "divert_frequency": self.events["diverts"] / decisions if decisions else 0.0,
+            "games": len(self.rounds),
+            "rounds_per_game": sum(self.rounds) / len(self.rounds) if self.rounds else 0.0,
+            "max_rounds": max(self.rounds, default=0),
+        }
+
+    def __repr__(self):
+        snapshot = self.snapshot()
+        represent = f"Games: {snapshot['games']},    Rounds per game: {snapshot['rounds_per_game']:.1f},    "
+        represent += f"Divert frequency: {snapshot['divert_frequency']:.4f}\n\n"
+        represent += f"{'Timer':<24}{'calls':>10}{'seconds':>10}{'mean us':>10}\n"
+        for name, timer in snapshot["timers"].items():
+            represent += f"{name:<24}{timer['calls']:>10}{timer['seconds']:>10.3f}{timer['mean_us']:>10.1f}\n"
+        represent += f"\n{'Moves':<24}{'calls':>10}{'mean':>10}{'max':>10}\n"
+        for name, moves in snapshot["moves"].items():
+            represent += f"{name:<24}{moves['calls']:>10}{moves['mean']:>10.2f}{moves['max']:>10}\n"
+        return represent
+
+
+active: Metrics = None  # The Metrics that collects, None when the instrumentation is off
+
+
+def enable():
+    """Turns the instrumentation on with empty metrics and returns them."""
+    global active
+    active = Metrics()
+    return active
+
+
+def disable():
+    global active
+    active = None
+
+
+def profile(function, *args, path: str = None, **kwargs):
+    """Calls the function under cProfile with the instrumentation on.
+
+    Returns the result of the function, the Metrics and the Profile.
+    The cProfile stats are dumped to path if given."""
+    metrics = enable()
+    profiler = Profile()
+    try:
+        result = profiler.runcall(function, *args, **kwargs)
+    finally:
+        disable()
+    if path:
+        profiler.dump_stats(path)
+    return result, metrics, profiler
@@ -0,0 +1,78 @@
+"""An optional LRU cache in front of the move generators of DurakGameRules.
+
+The same hands meet the same tables over and over in long batch runs and in search,
+so the moves of a situation are kept under a canonical key of only what the moves depend on:
+
+    attacks     the cards that may be played (the hand, or the part of it with ranks on the table)
+                and the most cards that may be added
+    diverts     the cards of the rank of the attack and the most cards that may be added
+    defences    per undefended attack the cards of the hand that beat it
+
+The trump suit is never part of a key, it is already in the cards that beat each attack,
+so the same situation under another trump (or with other cards in the hand that don't matter) shares its entry.
+The moves are stored as tuples of card masks and indices, never as the lists the Player methods change.
+
+Nothing is cached until enable() is called, like Metrics.
+
+    cache = MoveCache.enable(100_000)
+    DurakGame(4, seed=0, headless=True).play()
+    print(cache)
+"""
+from collections import OrderedDict
+
+
+class MoveCache:
+    """Bounded mapping of keys to moves, the least recently used entry is evicted first."""
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """The moves of key, None if they aren't cached."""
+        moves = self.entries.get(key)
+        if moves is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return moves
+
+    def add(self, key, moves):
+        """Caches the moves of key and returns them."""
+        self.entries[key] = moves
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return moves
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def snapshot(self):
+        lookups = self.hits + self.misses
+        return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def __repr__(self):
+        snapshot = self.snapshot()
+        return (f"MoveCache: {snapshot['size']}/{snapshot['maxsize']} entries,    hits: {snapshot['hits']},    "
+                f"misses: {snapshot['misses']},    hit rate: {snapshot['hit_rate']:.4f}")
+
+
+active: MoveCache = None    # The cache the rules use, None when caching is off
+
+
+def enable(maxsize: int = 100_000):
+    """Turns caching on with an empty cache and returns it."""
+    global active
+    active = MoveCache(maxsize)
+    return active
+
+
+def disable():
+    global active
+    active = None
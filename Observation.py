@@ -0,0 +1,178 @@
+"""What one player knows about a game, kept up to date from the events of DurakGame.
+
+An Observation never looks at the other hands or the stockpile, it only follows the events
+(the same ones GameRecord stores) as a player at the table would see them:
+its own hand, the cards the opponents are known to hold because they took them from the table,
+the table, the cards that went out of the game, the size of every hand and the stockpile, and the trump card.
+
+It is also the card counter of the cpu strategies: every set of cards is a card mask that is updated
+in O(1) per event, so a strategy can ask what is still unseen (in the other hands or the stockpile),
+what an opponent may hold and who holds the trump card, without going through the history of the game.
+Cpu players get one with DurakGame(observe=True), or when their strategy has observes set (like ismcts).
+
+encode() turns it into a fixed-size numpy vector for ai players and feature extraction,
+masks() gives the same as card masks. Both are only rebuilt after the observation changed.
+NumPy is only imported by encode(), DurakGame keeps an Observation for every human player and doesn't need it.
+"""
+from Cards import all_cards, cards_to_mask, mask_to_cards
+from DurakGameRules import MAX_PLAYERS, standard_rules
+from GameRecord import ATTACK, DEFEND, DIVERT, TAKE, GRAB, ROUND
+
+# The card planes of encode(), in this order, the known cards are per opponent (relative to the player)
+card_planes = ("hand", *(f"known_{seat}" for seat in range(1, MAX_PLAYERS)),
+               "undefended", "defended", "defences", "out_of_game", "trumpcard")
+ENCODING_SIZE = len(card_planes) * len(all_cards) + 4 + 1 + 3 * MAX_PLAYERS
+
+
+class Observation:
+    """The view of the game of player, see the module docstring."""
+
+    def __init__(self, player, player_count, trumpcard, stockpile_size, deck_mask=None):
+        self.player = player
+        self.player_id = player.player_id
+        self.player_count = player_count
+        self.trumpcard = trumpcard
+        self.stockpile_size = stockpile_size
+        self.hand = player.hand.mask
+        self.known = [0] * player_count                 # Per player the cards known to be in their hand
+        self.hand_sizes = [len(player.hand)] * player_count
+        self.table = []                                 # [attack index, defence index or -1] pairs
+        self.table_bits = 0                             # The cards on the table
+        self.out_of_game = 0
+        # The cards nobody has seen yet, the trump card is seen from the start. deck_mask has the cards of the deck
+        if deck_mask is None:
+            deck_mask = standard_rules.deck_mask
+        self.unseen = deck_mask & ~self.hand & ~trumpcard.bit
+        self.trumpcard_owner = None                     # Who holds the trump card, None in the stockpile or played
+        self.defender = None
+        self.attackers = []
+        self.version = 0                                # Counts the changes
+        self.encoded_version = None
+        self.encoding = None
+        self.masks_version = None
+        self.cached_masks = None
+
+    def event(self, kind, player=None, cards=()):
+        """Updates the observation with an event of DurakGame, cards are Cards (pairs for DEFEND)."""
+        seat = player.player_id if player is not None else None
+        if kind == ATTACK or kind == DIVERT:
+            self.table.extend([card.index, -1] for card in cards)
+            self.play(seat, cards_to_mask(cards))
+        elif kind == DEFEND:
+            defences = {attack.index: defence.index for attack, defence in cards}
+            for attack in self.table:
+                if attack[0] in defences:
+                    attack[1] = defences[attack[0]]
+            self.play(seat, cards_to_mask([defence for _, defence in cards]))
+        elif kind == TAKE:
+            taken = self.table_bits
+            if seat == self.player_id:
+                self.hand |= taken
+            else:
+                self.known[seat] |= taken
+            if taken & self.trumpcard.bit:
+                self.trumpcard_owner = seat
+            self.hand_sizes[seat] += taken.bit_count()
+            self.table = []
+            self.table_bits = 0
+        elif kind == GRAB:
+            self.stockpile_size -= len(cards)
+            self.hand_sizes[seat] += len(cards)
+            if seat == self.player_id:
+                grabbed = cards_to_mask(cards)
+                self.hand |= grabbed
+                self.unseen &= ~grabbed
+            elif self.stockpile_size == 0:
+                # The trump card at the bottom of the stockpile is the last card that is grabbed
+                self.known[seat] |= self.trumpcard.bit
+            if self.stockpile_size == 0:
+                self.trumpcard_owner = seat
+        elif kind == ROUND:
+            # The cards of a defended round go out of the game
+            self.out_of_game |= self.table_bits
+            self.table = []
+            self.table_bits = 0
+            self.defender = seat
+        else:
+            return
+        self.version += 1
+
+    def turn(self, defender, attackers):
+        """Called when the defender changes."""
+        self.defender = defender.player_id
+        self.attackers = [attacker.player_id for attacker in attackers]
+        self.version += 1
+
+    def play(self, seat, mask):
+        """The cards of mask went from the hand of seat to the table."""
+        if seat == self.player_id:
+            self.hand &= ~mask
+        else:
+            self.known[seat] &= ~mask
+            self.unseen &= ~mask
+        if mask & self.trumpcard.bit:
+            self.trumpcard_owner = None
+        self.table_bits |= mask
+        self.hand_sizes[seat] -= mask.bit_count()
+
+    def table_mask(self):
+        return self.table_bits
+
+    def unknown_count(self, player_id):
+        """The number of cards in the hand of player_id that are not known."""
+        return self.hand_sizes[player_id] - self.known[player_id].bit_count()
+
+    def possible(self, player_id):
+        """The mask of the cards the opponent player_id may hold: its known cards and the unseen cards."""
+        return self.known[player_id] | self.unseen if self.unknown_count(player_id) else self.known[player_id]
+
+    def table_cards(self):
+        """The table like DurakGame has it: [attack card, defence card or None] pairs."""
+        return [[all_cards[attack], all_cards[defence] if defence != -1 else None] for attack, defence in self.table]
+
+    def known_cards(self, player_id):
+        return mask_to_cards(self.known[player_id])
+
+    def masks(self):
+        """The card masks of everything the player knows, as a dict (see card_planes)."""
+        if self.masks_version != self.version:
+            masks = {"hand": self.hand}
+            for offset in range(1, MAX_PLAYERS):
+                seat = (self.player_id + offset) % self.player_count
+                masks[f"known_{offset}"] = self.known[seat] if offset < self.player_count else 0
+            masks["undefended"] = sum(1 << attack for attack, defence in self.table if defence == -1)
+            masks["defended"] = sum(1 << attack for attack, defence in self.table if defence != -1)
+            masks["defences"] = sum(1 << defence for _, defence in self.table if defence != -1)
+            masks["out_of_game"] = self.out_of_game
+            masks["trumpcard"] = self.trumpcard.bit if self.stockpile_size else 0
+            self.cached_masks = masks
+            self.masks_version = self.version
+        return self.cached_masks
+
+    def encode(self):
+        """The observation as a float32 vector of ENCODING_SIZE, the same array until something changes.
+
+        The card planes of masks(), then the trump suit, the stockpile size,
+        and per player (starting with this one) the hand size, if it defends and if it attacks."""
+        if self.encoded_version == self.version:
+            return self.encoding
+        import numpy as np
+
+        if self.encoding is None:
+            self.encoding = np.zeros(ENCODING_SIZE, dtype=np.float32)
+        encoding = self.encoding
+        encoding[:] = 0
+        cards = len(all_cards)
+        masks = np.array(list(self.masks().values()), dtype=np.int64)[:, None]
+        encoding[:len(card_planes) * cards] = ((masks >> np.arange(cards)) & 1).ravel()
+
+        position = len(card_planes) * cards
+        encoding[position + self.trumpcard.suit - 1] = 1
+        encoding[position + 4] = self.stockpile_size / cards
+        position += 5
+        for offset in range(self.player_count):
+            seat = (self.player_id + offset) % self.player_count
+            encoding[position + 3 * offset:position + 3 * offset + 3] = (
+                self.hand_sizes[seat] / cards, seat == self.defender, seat in self.attackers)
+        self.encoded_version = self.version
+        return encoding
@@ -1,29 +1,48 @@
-from Cards import get_rank, get_value
-from DurakGameRules import possible_attacks, possible_defends
-from Human_inputs import human_input, PlayerGameInfo
+from types import MethodType
+
+from Cards import Hand
+from DurakGameRules import (possible_attacks, possible_defends, lowest_value_attack, generate_defends, first_moves,
+                            standard_rules)
+from Human_inputs import human_input, ConsoleIO
+from ISMCTS import ismcts_attack, ismcts_defend
+from Endgame import endgame_attack, endgame_defend
+from Evaluation import evaluated_attack, evaluated_defend
 
 
 class Player:
     hand = []
-    pgi: PlayerGameInfo = None
+    io = None           # How a human player is talked to
+    observation = None  # What the player knows about the game, always kept for humans (see Observation)
+    game = None     # The DurakGame of a cpu player, for strategies that look at more than the table
+    observes = False    # If the strategy of the cpu player uses its observation (then the game always keeps one)
+
+    def __init__(self, starting_hand, trump_suit, player_id, cpu: bool = True, strategy: tuple = None, io=None):
+        """strategy is an (attack, defend) pair of functions, called like the cpu methods below.
 
-    def __init__(self, starting_hand, trump_suit, player_id, cpu: bool = True):
-        self.hand = starting_hand
+        Defaults to the lowest value strategy.
+        io is how a human is talked to, the terminal by default (see Human_inputs.ConsoleIO)."""
+        self.hand = Hand(starting_hand, trump_suit)     # Always sorted on rank, with the trump cards last
         self.trump = trump_suit
         self.player_id = player_id
         self.cpu: bool = cpu
 
         if self.cpu:
-            self.attack = self.cpu_lowest_value_attack
-            self.defend = self.cpu_lowest_value_defend
+            if strategy is None:
+                strategy = strategies["lowest_value"]
+            self.attack = MethodType(strategy[0], self)
+            self.defend = MethodType(strategy[1], self)
+            self.observes = getattr(strategy[0], "observes", False)
         else:
-            #PGI will be updated in the handle round loop of durakgame.
-            self.pgi = PlayerGameInfo(None, None, None, None, None)
+            self.io = io if io else ConsoleIO()
             self.attack = self.human_attack
             self.defend = self.human_defend
 
+    @property
+    def rules(self):
+        """The Rules of the game of the player, the standard rules without a game."""
+        return self.game.rules if self.game else standard_rules
+
     def __repr__(self):
-        self.sort_cards()
         if len(self.hand) == 0:
             return "Empty Hand"
 
@@ -32,24 +51,6 @@ class Player:
             string_hand += f"\t{card}\n"
         return string_hand
 
-    def sort_cards(self):
-        trump_suits = [card for card in self.hand if card.suit == self.trump]
-        non_trump_suits = [card for card in self.hand if card.suit != self.trump]
-        if len(non_trump_suits) > 0:
-            non_trump_suits.sort(key=get_rank)
-        if len(trump_suits) > 0:
-            trump_suits.sort(key=get_rank)
-
-        self.hand = non_trump_suits
-        self.hand.extend(trump_suits)
-
-    def update_pgi(self, deck, defender, attackers, table):
-        self.pgi.player = self
-        self.pgi.deck = deck
-        self.pgi.defender = defender
-        self.pgi.attackers = attackers
-        self.pgi.table = table
-
     def attack(self):
         pass
 
@@ -59,87 +60,91 @@ class Player:
     def human_attack(self, defender, table):
         """Gives a prompt to the human, so he can choose to attack.
 
-        Uses PlayerGameInfo (pgi) to tell the player about the state of the game (in standard_actions)."""
-        print(self)
-        print(f"You are attacking player {defender.player_id}")
-        attacks = possible_attacks(self.hand, defender, table)
+        Uses the observation to tell the player about the state of the game (in standard_actions)."""
+        self.io.write(self)
+        self.io.write(f"You are attacking player {defender.player_id}")
+        attacks = possible_attacks(self.hand, defender, table, self.rules.table_cap)
         if not attacks:
-            print("\t\tNo possible attacks")
-            print("Type '0' to proceed")
-            human_input(0, self.pgi)
+            self.io.write("\t\tNo possible attacks")
+            self.io.write("Type '0' to proceed")
+            human_input(0, self.observation)
             return None
 
         attack_number = 0
         for attack in attacks:
-            print(f"\t\t{attack_number}\t", attack)
+            self.io.write(f"\t\t{attack_number}\t", attack)
             attack_number += 1
         if not table:
             #Don't give the option to hold on to cards if you are the first attacker.
-            chosen_attack_number = human_input(len(attacks) - 1, self.pgi)
+            chosen_attack_number = human_input(len(attacks) - 1, self.observation)
         else:
-            print(f"\t\t{attack_number}\t Hold on to cards")
-            chosen_attack_number = human_input(len(attacks), self.pgi)
+            self.io.write(f"\t\t{attack_number}\t Hold on to cards")
+            chosen_attack_number = human_input(len(attacks), self.observation)
             if chosen_attack_number == attack_number:
                 return None
 
-        self.hand = [card for card in self.hand if card not in attacks[chosen_attack_number]]
+        self.hand.remove_cards(attacks[chosen_attack_number])
         return attacks[chosen_attack_number]
 
     def human_defend(self, next_defender, table):
         """Gives a prompt to the human, so he can choose how and if he defends.
 
-        Uses PlayerGameInfo (pgi) to tell the player about the state of the game (in standard_actions)."""
-        print(self)
-        print(f"You are defending: {table}")
+        Uses the observation to tell the player about the state of the game (in standard_actions)."""
+        self.io.write(self)
+        self.io.write(f"You are defending: {table}")
         # first_attack is a bool, true if you're defending the first card, false if the attacks are extra cards
         first_attack = all([attacks[1] is None for attacks in table])
-        defends = possible_defends(self.hand, table, first_attack, next_defender)
+        defends = possible_defends(self.hand, table, first_attack, next_defender, self.trump, self.rules.table_cap)
         if not defends:
-            print("\t\tNo possible defends")
-            print("Type '0' to proceed")
-            human_input(0, self.pgi)
+            self.io.write("\t\tNo possible defends")
+            self.io.write("Type '0' to proceed")
+            human_input(0, self.observation)
             self.hand.extend([attack[0] for attack in table if attack[0]])
             self.hand.extend([attack[1] for attack in table if attack[1]])
             return None
 
         defend_number = 0
         for defend in defends:
-            print(f"\t\t{defend_number}\t", defend)
+            self.io.write(f"\t\t{defend_number}\t", defend)
             defend_number += 1
-        print(f"\t\t{defend_number}\t Fail defence and take the cards")
-        chosen_defend_number = human_input(len(defends), self.pgi)
+        self.io.write(f"\t\t{defend_number}\t Fail defence and take the cards")
+        chosen_defend_number = human_input(len(defends), self.observation)
         if chosen_defend_number == len(defends):
             self.hand.extend([attack[0] for attack in table if attack[0]])
             self.hand.extend([attack[1] for attack in table if attack[1]])
             return None
 
-        self.hand = [card for card in self.hand if (card not in [defence[1] for defence in defends[chosen_defend_number]]) and
-                                                   (card not in [defence[0] for defence in defends[chosen_defend_number]])]
+        self.hand.remove_cards([card for defence in defends[chosen_defend_number] for card in defence if card])
         return defends[chosen_defend_number]
 
     def cpu_lowest_value_attack(self, defender, table):
         """returns the best attack, based on the lowest value"""
-        attacks = possible_attacks(self.hand, defender, table)
-        if not attacks:
+        attack = lowest_value_attack(self.hand, defender, table, self.rules.table_cap)
+        if not attack:
             return None
-        attacks.sort(key=get_value)
-        self.hand = [card for card in self.hand if card not in attacks[0]]
+        self.hand.remove_cards(attack)
 
-        return attacks[0]
+        return attack
 
     def cpu_lowest_value_defend(self, next_defender, table):
         """returns the best defence, based on the lowest value"""
         # first_attack is a bool, true if you're defending the first card, false if the attacks are extra cards
         first_attack = all([attacks[1] is None for attacks in table])
-        defends = possible_defends(self.hand, table, first_attack, next_defender)
+        defends = first_moves(generate_defends(self.hand, table, first_attack, next_defender, self.trump,
+                                               self.rules.table_cap))
         if not defends:
             self.hand.extend([attack[0] for attack in table if attack[0]])
             self.hand.extend([attack[1] for attack in table if attack[1]])
             return None
 
-        self.hand = [card for card in self.hand if (card not in [defence[1] for defence in defends[0]]) and
-                                                   (card not in [defence[0] for defence in defends[0]])]
+        self.hand.remove_cards([card for defence in defends[0] for card in defence if card])
         return defends[0]
 
 
-
+# The cpu strategies by name, as (attack, defend) pairs
+strategies = {
+    "lowest_value": (Player.cpu_lowest_value_attack, Player.cpu_lowest_value_defend),
+    "ismcts": (ismcts_attack, ismcts_defend),
+    "endgame": (endgame_attack, endgame_defend),
+    "evaluated": (evaluated_attack, evaluated_defend),
+}
@@ -0,0 +1,71 @@
+"""Rebuilds the DurakGame of a GameRecord, after the whole game or after any number of plies.
+
+A ply is one decision of a player: an attack, a pass, a defence, a divert or taking the cards.
+Every player gets a strategy that plays the recorded decisions back, so the game goes
+through exactly the same states as when it was recorded.
+"""
+from Cards import Deck
+from DurakGame import DurakGame
+from GameRecord import GameRecord, ATTACK, PASS, DEFEND, DIVERT, TAKE
+
+
+class RecordedDeck(Deck):
+    """A deck that is always dealt in the recorded order."""
+
+    def __init__(self, deal: list):
+        self.deal = deal
+        super().__init__(size=len(deal))
+
+    def reset(self, seed=None):
+        self.stockpile[:] = self.deal
+        self.trumpcard = self.stockpile[0]
+
+
+class StopReplay(Exception):
+    """Raised by the replay strategies when the ply to stop at is reached."""
+
+
+def replay(record: GameRecord, ply: int = None):
+    """Returns the DurakGame of the record, just before decision number ply (the whole game if None)."""
+    decisions = iter(record.decisions())
+    plies = 0
+
+    def next_decision(player, kinds):
+        nonlocal plies
+        if plies == ply:
+            raise StopReplay
+        kind, player_id, cards = next(decisions)
+        if player_id != player.player_id or kind not in kinds:
+            raise ValueError(f"Ply {plies} of the record doesn't match the game, it isn't a move of "
+                             f"player {player.player_id}.")
+        plies += 1
+        return kind, cards
+
+    def attack(player, defender, table):
+        kind, cards = next_decision(player, (ATTACK, PASS))
+        if kind == PASS:
+            return None
+        player.hand.remove_cards(cards)
+        return cards
+
+    def defend(player, next_defender, table):
+        kind, cards = next_decision(player, (DEFEND, DIVERT, TAKE))
+        if kind == TAKE:
+            player.hand.extend([attack[0] for attack in table if attack[0]])
+            player.hand.extend([attack[1] for attack in table if attack[1]])
+            return None
+        if kind == DIVERT:
+            player.hand.remove_cards(cards)
+            return table + [[card, None] for card in cards]
+        player.hand.remove_cards([defence for _, defence in cards])
+        return [attack for attack in table if attack[1]] + cards
+
+    game = DurakGame(record.player_count, seed=record.seed, headless=True,
+                     strategies=[(attack, defend)] * record.player_count, deck=RecordedDeck(record.deal),
+                     rules=record.rules)
+    try:
+        # Games that were stopped without a Durak are stopped after the same round
+        game.play(max_rounds=record.rounds)
+    except StopReplay:
+        pass
+    return game
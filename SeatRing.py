@@ -0,0 +1,80 @@
+"""The turn order of a game: the seats still in the game, as a circular doubly linked list.
+
+A seat is the player_id, so the ids stay the same when players go out.
+Going to the next or previous seat and taking a seat out of the game are O(1).
+A seat that is out keeps its links, so the next and previous seats of a player that just went out
+(a defender that played its last card) are still the right ones.
+"""
+
+
+class SeatRing:
+    """The seats still in the game, in seat order around the table."""
+    __slots__ = ("next", "previous", "in_game", "size", "head")
+
+    def __init__(self, seats: int, in_game: list = None):
+        self.in_game = list(in_game) if in_game else [True] * seats
+        playing = [seat for seat in range(seats) if self.in_game[seat]]
+        self.size = len(playing)
+        self.head = playing[0] if playing else None    # The lowest seat in the game
+        # The seats that are out point to the next seat in the game, like they did when they went out
+        self.next = [None] * seats
+        self.previous = [None] * seats
+        for seat in range(seats):
+            self.next[seat] = next((other for other in playing if other > seat), self.head)
+            self.previous[seat] = next((other for other in reversed(playing) if other < seat),
+                                       playing[-1] if playing else None)
+
+    def copy(self):
+        ring = SeatRing.__new__(SeatRing)
+        ring.next = self.next.copy()
+        ring.previous = self.previous.copy()
+        ring.in_game = self.in_game.copy()
+        ring.size = self.size
+        ring.head = self.head
+        return ring
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, seat):
+        return self.in_game[seat]
+
+    def __iter__(self):
+        """The seats in the game, lowest first."""
+        seat = self.head
+        for _ in range(self.size):
+            yield seat
+            seat = self.next[seat]
+
+    def next_seat(self, seat):
+        """The first seat in the game after seat, seat itself can be out of the game."""
+        seat = self.next[seat]
+        while not self.in_game[seat]:
+            seat = self.next[seat]
+        return seat
+
+    def previous_seat(self, seat):
+        """The first seat in the game before seat, seat itself can be out of the game."""
+        seat = self.previous[seat]
+        while not self.in_game[seat]:
+            seat = self.previous[seat]
+        return seat
+
+    def others(self, seat):
+        """The other seats in the game, starting after seat and going around the table."""
+        other = self.next_seat(seat)
+        for _ in range(self.size):
+            if other != seat:
+                yield other
+            other = self.next[other]
+
+    def remove(self, seat):
+        """Takes the seat out of the game, nothing happens if it is out already."""
+        if not self.in_game[seat]:
+            return
+        self.in_game[seat] = False
+        self.size -= 1
+        self.next[self.previous[seat]] = self.next[seat]
+        self.previous[self.next[seat]] = self.previous[seat]
+        if seat == self.head:
+            self.head = self.next[seat] if self.size else None
@@ -0,0 +1,216 @@
+"""Streaming statistics of many games, for long simulation campaigns.
+
+GameStats takes the GameResults one by one and only keeps counts and running sums, so its size
+depends on the players and strategies, not on the amount of games. Stats of parallel workers can be merged,
+and saved to (and loaded from) a JSON checkpoint at any moment.
+
+It keeps the win and Durak rates per seat and per strategy (with Wilson confidence intervals),
+the mean and spread of the rounds per game, and per pair of strategies how often one finished before the other.
+All of these only count the games that were played out, aborted games are only counted in games and aborted.
+The ratings are fitted on those pairwise results (Bradley-Terry) and shown on the Elo scale,
+so they don't depend on the order the games came in, like updating Elo ratings game by game would.
+"""
+import json
+import os
+from math import log10, sqrt
+from uuid import uuid4
+
+Z_95 = 1.96     # The z score of a 95% confidence interval
+
+
+def wilson_interval(successes, trials, z=Z_95):
+    """The Wilson score interval of a rate, (low, high)."""
+    if not trials:
+        return 0.0, 1.0
+    rate = successes / trials
+    centre = rate + z * z / (2 * trials)
+    spread = z * sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials))
+    scale = 1 + z * z / trials
+    return (centre - spread) / scale, (centre + spread) / scale
+
+
+class RunningMean:
+    """Mean and variance of a stream of numbers (Welford), can be merged with another RunningMean."""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, maximum=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2            # The sum of squared differences from the mean
+        self.maximum = maximum
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def merge(self, other):
+        if other.count:
+            count = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta * delta * self.count * other.count / count
+            self.mean += delta * other.count / count
+            self.count = count
+            self.maximum = other.maximum if self.maximum is None else max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def deviation(self):
+        return sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def interval(self, z=Z_95):
+        margin = z * self.deviation / sqrt(self.count) if self.count else 0.0
+        return self.mean - margin, self.mean + margin
+
+
+class GameStats:
+    """Everything that is aggregated over the GameResults, see the module docstring.
+
+    A win is being the first player to get rid of all cards, a game that ended without a Durak is a draw.
+    Aborted games (see DurakGame.play) are counted apart: they are in games, but not in the draws, the rounds,
+    the seats, wins and Durak counts or pairwise, so the rates are out of the played games."""
+
+    def __init__(self, player_count, strategy_names):
+        self.player_count = player_count
+        self.strategy_names = list(dict.fromkeys(strategy_names))
+        self.games = 0
+        self.draws = 0
+        self.aborted = 0
+        self.seat_wins = [0] * player_count
+        self.seat_duraks = [0] * player_count
+        self.strategy_seats = {name: 0 for name in self.strategy_names}     # Number of seats played by the strategy
+        self.strategy_wins = {name: 0 for name in self.strategy_names}
+        self.strategy_duraks = {name: 0 for name in self.strategy_names}
+        self.rounds = RunningMean()
+        # pairwise[a][b]: the times a player of strategy a finished before one of strategy b, half for a tie
+        self.pairwise = {a: {b: 0.0 for b in self.strategy_names} for a in self.strategy_names}
+
+    def add(self, result, seat_strategies):
+        """Adds the GameResult of one game, seat_strategies are the strategy names per seat."""
+        self.games += 1
+        if result.aborted:
+            self.aborted += 1
+            return
+        self.rounds.add(result.rounds)
+        for name in seat_strategies:
+            self.strategy_seats[name] += 1
+        if result.finish_order:
+            winner = result.finish_order[0]
+            self.seat_wins[winner] += 1
+            self.strategy_wins[seat_strategies[winner]] += 1
+        if result.durak is None:
+            self.draws += 1
+        else:
+            self.seat_duraks[result.durak] += 1
+            self.strategy_duraks[seat_strategies[result.durak]] += 1
+
+        # The places of the seats: the finish order, then everybody still in the game (tied) and the Durak last
+        places = {seat: place for place, seat in enumerate(result.finish_order)}
+        for seat in range(self.player_count):
+            if seat not in places:
+                places[seat] = len(result.finish_order) + (seat == result.durak)
+        for seat, place in places.items():
+            for other, other_place in places.items():
+                a, b = seat_strategies[seat], seat_strategies[other]
+                if a != b:
+                    self.pairwise[a][b] += 1.0 if place < other_place else 0.5 if place == other_place else 0.0
+
+    @property
+    def played(self):
+        """The games that weren't aborted, the win and Durak rates are out of these."""
+        return self.games - self.aborted
+
+    def merge(self, other):
+        """Adds the stats of other, of games with the same player count and strategies."""
+        if other.player_count != self.player_count or other.strategy_names != self.strategy_names:
+            raise ValueError(f"Can't merge the stats of {other.player_count} players of {other.strategy_names} "
+                             f"into those of {self.player_count} players of {self.strategy_names}.")
+        self.games += other.games
+        self.draws += other.draws
+        self.aborted += other.aborted
+        for seat in range(self.player_count):
+            self.seat_wins[seat] += other.seat_wins[seat]
+            self.seat_duraks[seat] += other.seat_duraks[seat]
+        for name in self.strategy_names:
+            self.strategy_seats[name] += other.strategy_seats[name]
+            self.strategy_wins[name] += other.strategy_wins[name]
+            self.strategy_duraks[name] += other.strategy_duraks[name]
+            for opponent in self.strategy_names:
+                self.pairwise[name][opponent] += other.pairwise[name][opponent]
+        self.rounds.merge(other.rounds)
+        return self
+
+    def ratings(self, iterations: int = 200):
+        """The Elo rating of every strategy, fitted on the pairwise results, 1500 on average.
+
+        Every pair that played gets one virtual draw, so a strategy that never won still gets a finite rating."""
+        names = self.strategy_names
+        wins = {a: {b: self.pairwise[a][b] + (0.5 if self.pairwise[a][b] + self.pairwise[b][a] else 0.0)
+                    for b in names if b != a} for a in names}
+        strength = {name: 1.0 for name in names}
+        for _ in range(iterations):
+            for a in names:
+                games = sum((wins[a][b] + wins[b][a]) / (strength[a] + strength[b]) for b in wins[a])
+                if games:
+                    strength[a] = sum(wins[a].values()) / games
+            mean_log = sum(log10(value) for value in strength.values()) / len(names)
+            strength = {name: value / 10 ** mean_log for name, value in strength.items()}
+        return {name: 1500 + 400 * log10(value) for name, value in strength.items()}
+
+    def to_dict(self):
+        return {"player_count": self.player_count, "strategy_names": self.strategy_names, "games": self.games,
+                "draws": self.draws, "aborted": self.aborted, "seat_wins": self.seat_wins,
+                "seat_duraks": self.seat_duraks, "strategy_seats": self.strategy_seats,
+                "strategy_wins": self.strategy_wins, "strategy_duraks": self.strategy_duraks, "pairwise": self.pairwise,
+                "rounds": [self.rounds.count, self.rounds.mean, self.rounds.m2, self.rounds.maximum]}
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["player_count"], data["strategy_names"])
+        for field in ("games", "draws", "seat_wins", "seat_duraks", "strategy_seats", "strategy_wins",
+                      "strategy_duraks", "pairwise"):
+            setattr(stats, field, data[field])
+        stats.aborted = data["aborted"]
+        stats.rounds = RunningMean(*data["rounds"])
+        return stats
+
+    def save(self, path, **extra):
+        """Writes a checkpoint, the extra values are stored next to the stats.
+
+        The file is replaced at once, so a checkpoint on disk is never half written,
+        also when more processes write the same file."""
+        temporary = f"{path}.{uuid4().hex}.tmp"
+        with open(temporary, "w") as file:
+            json.dump({"stats": self.to_dict(), **extra}, file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a checkpoint, returns the stats and a dict with the extra values."""
+        with open(path) as file:
+            data = json.load(file)
+        return cls.from_dict(data.pop("stats")), data
+
+    def __repr__(self):
+        games = max(self.played, 1)
+        low, high = self.rounds.interval()
+        represent = f"Games: {self.games},    Draws: {self.draws},    Aborted: {self.aborted},    "
+        represent += f"Rounds per game: {self.rounds.mean:.2f} ({low:.2f}-{high:.2f}), max {self.rounds.maximum}\n\n"
+        represent += "Seat\tWin rate\t\t\tDurak rate\n"
+        for seat in range(self.player_count):
+            represent += (f"{seat}\t{rate(self.seat_wins[seat], games)}"
+                          f"\t{rate(self.seat_duraks[seat], games)}\n")
+        ratings = self.ratings()
+        represent += "\nStrategy\tSeats\tWin rate\t\t\tDurak rate\t\t\tElo\n"
+        for name in self.strategy_names:
+            seats = max(self.strategy_seats[name], 1)
+            represent += (f"{name}\t{self.strategy_seats[name]}\t{rate(self.strategy_wins[name], seats)}"
+                          f"\t{rate(self.strategy_duraks[name], seats)}\t{ratings[name]:.0f}\n")
+        return represent
+
+
+def rate(successes, trials):
+    """The rate with its 95% interval, as text."""
+    low, high = wilson_interval(successes, trials)
+    return f"{successes / trials:.4f} ({low:.4f}-{high:.4f})"
@@ -0,0 +1,275 @@
+"""Benchmarks of the rules hot paths and of whole cpu games, with a baseline to catch regressions.
+
+Every benchmark uses seeded decks or fixed fixtures, so the same work is measured on every run.
+Per benchmark it reports the operations per second (the best of the repeats)
+and the peak memory one operation allocates, measured in a separate run with tracemalloc.
+
+remove_duplicates and the cartesian products don't exist anymore,
+defence_combinations (that replaced them) is measured instead.
+Player.sort_cards is gone too, a Hand is always sorted: sorted_hand builds a Hand and goes over it in sorted order.
+The scaling benchmarks play whole games with the 52 card deck up to 8 players,
+and find the cheapest defence (a matching, polynomial in the table size) against tables of up to 18 attacks.
+The batch benchmarks play 1000 games per operation with BatchDurakGame (needs NumPy),
+times 1000 that is the games per second to hold against the game benchmarks.
+
+What to expect of one process (CPython 3.11, one core): a DurakGame with 4 lowest value cpus is about 600 games/s,
+2 players about 1400 games/s. A 4 player game has about 14 rounds and 100 decisions, and after the lowest attack
+became a lookup (lowest_value_attack) the profile has no hot spot left: the time is spread over the round loop,
+the defences, check_winner and the position hash, every one a few hundred Python calls per game.
+Thousands of games per second per process is what BatchDurakGame is for: about 6500 2 player
+and 4000 4 player games/s, it plays the same games (see tests/test_batch.py). More processes scale on top of both,
+tournament.py splits the seeds over worker processes and Campaign.py over machines.
+
+With --move-cache the rules run with a MoveCache of that size, its hits and misses are printed at the end.
+
+usage: python benchmark.py --save baseline.json
+       python benchmark.py --compare baseline.json --threshold 0.1
+       python benchmark.py --only possible_defends_3 --move-cache 100000
+"""
+import json
+import sys
+import tracemalloc
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+import MoveCache
+from Cards import Card, Deck, Hand, all_cards, beats_masks, cards_to_mask, mask_to_cards, DECK_SIZE
+from DurakGame import DurakGame
+from DurakGameRules import (possible_attacks, possible_defends, strip_list, defence_combinations, lowest_value_defence,
+                            possible_defends_per_card, Rules)
+from Player import Player
+
+fixture_count = 64  # The seeded fixtures every benchmark cycles through
+
+
+def seeded_hands(seed, hand_size, deck_size=DECK_SIZE):
+    """fixture_count hands (and the trump suit of their deck) from seeded decks."""
+    deck = Deck(Random(seed), deck_size)
+    fixtures = []
+    for _ in range(fixture_count):
+        deck.reset()
+        fixtures.append((deck.grab_cards(hand_size), deck.trumpcard.suit))
+    return fixtures
+
+
+def cycle(fixtures, operation):
+    """Returns a function that does the operation on the next fixture every call."""
+    position = 0
+
+    def run():
+        nonlocal position
+        operation(*fixtures[position])
+        position = (position + 1) % len(fixtures)
+    return run
+
+
+def trump_heavy_fixtures():
+    """Per trump suit: 6 high trumps and 5 low attacks in the other suits, every trump beats every attack."""
+    fixtures = []
+    for trump in range(1, 5):
+        hand = [Card(trump, rank) for rank in (9, 10, 11, 12, 13, 14)]
+        attacks = [Card(suit, rank) for suit in range(1, 5) if suit != trump for rank in (6, 7)][:5]
+        fixtures.append((hand, attacks, trump))
+    return fixtures
+
+
+def bench_possible_attacks_first():
+    defender = Player(all_cards[:6], 1, 1)
+    return cycle(seeded_hands(1, 6), lambda hand, trump: possible_attacks(hand, defender, []))
+
+
+def bench_possible_attacks_extra():
+    """Extra attacks on a table with 2 defended attacks, taken from the same deck."""
+    defender = Player(all_cards[:6], 1, 1)
+    fixtures = []
+    for cards, trump in seeded_hands(2, 10):
+        fixtures.append((cards[:6], [[cards[6], cards[7]], [cards[8], cards[9]]]))
+    return cycle(fixtures, lambda hand, table: possible_attacks(hand, defender, table))
+
+
+def bench_possible_defends(attack_count):
+    """Random hands of 6 cards against attack_count undefended attacks."""
+    next_defender = Player(all_cards[:6], 1, 1)
+    fixtures = []
+    for cards, trump in seeded_hands(10 + attack_count, 6 + attack_count):
+        table = [[card, None] for card in cards[6:]]
+        fixtures.append((cards[:6], table, trump))
+    return cycle(fixtures, lambda hand, table, trump: possible_defends(hand, table, True, next_defender, trump))
+
+
+def bench_possible_defends_trump_heavy():
+    """The worst case: 6 trumps against 5 low attacks."""
+    next_defender = Player(all_cards[:6], 1, 1)
+    fixtures = [(hand, [[attack, None] for attack in attacks], trump)
+                for hand, attacks, trump in trump_heavy_fixtures()]
+    return cycle(fixtures, lambda hand, table, trump: possible_defends(hand, table, True, next_defender, trump))
+
+
+def bench_defence_combinations_trump_heavy():
+    """defence_combinations on its own, for the same fixtures as possible_defends_trump_heavy."""
+    fixtures = []
+    for hand, attacks, trump in trump_heavy_fixtures():
+        hand_mask = cards_to_mask(hand)
+        fixtures.append(([mask_to_cards(hand_mask & beats_masks[trump][attack.index]) for attack in attacks],))
+    return cycle(fixtures, lambda defence_cards: list(defence_combinations(defence_cards)))
+
+
+def bench_lowest_value_defence(attack_count):
+    """The cheapest defence of 6 + attack_count cards against attack_count attacks, from the 52 card deck."""
+    fixtures = []
+    for cards, trump in seeded_hands(30 + attack_count, 6 + 2 * attack_count, 52):
+        hand, attacks = cards[:6 + attack_count], cards[6 + attack_count:]
+        fixtures.append(([possible_defends_per_card(hand, attack, trump) for attack in attacks], trump))
+    return cycle(fixtures, lowest_value_defence)
+
+
+def bench_strip_list():
+    """All combinations of 4 cards of the same rank, the largest divert or attack there is."""
+    fixtures = [([card for card in all_cards if card.rank == rank],) for rank in range(6, 15)]
+    return cycle(fixtures, strip_list)
+
+
+def bench_sorted_hand():
+    """Puts shuffled 12 card hands in a Hand and goes over them in sorted order."""
+    return cycle(seeded_hands(3, 12), lambda cards, trump: list(Hand(cards, trump)))
+
+
+def bench_hand_pickups():
+    """A hand that takes 6 tables of 4 cards from the 52 card deck, then plays the cards of a rank 6 times."""
+    fixtures = []
+    for cards, trump in seeded_hands(4, 30, 52):
+        fixtures.append((cards[:6], [cards[6 + 4 * table:10 + 4 * table] for table in range(6)], trump))
+
+    def pickups(cards, tables, trump):
+        hand = Hand(cards, trump)
+        for table in tables:
+            hand.extend(table)
+        for _ in range(6):
+            card = next(iter(hand))
+            hand.remove_cards(hand.rank_cards(card.rank))
+    return cycle(fixtures, pickups)
+
+
+def bench_game(player_count, deck_size=DECK_SIZE):
+    """Whole headless games with the lowest value strategy, one operation is one game."""
+    seeds = list(range(fixture_count))
+    rules = Rules(deck_size)
+    deck = Deck(size=deck_size)
+    return cycle([(seed,) for seed in seeds],
+                 lambda seed: DurakGame(player_count, seed=seed, headless=True, deck=deck, rules=rules).play())
+
+
+def bench_batch(player_count, games=1000):
+    """The same games as bench_game, played as one BatchDurakGame of games games per operation."""
+    from BatchDurakGame import BatchDurakGame
+    seeds = [seed % fixture_count for seed in range(games)]
+    return lambda: BatchDurakGame(player_count, seeds).play()
+
+
+benchmarks = {
+    "possible_attacks_first": bench_possible_attacks_first,
+    "possible_attacks_extra": bench_possible_attacks_extra,
+    **{f"possible_defends_{count}": (lambda count=count: bench_possible_defends(count)) for count in range(1, 6)},
+    "possible_defends_trump_heavy": bench_possible_defends_trump_heavy,
+    "defence_combinations_trump_heavy": bench_defence_combinations_trump_heavy,
+    **{f"lowest_value_defence_{count}": (lambda count=count: bench_lowest_value_defence(count))
+       for count in (6, 12, 18)},
+    "strip_list": bench_strip_list,
+    "sorted_hand": bench_sorted_hand,
+    "hand_pickups": bench_hand_pickups,
+    **{f"game_{count}_players": (lambda count=count: bench_game(count)) for count in range(2, 6)},
+    **{f"game_52_cards_{count}_players": (lambda count=count: bench_game(count, 52)) for count in (2, 4, 6, 8)},
+    **{f"batch_1000_games_{count}_players": (lambda count=count: bench_batch(count)) for count in (2, 4)},
+}
+
+
+def measure(run, min_time, repeat):
+    """Returns the best operations per second over repeat runs of at least min_time seconds."""
+    best = 0.0
+    for _ in range(repeat):
+        operations = 0
+        start = perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            for _ in range(16):
+                run()
+            operations += 16
+            elapsed = perf_counter() - start
+        best = max(best, operations / elapsed)
+    return best
+
+
+def measure_allocations(run, operations=fixture_count):
+    """Returns the highest peak of traced memory (in bytes) of a single operation."""
+    tracemalloc.start()
+    peak = 0
+    for _ in range(operations):
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - start)
+    tracemalloc.stop()
+    return peak
+
+
+def run_benchmarks(names=None, min_time=0.5, repeat=3):
+    """Runs the benchmarks (all of them by default) and returns {name: {"ops_per_sec", "peak_bytes"}}."""
+    results = {}
+    for name in names or benchmarks:
+        run = benchmarks[name]()
+        results[name] = {"ops_per_sec": measure(run, min_time, repeat), "peak_bytes": measure_allocations(run)}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Returns the names of the benchmarks that got more than threshold (a fraction) slower than the baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result["ops_per_sec"] < baseline[name]["ops_per_sec"] * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+
+def report(results, baseline=None):
+    represent = f"{'Benchmark':<36}{'ops/sec':>14}{'peak bytes':>12}"
+    represent += f"{'baseline':>14}{'change':>9}\n" if baseline else "\n"
+    for name, result in results.items():
+        represent += f"{name:<36}{result['ops_per_sec']:>14.1f}{result['peak_bytes']:>12}"
+        if baseline and name in baseline:
+            old = baseline[name]["ops_per_sec"]
+            represent += f"{old:>14.1f}{result['ops_per_sec'] / old - 1:>+9.1%}"
+        represent += "\n"
+    return represent
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Benchmark the rules and whole games.")
+    parser.add_argument("--only", nargs="+", choices=list(benchmarks), help="Only run these benchmarks")
+    parser.add_argument("--time", type=float, default=0.5, help="Minimum seconds per repeat")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="Save the results as a baseline JSON file")
+    parser.add_argument("--compare", help="Compare with a baseline JSON file, fails on a regression")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="The fraction of the baseline throughput a benchmark may lose")
+    parser.add_argument("--move-cache", type=int, help="Cache the moves of the rules in a MoveCache of this size")
+    args = parser.parse_args()
+
+    cache = MoveCache.enable(args.move_cache) if args.move_cache else None
+    results = run_benchmarks(args.only, args.time, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["benchmarks"]
+    print(report(results, baseline))
+    if cache:
+        print(cache)
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"python": sys.version.split()[0], "benchmarks": results}, file, indent=2)
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,234 @@
+"""An asyncio server that hosts many Durak tables at once, humans and cpus mixed.
+
+Clients talk a line protocol, so a terminal with nc or telnet is enough to play:
+every line from the server is text for the player, a line that is just ">" asks for input.
+Outside of a game these commands are understood:
+
+    tables                                  the tables that wait for players
+    create <players> [humans] [strategy]    a new table, you take the first seat,
+                                            the seats after the humans are cpus with the strategy
+    join <table>                            sit down at a table that waits for players
+    help
+    quit
+
+At a table the lines are the numbers and commands of Human_inputs, like in the terminal game.
+Every table plays a normal DurakGame in a thread of its own, so the cpu moves and the game logic
+never run on the event loop and a slow strategy doesn't stall the other tables.
+At most --max-tables tables are played at once, a table can't be created (or start) while they are all taken.
+
+usage: python server.py --port 7777
+       python server.py --unix /tmp/durak.sock
+"""
+import asyncio
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from queue import Queue
+
+from DurakGame import DurakGame
+from DurakGameRules import check_player_count
+from Player import strategies
+
+help_text = """Commands:
+    tables                                  the tables that wait for players
+    create <players> [humans] [strategy]    a new table with cpus after the humans
+    join <table>                            sit down at a table
+    quit"""
+
+
+class PlayerLeft(Exception):
+    """Raised in the game thread when a human quits or disconnects."""
+
+
+class SocketIO:
+    """The io of a human player at a table (see Human_inputs.ConsoleIO), for one client connection.
+
+    write is called from the game thread and hands the text to the event loop,
+    read blocks the game thread until the event loop puts a line of the client in lines."""
+
+    def __init__(self, loop, writer):
+        self.loop = loop
+        self.writer = writer
+        self.lines = Queue()     # Lines of the client while at a table, None when the client left
+        self.table = None
+        self.closed = False
+
+    def write(self, *values):
+        if not self.closed:
+            text = " ".join(str(value) for value in values) + "\n"
+            self.loop.call_soon_threadsafe(self.send, text.encode())
+
+    def send(self, data):
+        """Writes to the client, on the event loop."""
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def read(self):
+        self.write(">")
+        line = self.lines.get()
+        if line is None:
+            raise PlayerLeft
+        return line
+
+    def quit(self):
+        raise PlayerLeft
+
+
+class Table:
+    """A game that waits for its human players, or is being played."""
+
+    def __init__(self, table_id, player_count, humans, strategy_name):
+        self.table_id = table_id
+        self.player_count = player_count
+        self.humans = humans
+        self.strategy_name = strategy_name
+        self.ios = []           # The ios of the humans that sat down, by seat
+        self.playing = False
+
+    def __repr__(self):
+        return (f"Table {self.table_id}: {self.player_count} players, {len(self.ios)}/{self.humans} humans, "
+                f"cpus play {self.strategy_name}")
+
+
+class DurakServer:
+    """Accepts the clients and runs every table in a thread of the executor.
+
+    The executor has a thread per table, so a table is only started when one is free
+    instead of waiting in the queue of the executor without telling the players."""
+
+    def __init__(self, max_tables: int = 256):
+        self.tables = {}
+        self.table_ids = count()
+        self.max_tables = max_tables
+        self.running = 0        # The tables being played
+        self.executor = ThreadPoolExecutor(max_workers=max_tables)
+
+    async def handle_client(self, reader, writer):
+        io = SocketIO(asyncio.get_running_loop(), writer)
+        io.write("Welcome to Durak, type 'help' for the commands.")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors="replace").rstrip("\r\n")
+                if io.table is not None:
+                    io.lines.put(line)
+                elif not self.command(io, line.split()):
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            io.closed = True
+            if io.table is not None:
+                if io.table.playing:
+                    io.lines.put(None)
+                else:
+                    io.table.ios.remove(io)
+                    if not io.table.ios:
+                        del self.tables[io.table.table_id]
+            writer.close()
+
+    def command(self, io, words):
+        """Handles a command outside of a game, returns False if the client wants to leave."""
+        if not words:
+            return True
+        command, arguments = words[0].lower(), words[1:]
+        if command in ("quit", "exit", "q"):
+            return False
+        elif command == "tables":
+            waiting = [table for table in self.tables.values() if not table.playing]
+            io.write("\n".join(str(table) for table in waiting) if waiting else "No tables are waiting for players.")
+        elif command == "create":
+            try:
+                player_count = int(arguments[0])
+                humans = int(arguments[1]) if len(arguments) > 1 else 1
+                check_player_count(player_count)
+            except (IndexError, ValueError) as error:
+                io.write(f"Can't create the table: {error}")
+                return True
+            if self.running >= self.max_tables:
+                io.write(f"Can't create the table: all {self.max_tables} tables are being played, try again later.")
+                return True
+            strategy_name = arguments[2] if len(arguments) > 2 else "lowest_value"
+            if not 1 <= humans <= player_count or strategy_name not in strategies:
+                io.write(f"Give 1 to {player_count} humans and a strategy from {list(strategies)}.")
+                return True
+            table = Table(next(self.table_ids), player_count, humans, strategy_name)
+            self.tables[table.table_id] = table
+            self.sit_down(io, table)
+        elif command == "join":
+            table = self.tables.get(int(arguments[0])) if arguments and arguments[0].isdigit() else None
+            if table is None or table.playing:
+                io.write("There is no table waiting with that number.")
+            else:
+                self.sit_down(io, table)
+        else:
+            io.write(help_text)
+        return True
+
+    def sit_down(self, io, table):
+        io.table = table
+        table.ios.append(io)
+        io.write(f"You sit down at seat {len(table.ios) - 1} of table {table.table_id}.")
+        if len(table.ios) == table.humans:
+            if self.running >= self.max_tables:
+                del self.tables[table.table_id]
+                for player_io in table.ios:
+                    self.leave_table(player_io, f"All {self.max_tables} tables are being played, "
+                                                f"the table can't start, try again later.")
+                return
+            table.playing = True
+            self.running += 1
+            game = asyncio.get_running_loop().run_in_executor(self.executor, self.play_table, table)
+            game.add_done_callback(self.table_done)
+        else:
+            io.write(f"Waiting for {table.humans - len(table.ios)} more players.")
+
+    def play_table(self, table):
+        """Plays the game of the table, in a thread of the executor."""
+        message = "The game is over."
+        try:
+            DurakGame(table.player_count, ios=dict(enumerate(table.ios)),
+                      strategies=[strategies[table.strategy_name]] * table.player_count)
+        except PlayerLeft:
+            message = "A player left the table, the game is over."
+        except Exception as error:
+            message = f"The game stopped with an error: {error!r}"
+        finally:
+            self.tables.pop(table.table_id, None)
+            for io in table.ios:
+                io.loop.call_soon_threadsafe(self.leave_table, io, message)
+
+    def table_done(self, game):
+        """Frees the thread of a finished table, on the event loop."""
+        self.running -= 1
+
+    @staticmethod
+    def leave_table(io, message):
+        """Sends the player back to the lobby, on the event loop so no line gets lost in between."""
+        io.table = None
+        # Lines that were sent during the game don't count as commands
+        io.lines = Queue()
+        io.send(f"{message}\nBack in the lobby, type 'help' for the commands.\n".encode())
+
+
+async def serve(host="127.0.0.1", port=7777, unix=None, max_tables=256):
+    server = DurakServer(max_tables)
+    if unix:
+        listener = await asyncio.start_unix_server(server.handle_client, path=unix, backlog=1024)
+    else:
+        listener = await asyncio.start_server(server.handle_client, host, port, backlog=1024)
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Host Durak tables over TCP or a Unix socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--unix", help="Listen on this Unix socket path instead of TCP")
+    parser.add_argument("--max-tables", type=int, default=256, help="Tables that can be played at the same time")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, args.unix, args.max_tables))
@@ -0,0 +1,5 @@
+import sys
+from os import path
+
+# The modules live in the root of the repository
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
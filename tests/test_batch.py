@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from BatchDurakGame import BatchDurakGame, popcount, popcount_bytes
+from DurakGame import DurakGame
+from DurakGameRules import Rules
+
+
+def outcome(result):
+    return result.seed, result.durak, result.finish_order, result.rounds, result.aborted
+
+
+@pytest.mark.parametrize("player_count", [2, 3, 4, 5])
+def test_batch_is_scalar(player_count):
+    seeds = range(150)
+    batch = BatchDurakGame(player_count, seeds).play()
+    assert [outcome(result) for result in batch] == \
+           [outcome(DurakGame(player_count, seed=seed, headless=True).play()) for seed in seeds]
+
+
+@pytest.mark.parametrize("rules, player_count", [(Rules(24, 4), 3), (Rules(52), 6), (Rules(36, 5), 4)])
+def test_batch_is_scalar_with_other_rules(rules, player_count):
+    seeds = range(60)
+    batch = BatchDurakGame(player_count, seeds, rules).play()
+    assert [outcome(result) for result in batch] == \
+           [outcome(DurakGame(player_count, seed=seed, headless=True, rules=rules).play()) for seed in seeds]
+
+
+def test_repeating_game_is_aborted():
+    # Both hands stay full with cards left in the stockpile, the same takes go on forever
+    result, = BatchDurakGame(2, [2]).play()
+    assert result.aborted and result.durak is None and result.rounds < 20
+
+
+def test_max_rounds():
+    batch = BatchDurakGame(3, range(20)).play(max_rounds=3)
+    assert any(result.aborted for result in batch)
+    assert [outcome(result) for result in batch] == \
+           [outcome(DurakGame(3, seed=seed, headless=True).play(max_rounds=3)) for seed in range(20)]
+
+
+def test_table_cap_has_to_be_six():
+    with pytest.raises(ValueError):
+        BatchDurakGame(2, [0], Rules(table_cap=4))
+
+
+def test_popcount_without_bitwise_count():
+    masks = np.random.default_rng(0).integers(0, 1 << 62, size=(50, 7), dtype=np.int64)
+    masks[0, 0] = 0
+    expected = [[int(mask).bit_count() for mask in row] for row in masks]
+    assert popcount_bytes(masks).tolist() == expected
+    assert popcount(masks).tolist() == expected
+
+
+def test_batch_with_the_byte_popcount(monkeypatch):
+    import BatchDurakGame as module
+    monkeypatch.setattr(module, "popcount", popcount_bytes)
+    seeds = range(60)
+    assert [outcome(result) for result in BatchDurakGame(4, seeds).play()] == \
+           [outcome(DurakGame(4, seed=seed, headless=True).play()) for seed in seeds]
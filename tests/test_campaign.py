@@ -0,0 +1,66 @@
+import os
+from time import time
+
+import pytest
+
+from Campaign import Campaign, ClaimLost, run_workers
+from tournament import run_tournament
+
+
+@pytest.fixture
+def campaign(tmp_path):
+    return Campaign.create(str(tmp_path / "campaign"), ["lowest_value"], 50, 3, seed=4, shard_size=20)
+
+
+def age(claim, seconds):
+    """Makes the claim look like it wasn't touched for seconds."""
+    then = time() - seconds
+    os.utime(claim, (then, then))
+
+
+def test_merge_is_the_tournament(campaign):
+    assert run_workers(campaign.directory, workers=1) == 3
+    stats, missing = campaign.merge()
+    assert missing == 0
+    assert stats.to_dict() == run_tournament(["lowest_value"], 50, 3, seed=4, workers=1, chunk_size=20).to_dict()
+
+
+def test_claims(campaign):
+    assert campaign.claim(0, "a")
+    assert not campaign.claim(0, "b")
+    campaign.release(0, "b")
+    assert campaign.owner(campaign.claim_path(0)) == "a"
+    campaign.release(0, "a")
+    assert campaign.owner(campaign.claim_path(0)) is None
+
+
+def test_stale_claim_is_taken_over(campaign):
+    assert campaign.claim(0, "a")
+    age(campaign.claim_path(0), 100)
+    assert not campaign.claim(0, "b", lease=1000)
+    assert campaign.claim(0, "b", lease=10)
+    assert campaign.owner(campaign.claim_path(0)) == "b"
+    with pytest.raises(ClaimLost):
+        campaign.renew(0, "a")
+    campaign.release(0, "a")
+    assert campaign.owner(campaign.claim_path(0)) == "b"
+
+
+def test_heartbeat_renews_the_claim(campaign):
+    assert campaign.claim(0, "a")
+    age(campaign.claim_path(0), 100)
+    beat = campaign.heartbeat(0, "a", lease=0)
+    beat()
+    assert not campaign.stale(campaign.claim_path(0), 10)
+
+
+def test_lost_shard_is_not_saved(campaign):
+    assert campaign.claim(0, "a")
+
+    def take_over():
+        age(campaign.claim_path(0), 100)
+        campaign.claim(0, "b", lease=10)
+
+    with pytest.raises(ClaimLost):
+        campaign.play(0, lambda: (take_over(), campaign.renew(0, "a")))
+    assert not campaign.done(0)
@@ -0,0 +1,64 @@
+from random import Random
+
+from Cards import Hand, all_cards, card_sort_keys, cards_to_mask, suits
+
+
+def expected(cards, trump):
+    """The cards as the sorted list the Hand replaces."""
+    if trump is None:
+        return sorted(cards, key=lambda card: card.index)
+    return sorted(cards, key=lambda card: card_sort_keys[trump][card.index])
+
+
+def check(hand, cards):
+    assert list(hand) == expected(cards, hand.trump)
+    assert len(hand) == len(cards)
+    assert hand.mask == cards_to_mask(cards)
+    assert all(card in hand for card in cards)
+    for suit in suits:
+        assert hand.suit_cards(suit) == sorted((card for card in cards if card.suit == suit),
+                                               key=lambda card: card.index)
+
+
+def test_hand_stays_sorted():
+    rng = Random(0)
+    for _ in range(200):
+        trump = rng.choice([None, *suits])
+        cards = rng.sample(all_cards, rng.randint(0, 12))
+        hand = Hand(cards, trump)
+        check(hand, cards)
+        for _ in range(20):
+            step = rng.random()
+            if step < 0.3:
+                card = rng.choice(all_cards)
+                hand.add(card)
+                if card not in cards:
+                    cards.append(card)
+            elif step < 0.55:
+                added = rng.sample(all_cards, rng.randint(0, 4))
+                hand.extend(added)
+                cards.extend(card for card in added if card not in cards)
+            elif step < 0.85:
+                # Also cards that aren't in the hand, those are skipped
+                removed = rng.sample(all_cards, rng.randint(0, 4)) + rng.sample(cards, min(len(cards), 2))
+                hand.remove_cards(removed)
+                cards = [card for card in cards if card not in removed]
+            else:
+                hand.set_trump(rng.choice([None, *suits]))
+            check(hand, cards)
+
+
+def test_copy_is_independent():
+    hand = Hand(all_cards[:5], 2)
+    copy = hand.copy()
+    copy.remove_cards([all_cards[0]])
+    copy.add(all_cards[20])
+    assert list(hand) == expected(all_cards[:5], 2)
+    assert list(copy) == expected(all_cards[1:5] + [all_cards[20]], 2)
+    assert copy != hand and copy.trump == hand.trump
+
+
+def test_rank_cards():
+    hand = Hand([card for card in all_cards if card.rank in (7, 13)], 4)
+    assert hand.rank_cards(7) == [card for card in all_cards if card.rank == 7]
+    assert hand.rank_cards(8) == []
@@ -0,0 +1,64 @@
+import pytest
+
+from Endgame import EndgameSolver, is_endgame, WIN, DRAW, LOSS
+from GameState import GameState, GAME_OVER
+from ISMCTS import lowest_value_move
+
+
+class TooBig(Exception):
+    pass
+
+
+def minimax(state, first, path, budget):
+    """Plain minimax without pruning or a table, a position that comes back on the path is a draw."""
+    budget[0] -= 1
+    if budget[0] < 0:
+        raise TooBig
+    if state.phase == GAME_OVER:
+        return DRAW if state.durak is None else (LOSS if state.durak == first else WIN)
+    if state.hash in path:
+        return DRAW
+    path.add(state.hash)
+    values = []
+    for move in state.legal_moves():
+        state.apply(move)
+        values.append(minimax(state, first, path, budget))
+        state.undo()
+    path.remove(state.hash)
+    return max(values) if state.to_move() == first else min(values)
+
+
+def small_endgames(seeds, most_cards):
+    """Every endgame position with at most most_cards cards in the hands of the greedy games of the seeds."""
+    for seed in seeds:
+        state = GameState.new(2, seed)
+        while state.phase != GAME_OVER:
+            if is_endgame(state) and sum(hand.bit_count() for hand in state.hands) <= most_cards:
+                position = state.clone()
+                position.max_rounds = float("inf")
+                yield position
+            state.apply(lowest_value_move(state), undoable=False)
+
+
+def test_solver_matches_minimax():
+    kept = EndgameSolver(None)  # Keeps its table over all the positions
+    small = EndgameSolver(None, table_size=64)
+    compared = 0
+    for position in small_endgames(range(80), 5):
+        first = min(position.players())
+        try:
+            value = minimax(position, first, set(), [5000])
+        except TooBig:
+            continue
+        value = value if position.to_move() == first else -value
+        assert EndgameSolver(None).solve(position)[0] == value
+        assert kept.solve(position)[0] == value
+        assert small.solve(position)[0] == value
+        assert len(small.table.entries) <= 64 and len(small.moves.entries) <= 64
+        compared += 1
+    assert compared > 30
+
+
+def test_not_an_endgame():
+    with pytest.raises(ValueError):
+        EndgameSolver().solve(GameState.new(3, 1))
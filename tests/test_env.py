@@ -0,0 +1,39 @@
+from random import Random
+
+import numpy as np
+
+from DurakEnv import DurakEnv, VectorDurakEnv
+
+
+def test_stored_observations_stay_the_same():
+    env = DurakEnv(2)
+    observation, mask = env.reset(seed=3)
+    stored = [(observation, observation.copy(), mask, mask.copy())]
+    done = False
+    while not done:
+        observation, mask, _, done = env.step(int(np.flatnonzero(mask)[0]))
+        stored.append((observation, observation.copy(), mask, mask.copy()))
+    assert len(stored) > 2
+    for observation, expected_observation, mask, expected_mask in stored:
+        assert np.array_equal(observation, expected_observation) and np.array_equal(mask, expected_mask)
+
+
+def test_vector_env_is_the_single_envs():
+    vector = VectorDurakEnv(3, seed=5)
+    envs = [DurakEnv(2) for _ in range(3)]
+    streams = [Random(f"5:{number}") for number in range(3)]
+    observations, masks = vector.reset()
+    first = observations
+    for number, env in enumerate(envs):
+        observation, mask = env.reset(streams[number].getrandbits(64))
+        assert np.array_equal(observations[number], observation) and np.array_equal(masks[number], mask)
+    for _ in range(40):
+        actions = [int(np.flatnonzero(mask)[-1]) for mask in masks]
+        observations, masks, rewards, dones = vector.step(actions)
+        for number, env in enumerate(envs):
+            observation, mask, reward, done = env.step(actions[number])
+            assert (rewards[number], dones[number]) == (reward, done)
+            if done:
+                observation, mask = env.reset(streams[number].getrandbits(64))
+            assert np.array_equal(observations[number], observation) and np.array_equal(masks[number], mask)
+    assert not np.array_equal(first, observations)
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+import Evaluation
+from Cards import Card, cards_to_mask
+from DurakGame import DurakGame
+from DurakGameRules import Rules
+from Evaluation import Model, encode, features, linear_model, load, default_weights, FEATURE_COUNT
+from Player import strategies
+
+SPADES = 4
+
+
+def test_encode_features():
+    six_clubs, six_hearts, ten_spades, ace_clubs = Card(1, 6), Card(3, 6), Card(SPADES, 10), Card(1, 14)
+    hand = cards_to_mask([six_clubs, six_hearts, ten_spades, ace_clubs])
+    moves = [cards_to_mask([six_clubs, six_hearts]), ten_spades.bit]
+    encoded = encode(moves, hand, 0, SPADES, 5, 12, passing=True)
+    assert encoded.shape == (3, FEATURE_COUNT) and encoded.dtype == np.float32
+    expected = np.array([
+        # cards trumps value  hand_left  hand_strength      empty opened opponent stockpile divert pass
+        [2 / 6, 0,     0.12,  2 / 6,     (30 + 14) / 2 / 34, 0,    1,     5 / 6,   12 / 36,  0,     0],
+        [1 / 6, 1 / 6, 0.30,  3 / 6,     (6 + 6 + 14) / 3 / 34, 0, 1,     5 / 6,   12 / 36,  0,     0],
+        [0,     0,     0,     4 / 6,     (6 + 6 + 30 + 14) / 4 / 34, 0, 0, 5 / 6,  12 / 36,  0,     1],
+    ], dtype=np.float32)
+    assert np.allclose(encoded, expected)
+
+
+def test_encode_scales_by_the_rules():
+    hand = cards_to_mask([Card(1, 7), Card(2, 7), Card(SPADES, 8)])
+    moves = [cards_to_mask([Card(1, 7), Card(2, 7)]), Card(SPADES, 8).bit]
+    encoded = encode(moves, hand, 0, SPADES, [3, 2], 10, divert_count=1, rules=Rules(24, 4, 3))
+    assert np.allclose(encoded[:, 0], [2 / 3, 1 / 3])
+    assert np.allclose(encoded[:, 1], [0, 1 / 3])
+    assert np.allclose(encoded[:, 3], [1 / 4, 2 / 4])
+    assert np.allclose(encoded[:, 7], [3 / 4, 2 / 4])
+    assert np.allclose(encoded[:, 8], 10 / 24)
+    assert list(encoded[:, 9]) == [1, 0]
+
+
+def test_linear_model_scores():
+    model = linear_model({"cards": 1.0, "pass": -2.0})
+    encoded = np.zeros((2, FEATURE_COUNT), dtype=np.float32)
+    encoded[0, features.index("cards")] = 0.5
+    encoded[1, features.index("pass")] = 1
+    assert np.allclose(model.scores(encoded), [0.5, -2.0])
+
+
+def test_model_needs_the_features_and_one_output():
+    with pytest.raises(ValueError):
+        Model([(np.zeros((FEATURE_COUNT - 1, 1), dtype=np.float32), np.zeros(1, dtype=np.float32))])
+    with pytest.raises(ValueError):
+        Model([(np.zeros((FEATURE_COUNT, 2), dtype=np.float32), np.zeros(2, dtype=np.float32))])
+
+
+def test_save_and_load(tmp_path):
+    rng = np.random.default_rng(0)
+    model = Model([(rng.normal(size=(FEATURE_COUNT, 8)).astype(np.float32), rng.normal(size=8).astype(np.float32)),
+                   (rng.normal(size=(8, 1)).astype(np.float32), rng.normal(size=1).astype(np.float32))])
+    model.save(tmp_path / "mlp.npz")
+    loaded = load(tmp_path / "mlp.npz")
+    assert len(loaded.layers) == 2
+    for (weights, bias), (loaded_weights, loaded_bias) in zip(model.layers, loaded.layers):
+        assert np.array_equal(weights, loaded_weights) and np.array_equal(bias, loaded_bias)
+    encoded = rng.random((5, FEATURE_COUNT)).astype(np.float32)
+    assert np.allclose(model.scores(encoded), loaded.scores(encoded))
+
+
+def test_load_checks_the_feature_names(tmp_path):
+    linear_model(default_weights).save(tmp_path / "weights.npz")
+    with np.load(tmp_path / "weights.npz") as arrays:
+        arrays = dict(arrays)
+    arrays["features"] = np.array(features[::-1])
+    np.savez(tmp_path / "other.npz", **arrays)
+    with pytest.raises(ValueError):
+        load(tmp_path / "other.npz")
+
+
+def test_evaluated_games_with_other_rules():
+    for rules in [None, Rules(24, 4, 3), Rules(52)]:
+        for seed in range(5):
+            game = DurakGame(3, seed=seed, headless=True, rules=rules,
+                             strategies=[strategies["evaluated"], strategies["lowest_value"], strategies["evaluated"]])
+            result = game.play()
+            assert result.aborted or len(result.finish_order) + (result.durak is not None) == 3
+    assert Evaluation.active is not None
@@ -0,0 +1,71 @@
+from random import Random
+
+import pytest
+
+from Cards import card_values
+from DurakGame import DurakGame
+from DurakGameRules import Rules
+from GameState import GameState, ATTACK, FIRST_ATTACK, DEFENCE, GAME_OVER, position_hash
+
+
+def lowest_value_policy(state):
+    """The moves DurakGame's lowest value strategy makes: the first defence, or the cheapest attack."""
+    moves = state.legal_moves()
+    if state.phase == DEFENCE:
+        return moves[0]
+    values = card_values[state.trump]
+    return min((move for move in moves if move[0] == ATTACK),
+               key=lambda move: sum(values[card] for card in range(len(values)) if move[1] >> card & 1))
+
+
+@pytest.mark.parametrize("player_count, rules", [(2, None), (3, None), (4, None), (5, None),
+                                                 (3, Rules(24, 4)), (7, Rules(52))])
+def test_same_games_as_durak_game(player_count, rules):
+    compared = 0
+    for seed in range(40):
+        result = DurakGame(player_count, seed=seed, headless=True, rules=rules).play()
+        if result.aborted:
+            # GameState doesn't look for repeated positions, it only stops at max_rounds
+            continue
+        state = GameState.new(player_count, seed, rules)
+        while state.phase != GAME_OVER:
+            state.apply(lowest_value_policy(state), undoable=False)
+        assert (state.durak, state.finish_order, state.rounds) == (result.durak, result.finish_order, result.rounds)
+        compared += 1
+    assert compared > 30
+
+
+def test_hash_and_undo_on_random_walks():
+    rng = Random(1)
+    for seed in range(60):
+        state = GameState.new(rng.choice([2, 3, 4, 5]), seed)
+        snapshots = []
+        while state.phase != GAME_OVER and len(snapshots) < 200:
+            snapshots.append(state.snapshot())
+            state.apply(rng.choice(state.legal_moves()))
+            assert state.hash == state.compute_hash()
+            if rng.random() < 0.3 and state.phase != GAME_OVER:
+                # Playing on a clone leaves the state alone
+                before = state.snapshot()
+                clone = state.clone()
+                clone.apply(rng.choice(clone.legal_moves()))
+                assert state.snapshot() == before
+        while snapshots:
+            state.undo()
+            assert state.snapshot() == snapshots.pop()
+
+
+def test_from_game_matches_position_hash():
+    game = DurakGame(3, seed=5, headless=True)
+    game.start_round()
+    state = GameState.from_game(game, FIRST_ATTACK)
+    assert state.hash == state.compute_hash()
+    assert game.position_hash() == position_hash(state.hands, state.defender, state.stockpile_size)
+
+
+def test_max_rounds_stops_without_durak():
+    state = GameState.new(2, 2)
+    state.max_rounds = 5
+    while state.phase != GAME_OVER:
+        state.apply(lowest_value_policy(state), undoable=False)
+    assert state.rounds == 5 and state.durak is None
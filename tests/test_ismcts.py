@@ -0,0 +1,87 @@
+from random import Random
+
+from Cards import card_values, mask_to_cards
+from DurakGame import DurakGame
+from GameState import GameState, ATTACK, DEFENCE, GAME_OVER
+from ISMCTS import ISMCTS, lowest_value_move
+from Player import strategies
+
+
+def card_set(state):
+    """Every card still in play: the hands, the stockpile and the table."""
+    cards = state.table_mask
+    for hand in state.hands:
+        cards |= hand
+    for card in state.stockpile[:state.stockpile_size]:
+        cards |= 1 << card
+    return cards
+
+
+def game_states(player_count, seed):
+    state = GameState.new(player_count, seed)
+    while state.phase != GAME_OVER:
+        yield state
+        state.apply(lowest_value_move(state))
+
+
+def test_determinizations_keep_what_the_player_knows():
+    rng = Random(0)
+    for seed in range(20):
+        for state in game_states(3, seed):
+            search = ISMCTS(state.to_move(), seed=seed)
+            # Some cards of the opponents are known, like the cards the player saw them take
+            known = [hand & rng.getrandbits(64) if seat != search.seat else 0 for seat, hand in enumerate(state.hands)]
+            unseen = search.unseen_cards(state)
+            for hand in known:
+                unseen &= ~hand
+            determinized = search.determinize(state, unseen, known)
+            assert determinized.hands[search.seat] == state.hands[search.seat]
+            assert determinized.table == state.table
+            assert [hand.bit_count() for hand in determinized.hands] == [hand.bit_count() for hand in state.hands]
+            assert all(determinized.hands[seat] & hand == hand for seat, hand in enumerate(known))
+            assert determinized.stockpile_size == state.stockpile_size
+            if state.stockpile_size:
+                assert determinized.stockpile[0] == state.stockpile[0]
+            assert card_set(determinized) == card_set(state)
+            assert determinized.hash == determinized.compute_hash()
+            assert state.hash == state.compute_hash()
+
+
+def test_choose_gives_a_legal_move():
+    for state in [state.clone() for state in game_states(2, 4)][:40]:
+        move = ISMCTS(state.to_move(), time_budget=None, rollouts=20, seed=1).choose(state)
+        assert move in state.legal_moves()
+
+
+def test_ismcts_plays_whole_games():
+    for seed in range(3):
+        game = DurakGame(3, seed=seed, headless=True,
+                         strategies=[strategies["ismcts"], strategies["lowest_value"], strategies["lowest_value"]])
+        game.seats[0].search = ISMCTS(0, time_budget=None, rollouts=10, seed=seed)
+        result = game.play()
+        assert result.aborted or len(result.finish_order) + (result.durak is not None) == 3
+
+
+def test_lowest_value_move_is_the_player_strategy():
+    for player_count, seed in [(2, 0), (3, 1), (4, 2), (5, 3)]:
+        for state in game_states(player_count, seed):
+            moves = state.legal_moves()
+            if state.phase == DEFENCE:
+                # The first move of generate_defends
+                expected = moves[0]
+            else:
+                values = card_values[state.trump]
+                expected = min((move for move in moves if move[0] == ATTACK),
+                               key=lambda move: sum(values[card.index] for card in mask_to_cards(move[1])))
+            assert lowest_value_move(state) == expected
+
+
+def test_rollouts_play_the_games_of_durak_game():
+    for seed in range(20):
+        result = DurakGame(3, seed=seed, headless=True).play()
+        if result.aborted:
+            continue
+        state = GameState.new(3, seed)
+        while state.phase != GAME_OVER:
+            state.apply(lowest_value_move(state), undoable=False)
+        assert (state.durak, state.finish_order, state.rounds) == (result.durak, result.finish_order, result.rounds)
@@ -0,0 +1,14 @@
+import Metrics
+from DurakGame import DurakGame
+
+
+def test_a_default_game_counts_move_sizes():
+    metrics = Metrics.enable()
+    try:
+        DurakGame(4, seed=0, headless=True).play()
+    finally:
+        Metrics.disable()
+    snapshot = metrics.snapshot()
+    assert snapshot["games"] == 1
+    assert snapshot["moves"]
+    assert snapshot["moves"]["generate_defends"]["calls"] >= 1
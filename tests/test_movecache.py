@@ -0,0 +1,90 @@
+from random import Random
+from types import SimpleNamespace
+
+import MoveCache
+from Cards import deck_cards
+from DurakGame import DurakGame
+from DurakGameRules import possible_attacks, possible_defends
+from GameState import GameState, GAME_OVER
+from ISMCTS import ISMCTS, lowest_value_move
+from Player import strategies
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MoveCache.MoveCache(2)
+    cache.add("a", (1,))
+    cache.add("b", (2,))
+    assert cache.get("a") == (1,)   # b is now the least recently used
+    cache.add("c", (3,))
+    assert cache.get("b") is None
+    assert cache.get("a") == (1,) and cache.get("c") == (3,)
+    assert list(cache.entries) == ["a", "c"]
+    assert (cache.hits, cache.misses) == (3, 1)
+    assert cache.snapshot() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1, "hit_rate": 0.75}
+    cache.clear()
+    assert cache.snapshot()["size"] == 0 and cache.hits == cache.misses == 0
+
+
+def random_situation(rng):
+    """A hand, a defender and a table of attacks, partly defended when first_attack is False."""
+    cards = deck_cards(36)
+    rng.shuffle(cards)
+    hand, defender, attacks = cards[:6], SimpleNamespace(hand=cards[6:6 + rng.randint(1, 6)]), cards[12:]
+    first_attack = rng.random() < 0.5
+    if first_attack:
+        rank = attacks[0].rank
+        table = [[card, None] for card in attacks if card.rank == rank][:rng.randint(1, 3)]
+    else:
+        table = [[attacks[i], attacks[i + 1] if rng.random() < 0.6 else None] for i in range(0, rng.randint(2, 8), 2)]
+    return hand, defender, table, first_attack, rng.randint(1, 4)
+
+
+def test_cached_moves_are_the_same_moves():
+    rng = Random(0)
+    situations = [random_situation(rng) for _ in range(300)]
+    uncached = [(possible_attacks(hand, defender, table), possible_defends(hand, table, first, defender, trump))
+                for hand, defender, table, first, trump in situations]
+    MoveCache.enable(50)   # Small, so entries get evicted as well
+    try:
+        for _ in range(2):
+            for (hand, defender, table, first, trump), moves in zip(situations, uncached):
+                assert (possible_attacks(hand, defender, table),
+                        possible_defends(hand, table, first, defender, trump)) == moves
+        assert MoveCache.active.hits > 0
+    finally:
+        MoveCache.disable()
+
+
+def test_legal_moves_are_the_same_with_the_cache():
+    states = []
+    for seed in range(10):
+        state = GameState.new(3, seed)
+        while state.phase != GAME_OVER:
+            states.append((state.clone(), state.legal_moves()))
+            state.apply(lowest_value_move(state), undoable=False)
+    cache = MoveCache.enable(1000)
+    try:
+        for state, moves in states:
+            assert state.legal_moves() == moves
+        assert cache.hits > 0
+    finally:
+        MoveCache.disable()
+
+
+def play(seed):
+    game = DurakGame(3, seed=seed, headless=True,
+                     strategies=[strategies["ismcts"], strategies["lowest_value"], strategies["lowest_value"]])
+    game.seats[0].search = ISMCTS(0, time_budget=None, rollouts=10, seed=seed)
+    result = game.play()
+    return result.durak, result.finish_order, result.rounds, result.aborted
+
+
+def test_games_are_the_same_with_the_cache():
+    for seed in range(3):
+        uncached = play(seed)
+        cache = MoveCache.enable(1000)
+        try:
+            assert play(seed) == uncached
+            assert cache.hits > 0
+        finally:
+            MoveCache.disable()
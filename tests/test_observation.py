@@ -0,0 +1,55 @@
+import pytest
+
+from Cards import cards_to_mask
+from DurakGame import DurakGame
+from DurakGameRules import Rules
+from GameRecord import ATTACK, DEFEND, DIVERT, ROUND
+
+
+class Checker:
+    """A listener after the observations, compares every observation with the real game after each event."""
+
+    def __init__(self, game):
+        self.game = game
+        self.events = 0
+
+    def event(self, kind, player=None, cards=()):
+        game = self.game
+        hands = [player.hand.mask for player in game.seats]
+        stockpile = cards_to_mask(game.deck.stockpile)
+        trumpcard = game.deck.trumpcard
+        for observation in game.observations:
+            seat = observation.player_id
+            others = [other for other in range(game.player_count) if other != seat]
+            assert observation.hand == hands[seat]
+            assert observation.hand_sizes == [len(player.hand) for player in game.seats]
+            assert observation.stockpile_size == len(game.deck.stockpile)
+            known = 0
+            for other in others:
+                assert observation.known[other] & hands[other] == observation.known[other]
+                known |= observation.known[other]
+            unseen = (stockpile | sum(hands[other] for other in others)) & ~known & ~trumpcard.bit
+            assert observation.unseen == unseen
+            in_play = stockpile | observation.table_bits
+            for hand in hands:
+                in_play |= hand
+            assert observation.out_of_game == game.rules.deck_mask & ~in_play
+            owners = [other for other, hand in enumerate(hands) if hand & trumpcard.bit]
+            assert observation.trumpcard_owner == (owners[0] if owners else None)
+            if kind == ATTACK:
+                # The attack isn't on the table of the game yet
+                assert observation.table_cards() == game.table + [[card, None] for card in cards]
+            elif kind in (DEFEND, DIVERT, ROUND):
+                assert observation.table_cards() == game.table
+        self.events += 1
+
+
+@pytest.mark.parametrize("player_count, rules", [(2, None), (3, None), (4, None), (5, Rules(52))])
+def test_observations_follow_the_game(player_count, rules):
+    for seed in range(15):
+        game = DurakGame(player_count, seed=seed, headless=True, observe=True, rules=rules)
+        checker = Checker(game)
+        game.listeners.append(checker)
+        game.play()
+        assert len(game.observations) == player_count
+        assert checker.events > 10
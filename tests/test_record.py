@@ -0,0 +1,97 @@
+import pytest
+
+from DurakGame import DurakGame
+from DurakGameRules import Rules
+from GameRecord import RecordReader, RecordWriter, HEADER, VERSION
+from Player import Player
+from Replay import replay
+from tournament import play_chunk
+
+
+def outcome(result):
+    return result.durak, result.finish_order, result.rounds, result.aborted
+
+
+@pytest.mark.parametrize("rules, player_count", [(None, 3), (Rules(52), 6), (Rules(24, 4), 2)])
+def test_replay_gives_the_same_games(tmp_path, rules, player_count):
+    path = str(tmp_path / "games")
+    play_chunk(["lowest_value"], player_count, 7, 0, 0, 40, record_path=path, rules=rules)
+    with RecordReader(f"{path}.0") as reader:
+        records = list(reader)
+    assert len(records) == 40
+    for record in records:
+        assert record.rules == (rules or Rules())
+        played = DurakGame(player_count, seed=record.seed, headless=True, rules=rules).play()
+        assert outcome(replay(record).result()) == outcome(played)
+        assert record.durak == played.durak
+        assert record.rounds == played.rounds
+
+
+def test_replay_stops_at_every_ply(tmp_path):
+    path = str(tmp_path / "games")
+    with RecordWriter(path) as writer:
+        game = DurakGame(3, seed=11, headless=True, record=True)
+        positions = []
+
+        def position(player):
+            game = player.game
+            return ([sorted(card.index for card in seat.hand) for seat in game.seats],
+                    [[card.index if card else None for card in attack] for attack in game.table],
+                    len(game.deck.stockpile))
+
+        def attack(player, *arguments):
+            positions.append(position(player))
+            return Player.cpu_lowest_value_attack(player, *arguments)
+
+        def defend(player, *arguments):
+            positions.append(position(player))
+            return Player.cpu_lowest_value_defend(player, *arguments)
+
+        for seat in game.seats:
+            seat.attack = attack.__get__(seat)
+            seat.defend = defend.__get__(seat)
+        game.play()
+        writer.write(game.recorder)
+    with RecordReader(path) as reader:
+        record, = reader
+    assert len(record.decisions()) == len(positions)
+    for ply, expected in enumerate(positions):
+        assert position(replay(record, ply).seats[0]) == expected
+
+
+def test_chunk_is_written_once(tmp_path):
+    path = str(tmp_path / "games")
+    for _ in range(2):
+        play_chunk(["lowest_value"], 2, 0, 3, 0, 10, record_path=path)
+    with RecordReader(f"{path}.3") as reader:
+        assert len(list(reader)) == 10
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["games.3"]
+
+
+def test_partial_record_is_skipped(tmp_path):
+    path = str(tmp_path / "games")
+    with RecordWriter(path) as writer:
+        for seed in range(2):
+            game = DurakGame(2, seed=seed, headless=True, record=True)
+            game.play()
+            writer.write(game.recorder)
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[:-5])
+    with RecordReader(path) as reader:
+        assert [record.seed for record in reader] == [0]
+
+
+def test_no_records_of_another_version_are_added(tmp_path):
+    path = tmp_path / "games"
+    path.write_bytes(HEADER + bytes((VERSION - 1,)))
+    with pytest.raises(ValueError):
+        RecordWriter(str(path))
+
+
+def test_only_the_current_version_is_read(tmp_path):
+    path = tmp_path / "games"
+    path.write_bytes(HEADER + bytes((VERSION - 1,)))
+    with pytest.raises(ValueError):
+        RecordReader(str(path))
@@ -0,0 +1,25 @@
+from random import Random
+from types import SimpleNamespace
+
+from Cards import Hand, deck_cards, get_value, suits
+from DurakGameRules import first_moves, generate_attacks, lowest_value_attack
+
+
+def test_lowest_value_attack_is_the_lowest_generated_attack():
+    rng = Random(0)
+    for _ in range(2000):
+        trump = rng.choice(list(suits))
+        cards = deck_cards(36)
+        rng.shuffle(cards)
+        hand = Hand(cards[:rng.randint(1, 10)], trump)
+        defender = SimpleNamespace(hand=cards[10:10 + rng.randint(1, 6)])
+        rest = cards[16:]
+        if rng.random() < 0.3:
+            table = []
+        else:
+            table = [[rest[i], rest[i + 1] if i == 0 or rng.random() < 0.5 else None]
+                     for i in range(0, 2 * rng.randint(1, 5), 2)]
+        table_cap = rng.randint(1, 6)
+        lowest = first_moves(generate_attacks(hand, defender, table, table_cap),
+                             key=lambda attack: get_value(attack, trump))
+        assert lowest_value_attack(hand, defender, table, table_cap) == (lowest[0] if lowest else None)
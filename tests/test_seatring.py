@@ -0,0 +1,73 @@
+from random import Random
+
+from DurakGame import DurakGame
+from SeatRing import SeatRing
+
+
+def seats_after(seat, in_game):
+    """The seats in the game after seat going around the table, the slow way."""
+    count = len(in_game)
+    return [(seat + offset) % count for offset in range(1, count + 1) if in_game[(seat + offset) % count]]
+
+
+def seats_before(seat, in_game):
+    count = len(in_game)
+    return [(seat - offset) % count for offset in range(1, count + 1) if in_game[(seat - offset) % count]]
+
+
+def test_ring_follows_a_list_of_seats():
+    rng = Random(0)
+    for _ in range(200):
+        count = rng.randint(2, 8)
+        ring = SeatRing(count)
+        in_game = [True] * count
+        while len(ring) > 1:
+            assert list(ring) == [seat for seat in range(count) if in_game[seat]]
+            assert ring.head == list(ring)[0]
+            for seat in range(count):
+                after = seats_after(seat, in_game)
+                assert ring.next_seat(seat) == after[0]
+                assert ring.previous_seat(seat) == seats_before(seat, in_game)[0]
+                assert list(ring.others(seat)) == [other for other in after if other != seat]
+                assert (seat in ring) == in_game[seat]
+            removed = rng.choice(list(ring))
+            ring.remove(removed)
+            in_game[removed] = False
+
+
+def test_previous_seat():
+    ring = SeatRing(5)
+    ring.remove(0)
+    ring.remove(3)
+    assert [ring.previous_seat(seat) for seat in range(5)] == [4, 4, 1, 2, 2]
+    assert [ring.next_seat(seat) for seat in range(5)] == [1, 2, 4, 4, 1]
+
+
+def test_copy_and_in_game():
+    ring = SeatRing(4, [True, False, True, True])
+    assert list(ring) == [0, 2, 3] and len(ring) == 3
+    copy = ring.copy()
+    copy.remove(2)
+    assert list(ring) == [0, 2, 3] and list(copy) == [0, 3]
+    assert copy.next_seat(0) == 3 and ring.next_seat(0) == 2
+
+
+def test_game_keeps_the_turn_order():
+    for seed in range(30):
+        game = DurakGame(5, seed=seed, headless=True)
+        while game.playing and game.rounds < 100:
+            game.start_round()
+            defender = game.defender.player_id
+            assert defender in game.ring
+            assert game.first_attacker_of_the_round().player_id == seats_before(defender, game.ring.in_game)[0]
+            attackers = [player.player_id for player in game.attackers]
+            assert attackers == [seat for seat in seats_after(defender, game.ring.in_game) if seat != defender]
+            game.handle_round()
+
+
+def test_removing_twice_changes_nothing():
+    ring = SeatRing(4)
+    ring.remove(1)
+    ring.remove(1)
+    assert len(ring) == 3 and list(ring) == [0, 2, 3]
+    assert ring.next_seat(0) == 2 and ring.previous_seat(2) == 0
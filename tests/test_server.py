@@ -0,0 +1,83 @@
+import asyncio
+
+from server import DurakServer
+
+
+async def start(max_tables=4):
+    server = DurakServer(max_tables)
+    listener = await asyncio.start_server(server.handle_client, "127.0.0.1", 0)
+    return server, listener, listener.sockets[0].getsockname()[1]
+
+
+async def read_until(reader, text, answer=None, writer=None):
+    """Reads lines until one contains text, answers every prompt with answer."""
+    lines = []
+    while True:
+        line = (await reader.readline()).decode()
+        assert line, f"The connection closed before {text!r}"
+        lines.append(line)
+        if text in line:
+            return lines
+        if answer is not None and line.strip() == ">":
+            writer.write(f"{answer}\n".encode())
+
+
+async def all_done(server):
+    """Waits until the threads of the tables are freed, that happens right after the players are told."""
+    while server.running:
+        await asyncio.sleep(0.01)
+    return not server.tables
+
+
+def test_plays_a_game_against_cpus():
+    async def client():
+        server, listener, port = await start()
+        async with listener:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            await read_until(reader, "Welcome")
+            writer.write(b"create 3 1 lowest_value\n")
+            # Always the first option, the game ends without a cycle
+            lines = await read_until(reader, "The game is over.", "0", writer)
+            assert any("You sit down at seat 0 of table 0" in line for line in lines)
+            await read_until(reader, "Back in the lobby")
+            writer.write(b"quit\n")
+            assert await reader.read() == b""
+            writer.close()
+        assert await all_done(server)
+
+    asyncio.run(asyncio.wait_for(client(), 60))
+
+
+def test_tables_beyond_max_tables_are_refused():
+    async def connect(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        await read_until(reader, "Welcome")
+        return reader, writer
+
+    async def client():
+        server, listener, port = await start(max_tables=1)
+        async with listener:
+            # A table for 2 humans waits, the table of the second client takes the only thread
+            waiting_reader, waiting = await connect(port)
+            waiting.write(b"create 2 2\n")
+            await read_until(waiting_reader, "Waiting for 1 more players.")
+            playing_reader, playing = await connect(port)
+            playing.write(b"create 2\n")
+            await read_until(playing_reader, ">")
+
+            reader, writer = await connect(port)
+            writer.write(b"create 2\n")
+            await read_until(reader, "all 1 tables are being played")
+            writer.write(b"join 0\n")
+            await read_until(reader, "the table can't start")
+            await read_until(waiting_reader, "the table can't start")
+            assert server.running == 1 and list(server.tables) == [1]
+
+            playing.write(b"quit\n")
+            await read_until(playing_reader, "A player left the table", "quit", playing)
+            await read_until(playing_reader, "Back in the lobby")
+            assert await all_done(server)
+            for stream in (waiting, playing, writer):
+                stream.close()
+
+    asyncio.run(asyncio.wait_for(client(), 60))
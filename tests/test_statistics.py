@@ -0,0 +1,48 @@
+import pytest
+
+from DurakGame import GameResult
+from Statistics import GameStats
+
+
+def results():
+    return [GameResult(0, 3, 2, [0, 1], 10), GameResult(1, 3, 0, [1, 2], 14),
+            GameResult(2, 3, None, [2, 0, 1], 8), GameResult(3, 3, None, [1], 6, aborted=True)]
+
+
+def test_aborted_games_are_no_draws():
+    stats = GameStats(3, ["a", "b"])
+    for result in results():
+        stats.add(result, ["a", "b", "a"])
+    assert (stats.games, stats.draws, stats.aborted) == (4, 1, 1)
+    assert stats.rounds.count == 3 and stats.rounds.mean == 32 / 3 and stats.rounds.maximum == 14
+
+
+def test_merge_and_checkpoint(tmp_path):
+    whole, first, second = GameStats(3, ["a", "b"]), GameStats(3, ["a", "b"]), GameStats(3, ["a", "b"])
+    for number, result in enumerate(results()):
+        whole.add(result, ["a", "b", "a"])
+        (first if number < 2 else second).add(result, ["a", "b", "a"])
+    path = str(tmp_path / "stats.json")
+    first.merge(second).save(path, chunks=2)
+    loaded, extra = GameStats.load(path)
+    assert extra == {"chunks": 2}
+    assert loaded.to_dict() == whole.to_dict()
+
+
+def test_aborted_games_are_not_in_the_rates():
+    stats = GameStats(3, ["a", "b"])
+    for result in results():
+        stats.add(result, ["a", "b", "a"])
+    assert stats.played == 3
+    assert sum(stats.seat_wins) == 3 and stats.seat_wins == [1, 1, 1]
+    assert stats.strategy_seats == {"a": 6, "b": 3}
+    # Every played game has 2 pairs of an a and the b seat
+    assert stats.pairwise["a"]["b"] + stats.pairwise["b"]["a"] == 6
+
+
+def test_merge_needs_the_same_games():
+    stats = GameStats(3, ["a", "b"])
+    with pytest.raises(ValueError):
+        stats.merge(GameStats(4, ["a", "b"]))
+    with pytest.raises(ValueError):
+        stats.merge(GameStats(3, ["a", "c"]))
@@ -0,0 +1,152 @@
+"""Plays many headless cpu games over a process pool and reports the win and Durak rates.
+
+Every chunk of games gets its own seed stream from (seed, chunk number),
+so the results are the same no matter how many workers are used.
+With --record every chunk writes its games to its own record file, PATH.<chunk number> (see GameRecord).
+The file is replaced when the chunk is done, so a chunk that is played again (after a crash) never adds its games twice.
+With --checkpoint the merged GameStats are saved to PATH every few chunks, running the same command again
+after a crash or a stop goes on after the last saved chunk.
+Campaign.py spreads the same chunks (as shards) over workers on more machines.
+
+usage: python tournament.py --strategies lowest_value --games 10000 --players 4 --seed 0
+       python tournament.py --games 200 --profile tournament.prof
+       python tournament.py --strategies lowest_value endgame --games 1000000 --checkpoint campaign.json
+       python tournament.py --games 1000 --players 8 --deck-size 52
+"""
+import os
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, path
+from random import Random
+from uuid import uuid4
+
+import Evaluation
+import Metrics
+from Cards import Deck, DECK_SIZE
+from DurakGame import DurakGame
+from DurakGameRules import check_player_count, Rules, standard_rules, HAND_SIZE, TABLE_CAP
+from GameRecord import RecordWriter
+from Player import strategies
+from Statistics import GameStats
+
+
+def seat_strategies(strategy_names, player_count, game_number):
+    """Rotates the strategies over the seats, so every strategy plays every seat equally often."""
+    return [strategy_names[(game_number + seat) % len(strategy_names)] for seat in range(player_count)]
+
+
+def play_chunk(strategy_names, player_count, seed, chunk_number, first_game, games, record_path=None, weights=None,
+               rules: Rules = None, progress=None):
+    """Plays games first_game up to first_game + games, this is the work unit of one worker.
+
+    weights is a file with the weights of the evaluated strategy (see Evaluation).
+    progress is called after every game, Campaign uses it to renew the claim of its shard."""
+    if weights:
+        Evaluation.use(weights)
+    rules = rules if rules else standard_rules
+    stats = GameStats(player_count, strategy_names)
+    seed_stream = Random(f"{seed}:{chunk_number}")
+    deck = Deck(size=rules.deck_size)  # Reused for every game in the chunk
+    writer = None
+    if record_path:
+        # Written next to the record file and moved over it at the end, an interrupted chunk leaves no partial records
+        chunk_path = f"{record_path}.{chunk_number}"
+        temporary = f"{chunk_path}.{uuid4().hex}.tmp"
+        writer = RecordWriter(temporary)
+    for game_number in range(first_game, first_game + games):
+        names = seat_strategies(strategy_names, player_count, game_number)
+        game = DurakGame(player_count, seed=seed_stream.getrandbits(64), headless=True,
+                         strategies=[strategies[name] for name in names], deck=deck, record=bool(writer),
+                         rules=rules)
+        stats.add(game.play(), names)
+        if writer:
+            writer.write(game.recorder)
+        if progress:
+            progress()
+    if writer:
+        writer.close()
+        os.replace(temporary, chunk_path)
+    return stats
+
+
+def run_tournament(strategy_names, games, player_count, seed=0, workers=None, chunk_size=500, record_path=None,
+                   checkpoint=None, checkpoint_every=10, weights=None, rules: Rules = None):
+    """Spreads the games in chunks over a process pool and merges the results.
+
+    workers defaults to the amount of cpu cores, with 1 worker (or 1 chunk) everything runs in this process.
+    The games are recorded if a record_path is given.
+    With a checkpoint path the stats are saved after every checkpoint_every chunks and at the end,
+    an existing checkpoint of the same tournament is loaded and its chunks aren't played again.
+    weights is a file with the weights of the evaluated strategy, rules the Rules of every game."""
+    rules = rules if rules else standard_rules
+    check_player_count(player_count, rules)
+    for name in strategy_names:
+        if name not in strategies:
+            raise ValueError(f"Unknown strategy '{name}', choose from {list(strategies)}.")
+    workers = workers if workers else cpu_count()
+
+    chunks = []
+    for chunk_number, first_game in enumerate(range(0, games, chunk_size)):
+        chunks.append((strategy_names, player_count, seed, chunk_number, first_game,
+                       min(chunk_size, games - first_game), record_path, weights, rules))
+
+    stats = GameStats(player_count, strategy_names)
+    # The chunks are merged in order, so a checkpoint holds the first done chunks
+    tournament = {"strategies": list(strategy_names), "games": games, "players": player_count, "seed": seed,
+                  "chunk_size": chunk_size, "weights": weights, "rules": rules.to_dict()}
+    done = 0
+    if checkpoint and path.exists(checkpoint):
+        stats, saved = GameStats.load(checkpoint)
+        if saved["tournament"] != tournament:
+            raise ValueError(f"{checkpoint} is the checkpoint of another tournament: {saved['tournament']}")
+        done = saved["chunks"]
+    total = len(chunks)
+    chunks = chunks[done:]
+
+    def merge(chunk_stats):
+        nonlocal done
+        stats.merge(chunk_stats)
+        done += 1
+        if checkpoint and (done % checkpoint_every == 0 or done == total):
+            stats.save(checkpoint, tournament=tournament, chunks=done)
+
+    if workers == 1 or len(chunks) < 2:
+        for chunk in chunks:
+            merge(play_chunk(*chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for chunk_stats in pool.map(play_chunk, *zip(*chunks)):
+                merge(chunk_stats)
+    return stats
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description="Play a tournament between cpu strategies.")
+    parser.add_argument("--strategies", nargs="+", default=["lowest_value"], choices=list(strategies))
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--record", help="Record the games in files starting with this path")
+    parser.add_argument("--profile", help="Play in this process with the instrumentation on, "
+                                          "print the metrics and dump the cProfile stats to this file")
+    parser.add_argument("--checkpoint", help="Save the stats to this file, and go on from it if it exists")
+    parser.add_argument("--checkpoint-every", type=int, default=10, help="Chunks between two checkpoints")
+    parser.add_argument("--weights", help="The .npz weights of the evaluated strategy (see Evaluation.py)")
+    parser.add_argument("--deck-size", type=int, default=DECK_SIZE, help="36, 24 or 52 cards")
+    parser.add_argument("--hand-size", type=int, default=HAND_SIZE)
+    parser.add_argument("--table-cap", type=int, default=TABLE_CAP, help="The most attacks in one round")
+    args = parser.parse_args()
+    game_rules = Rules(args.deck_size, args.hand_size, args.table_cap)
+
+    if args.profile:
+        stats, metrics, _ = Metrics.profile(run_tournament, args.strategies, args.games, args.players, args.seed,
+                                            workers=1, chunk_size=args.chunk_size, record_path=args.record,
+                                            checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                                            weights=args.weights, rules=game_rules, path=args.profile)
+        print(stats)
+        print(metrics)
+    else:
+        print(run_tournament(args.strategies, args.games, args.players, args.seed, args.workers, args.chunk_size,
+                             args.record, args.checkpoint, args.checkpoint_every, args.weights, game_rules))